@@ -0,0 +1,125 @@
+from pathlib import Path
+from typing import List, Optional
+import csv
+import datetime
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+
+REPORT_FIELDS = [
+    "benchmark",
+    "case",
+    "batch_size",
+    "calls",
+    "rows",
+    "seconds",
+    "throughput",
+    "unit",
+    "p50_ms",
+    "p95_ms",
+    "p99_ms",
+    "max_ms",
+    "errors",
+    "peak_rss_mb",
+]
+
+
+def peak_rss_mb() -> float:
+    # VmHWM belongs to the current address space. ru_maxrss survives fork and
+    # exec on Linux, so a child spawned by a large parent would report the
+    # parent's peak.
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def reset_peak_rss() -> bool:
+    # Linux lets a process reset its own high-water mark, which gives each
+    # benchmark in a single run its own peak. Elsewhere peaks are cumulative.
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def percentile(samples: list, q: float) -> float:
+    # Nearest-rank percentile over already sorted samples
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def summarize(samples_ms: list) -> dict:
+    samples = sorted(samples_ms)
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    return {
+        "p50_ms": round(percentile(samples, 0.50), 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+        "max_ms": round(samples[-1], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report_metadata(**params) -> dict:
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+    }
+
+
+def write_report(path: Path, metadata: dict, results: List[dict]) -> Path:
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        # CSV rows carry the commit so reports from several runs can be concatenated
+        with open(path, "w", newline="") as fh:
+            writer = csv.DictWriter(
+                fh, fieldnames=["commit"] + REPORT_FIELDS, extrasaction="ignore"
+            )
+            writer.writeheader()
+            for result in results:
+                writer.writerow({"commit": metadata.get("commit"), **result})
+    else:
+        with open(path, "w") as fh:
+            json.dump({"metadata": metadata, "results": results}, fh, indent=2)
+    return path
+
+
+def load_report(path: Path) -> List[dict]:
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="") as fh:
+            rows = list(csv.DictReader(fh))
+        for row in rows:
+            row["throughput"] = float(row["throughput"]) if row["throughput"] else None
+        return rows
+    with open(path) as fh:
+        return json.load(fh)["results"]
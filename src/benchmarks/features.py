@@ -0,0 +1,47 @@
+"""Speed of the vectorized feature derivation against the scalar formulas.
+
+Run from the src directory:
+
+    python -m benchmarks.features --rows 1000000
+
+Parity between the two is covered by tests/test_features.py.
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_catalog
+from services.batch_engine import FEATURE_COLUMNS
+from services.features import apply_derived_features
+from tests.reference import scalar_reference
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--scalar-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    catalog = generate_catalog(args.rows)
+    frame = catalog.reindex(columns=FEATURE_COLUMNS).astype("float64")
+    start = time.perf_counter()
+    apply_derived_features(frame)
+    vectorized = time.perf_counter() - start
+
+    rows = catalog.head(args.scalar_rows).fillna(1.0).to_dict(orient="records")
+    start = time.perf_counter()
+    for row in rows:
+        scalar_reference(row)
+    scalar = (time.perf_counter() - start) * args.rows / len(rows)
+
+    print(f"vectorized: {args.rows / vectorized:>14,.0f} rows/s ({vectorized:.3f}s)")
+    print(
+        f"scalar:     {args.rows / scalar:>14,.0f} rows/s (extrapolated {scalar:.2f}s)"
+    )
+    print(f"speedup:    {scalar / vectorized:>14.1f}x")
+
+
+if __name__ == "__main__":
+    main()
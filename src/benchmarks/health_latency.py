@@ -0,0 +1,92 @@
+"""Latency of GET /health while batch uploads are being classified.
+
+Run from the src directory:
+
+    python -m benchmarks.health_latency --rows 50000 --uploads 4
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from benchmarks.common import percentile
+from benchmarks.synthetic import generate_catalog
+
+
+def _summary(samples: list) -> str:
+    if not samples:
+        return "n=0"
+    samples = sorted(samples)
+    return (
+        f"n={len(samples):<5} p50={percentile(samples, 0.50):7.2f}ms "
+        f"p95={percentile(samples, 0.95):7.2f}ms "
+        f"p99={percentile(samples, 0.99):7.2f}ms max={samples[-1]:7.2f}ms "
+        f"mean={statistics.fmean(samples):7.2f}ms"
+    )
+
+
+async def _probe_health(
+    client: httpx.AsyncClient, stop: asyncio.Event, interval: float
+):
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/health")
+        response.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def _upload(client: httpx.AsyncClient, payload: bytes) -> int:
+    response = await client.post(
+        "/exoplanet/upload", files={"file": ("catalog.csv", payload)}
+    )
+    return response.status_code
+
+
+async def run(rows: int, uploads: int, interval: float) -> None:
+    from main import app
+
+    payload = generate_catalog(rows).to_csv(index=False).encode()
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_health(client, stop, interval))
+        await asyncio.sleep(1.0)
+        stop.set()
+        idle = await probe
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_health(client, stop, interval))
+        start = time.perf_counter()
+        statuses = await asyncio.gather(
+            *(_upload(client, payload) for _ in range(uploads))
+        )
+        elapsed = time.perf_counter() - start
+        stop.set()
+        loaded = await probe
+
+    print(f"uploads: {uploads} x {rows} rows in {elapsed:.2f}s, statuses={statuses}")
+    print(f"idle   /health {_summary(idle)}")
+    print(f"loaded /health {_summary(loaded)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.rows, args.uploads, args.interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Parse time and peak memory of the upload readers across input formats.
+
+Run from the src directory:
+
+    python -m benchmarks.input_formats --rows 1000000 --excel-rows 100000
+"""
+
+from pathlib import Path
+import argparse
+import multiprocessing
+import tempfile
+import time
+
+from benchmarks.common import peak_rss_mb
+from benchmarks.synthetic import write_arrow, write_csv, write_excel, write_parquet
+
+
+def _parse(path: str, chunk_size: int, queue) -> None:
+    from services.batch_engine import FEATURE_COLUMNS
+    from services.file_readers import iter_file_chunks
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    rows = 0
+    with open(path, "rb") as fh:
+        for chunk in iter_file_chunks(fh, Path(path).name, chunk_size):
+            # Stop at the float matrix the model consumes
+            matrix = chunk.reindex(columns=FEATURE_COLUMNS).to_numpy(dtype="float64")
+            rows += len(matrix)
+
+    queue.put(
+        {
+            "rows": rows,
+            "seconds": time.perf_counter() - start,
+            "baseline_mb": baseline,
+            "peak_mb": peak_rss_mb(),
+        }
+    )
+
+
+def measure(path: Path, chunk_size: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_parse, args=(str(path), chunk_size, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--excel-rows", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        files = [
+            ("csv", write_csv(tmp / "catalog.csv", args.rows)),
+            ("parquet", write_parquet(tmp / "catalog.parquet", args.rows)),
+            ("arrow", write_arrow(tmp / "catalog.arrow", args.rows)),
+        ]
+        if args.excel_rows:
+            files.append(("excel", write_excel(tmp / "catalog.xlsx", args.excel_rows)))
+
+        print(
+            f"{'format':<10}{'rows':>10}{'file MB':>10}{'parse s':>10}"
+            f"{'rows/s':>12}{'base MB':>10}{'peak MB':>10}"
+        )
+        for label, path in files:
+            r = measure(path, args.chunk_size)
+            print(
+                f"{label:<10}{r['rows']:>10}{path.stat().st_size / 2**20:>10.1f}"
+                f"{r['seconds']:>10.2f}{r['rows'] / r['seconds']:>12.0f}"
+                f"{r['baseline_mb']:>10.1f}{r['peak_mb']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Throughput and tail latency of POST /exoplanet/ with and without micro-batching.
+
+Run from the src directory:
+
+    python -m benchmarks.micro_batching --requests 5000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+import httpx
+
+from benchmarks.common import percentile
+from benchmarks.synthetic import generate_catalog
+
+
+async def _drive(n_requests: int, concurrency: int) -> dict:
+    from main import app
+
+    catalog = generate_catalog(min(n_requests, 1000))
+    payloads = catalog.fillna(catalog.median()).to_dict(orient="records")
+
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None
+    ) as client:
+
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/exoplanet/", json=payloads[i % len(payloads)]
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "throughput": n_requests / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+        "errors": errors,
+    }
+
+
+def _child(enabled: bool, n_requests: int, concurrency: int, queue) -> None:
+    import logging
+
+    os.environ["MICRO_BATCH_ENABLED"] = "true" if enabled else "false"
+    # Measure queueing latency rather than 503 backpressure
+    os.environ["INFERENCE_QUEUE_SIZE"] = str(concurrency)
+    # Keep per-request log lines out of the measurement
+    logging.disable(logging.WARNING)
+    queue.put(asyncio.run(_drive(n_requests, concurrency)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(
+        f"{'micro-batching':<16}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    )
+    for enabled in (False, True):
+        queue = ctx.Queue()
+        process = ctx.Process(
+            target=_child, args=(enabled, args.requests, args.concurrency, queue)
+        )
+        process.start()
+        r = queue.get()
+        process.join()
+        label = "on" if enabled else "off"
+        print(
+            f"{label:<16}{r['throughput']:>10.0f}{r['p50']:>10.1f}"
+            f"{r['p99']:>10.1f}{r['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Payload size and encode time of batch results as JSON, Arrow IPC, Parquet and MessagePack.
+
+Run from the src directory:
+
+    python -m benchmarks.result_encoding --rows 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from models.exoplanet import Response
+from services.result_encoders import ENCODERS, ColumnarResult
+
+LABELS = ["APC", "CP", "FA", "FP", "KP", "PC"]
+
+
+def synthetic_result(n_rows: int, failed_ratio: float = 0.001) -> ColumnarResult:
+    rng = np.random.default_rng(0)
+    class_index = rng.integers(0, len(LABELS), n_rows).astype(np.int16)
+    predicted_proba = rng.uniform(0.2, 1.0, n_rows).astype(np.float32)
+
+    failed = np.flatnonzero(rng.random(n_rows) < failed_ratio)
+    class_index[failed] = -1
+    predicted_proba[failed] = np.nan
+    errors = {int(row): [{"column": "pl_rade", "value": "n/a"}] for row in failed}
+    return ColumnarResult(LABELS, class_index, predicted_proba, errors, "bench")
+
+
+def encode_json(result: ColumnarResult) -> bytes:
+    # What the JSON path does: one dict per row, serialized through Response
+    response = Response(
+        success=True,
+        data=result.to_records(),
+        message="Exoplanet file processed successfully",
+        model_version=result.model_version,
+    )
+    return response.model_dump_json().encode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    result = synthetic_result(args.rows)
+    encoders = {"json": encode_json, **ENCODERS}
+
+    print(
+        f"{'format':<12}{'size MB':>10}{'bytes/row':>11}{'encode s':>10}{'rows/s':>14}"
+    )
+    for name, encoder in encoders.items():
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            body = encoder(result)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(
+            f"{name:<12}{len(body) / 1e6:>10.2f}{len(body) / args.rows:>11.2f}"
+            f"{best:>10.3f}{args.rows / best:>14,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Single-record latency of the pipeline path vs the compiled path.
+
+The pipeline path builds a one-row DataFrame and runs the sklearn Pipeline; the
+compiled path scores a float32 array with the exported constants and booster.
+Both run ExoplanetService.classify_record in-process. Run from the src directory:
+
+    python -m benchmarks.single_record --records 5000
+"""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from benchmarks.common import report_metadata, summarize, write_report
+from benchmarks.synthetic import generate_catalog
+
+
+def _measure(classify, payloads: list, repeats: int) -> tuple:
+    for data in payloads[:50]:
+        classify(data)
+
+    latencies = []
+    outputs = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for data in payloads:
+            call_start = time.perf_counter()
+            outputs.append(classify(data))
+            latencies.append((time.perf_counter() - call_start) * 1000)
+    seconds = time.perf_counter() - start
+    return latencies, seconds, outputs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    from models.exoplanet import ExoplanetData
+    from services.compiled_model import compile_pipeline
+    from services.exoplanet_service import ExoplanetService, model_registry
+
+    loaded = model_registry.get()
+    engine = loaded.engine
+    compiled = engine.compiled or compile_pipeline(loaded.model)
+    if compiled is None:
+        raise SystemExit("The model could not be compiled; see the warning above")
+
+    catalog = generate_catalog(args.records, seed=7)
+    payloads = [
+        ExoplanetData(**{k: None if v != v else v for k, v in row.items()})
+        for row in catalog.to_dict(orient="records")
+    ]
+
+    def classify(data):
+        return ExoplanetService.classify_record(data, loaded.ref)
+
+    results = []
+    outputs = {}
+    print(f"{'path':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for path, engine_compiled in (("pipeline", None), ("compiled", compiled)):
+        engine.compiled = engine_compiled
+        latencies, seconds, outputs[path] = _measure(classify, payloads, args.repeats)
+        stats = summarize(latencies)
+        print(
+            f"{path:<10}{len(latencies) / seconds:>10,.0f}{stats['p50_ms']:>10.3f}"
+            f"{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+        )
+        results.append(
+            {
+                "benchmark": "single_record",
+                "case": path,
+                "batch_size": 1,
+                "calls": len(latencies),
+                "rows": len(latencies),
+                "seconds": round(seconds, 4),
+                "throughput": round(len(latencies) / seconds, 1),
+                "unit": "req/s",
+                "errors": 0,
+                **stats,
+            }
+        )
+    engine.compiled = compiled
+
+    mismatches = sum(a != b for a, b in zip(outputs["pipeline"], outputs["compiled"]))
+    print(f"\n{mismatches} of {len(outputs['compiled'])} responses differ")
+
+    if args.output is not None:
+        metadata = report_metadata(records=args.records, repeats=args.repeats)
+        write_report(args.output, metadata, results)
+        print(f"report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
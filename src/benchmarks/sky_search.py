@@ -0,0 +1,139 @@
+"""Cone and box search latency over the persisted target index.
+
+Fills a throwaway TargetStore with synthetic classified targets, spread evenly
+over the sky, then times searches at random positions through TargetStore, so
+each query includes the row fetch from SQLite for one page. Every query is also
+checked against a brute-force scan. Run from the src directory:
+
+    python -m benchmarks.sky_search --targets 2000000
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import report_metadata, summarize, write_report
+from benchmarks.synthetic import generate_catalog
+
+LABELS = ["APC", "CP", "FA", "FP", "KP", "PC"]
+
+
+def _fill(store, targets: int, chunk_size: int) -> float:
+    from services.target_store import TargetSpool
+
+    start = time.perf_counter()
+    spool = TargetSpool(store.spool_path("benchmark"))
+    rng = np.random.default_rng(0)
+    for offset in range(0, targets, chunk_size):
+        rows = min(chunk_size, targets - offset)
+        chunk = generate_catalog(rows, seed=offset)
+        spool.add_columns(
+            chunk,
+            rng.integers(0, len(LABELS), rows),
+            rng.uniform(0.2, 1.0, rows),
+        )
+    store.ingest(spool, LABELS, "benchmark", "synthetic")
+    spool.discard()
+    store.refresh()
+    return time.perf_counter() - start
+
+
+def _queries(kind: str, size: float, count: int, rng) -> list:
+    ra = rng.uniform(0, 360, count)
+    dec = np.degrees(np.arcsin(rng.uniform(-0.95, 0.95, count)))
+    if kind == "cone":
+        return [(r, d, size) for r, d in zip(ra, dec)]
+    return [
+        (r, (r + size) % 360, max(d - size / 2, -90), min(d + size / 2, 90))
+        for r, d in zip(ra, dec)
+    ]
+
+
+def _expected(index, kind: str, query: tuple) -> int:
+    from services.target_store import angular_distance, in_ra_range, unit_vectors
+
+    if kind == "cone":
+        ra, dec, radius = query
+        center = unit_vectors(np.array([ra]), np.array([dec]))[0]
+        distance = angular_distance(unit_vectors(index.ra, index.dec), center)
+        return int((distance <= radius).sum())
+    ra_min, ra_max, dec_min, dec_max = query
+    inside = in_ra_range(index.ra, ra_min, ra_max)
+    return int((inside & (index.dec >= dec_min) & (index.dec <= dec_max)).sum())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", type=int, default=2000000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=200000)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    from services.target_store import TargetStore
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        store = TargetStore(Path(directory), args.targets)
+        seconds = _fill(store, args.targets, args.chunk_size)
+        print(f"indexed {args.targets:,} targets in {seconds:.1f}s\n")
+
+        rng = np.random.default_rng(1)
+        print(
+            f"{'query':<14}{'hits':>10}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'wrong':>8}"
+        )
+        for kind, size in (
+            ("cone", 0.1),
+            ("cone", 1.0),
+            ("cone", 5.0),
+            ("box", 1.0),
+            ("box", 10.0),
+        ):
+            search = store.cone if kind == "cone" else store.box
+            latencies = []
+            hits = 0
+            wrong = 0
+            for query in _queries(kind, size, args.queries, rng):
+                call_start = time.perf_counter()
+                total, _ = search(*query, 0, args.limit)
+                latencies.append((time.perf_counter() - call_start) * 1000)
+                hits += total
+                wrong += total != _expected(store.index, kind, query)
+
+            stats = summarize(latencies)
+            case = f"{kind} {size:g} deg"
+            print(
+                f"{case:<14}{hits / len(latencies):>10,.0f}{stats['p50_ms']:>10.3f}"
+                f"{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}{wrong:>8}"
+            )
+            results.append(
+                {
+                    "benchmark": "sky_search",
+                    "case": case,
+                    "batch_size": args.limit,
+                    "calls": len(latencies),
+                    "rows": hits,
+                    "seconds": round(sum(latencies) / 1000, 4),
+                    "throughput": round(len(latencies) / (sum(latencies) / 1000), 1),
+                    "unit": "queries/s",
+                    "errors": wrong,
+                    **stats,
+                }
+            )
+        store.close()
+
+    if args.output is not None:
+        metadata = report_metadata(targets=args.targets, queries=args.queries)
+        write_report(args.output, metadata, results)
+        print(f"report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Peak RSS of file uploads as the input grows.
+
+Run from the src directory:
+
+    python -m benchmarks.streaming_memory --rows 10000 100000 1000000
+"""
+
+from pathlib import Path
+import argparse
+import asyncio
+import io
+import multiprocessing
+import tempfile
+import time
+
+from fastapi import UploadFile
+
+from benchmarks.common import peak_rss_mb
+from benchmarks.synthetic import write_csv
+
+
+def _run(path: str, mode: str, queue) -> None:
+    import pandas as pd
+    from services.exoplanet_service import ExoplanetService, model_registry
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    rows = 0
+
+    if mode == "stream":
+
+        async def consume():
+            count = 0
+            async with ExoplanetService.pinned_model() as loaded:
+                with open(path, "rb") as fh:
+                    upload = UploadFile(file=fh, filename=Path(path).name)
+                    chunks = ExoplanetService.iter_exoplanet_file(upload, loaded)
+                    async for chunk_result in chunks:
+                        count += len(chunk_result)
+            return count
+
+        rows = asyncio.run(consume())
+    else:
+        # The pre-streaming behaviour: whole body in memory, then one DataFrame
+        with open(path, "rb") as fh:
+            contents = fh.read()
+        df = pd.read_csv(io.BytesIO(contents))
+        records = df.to_dict(orient="records")
+        rows = len(model_registry.get().engine.predict_records(records))
+
+    queue.put(
+        {
+            "rows": rows,
+            "seconds": time.perf_counter() - start,
+            "baseline_mb": baseline,
+            "peak_mb": peak_rss_mb(),
+        }
+    )
+
+
+def measure(path: Path, mode: str) -> dict:
+    # A fresh process per measurement so ru_maxrss is not polluted by earlier runs
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run, args=(str(path), mode, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10_000, 100_000, 500_000]
+    )
+    parser.add_argument("--modes", nargs="+", default=["stream", "full"])
+    args = parser.parse_args()
+
+    print(
+        f"{'mode':<8}{'rows':>12}{'file MB':>10}{'peak MB':>10}{'delta MB':>10}{'sec':>8}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in args.rows:
+            path = write_csv(Path(tmp) / f"catalog_{n_rows}.csv", n_rows)
+            size_mb = path.stat().st_size / (1024 * 1024)
+            for mode in args.modes:
+                r = measure(path, mode)
+                print(
+                    f"{mode:<8}{r['rows']:>12}{size_mb:>10.1f}{r['peak_mb']:>10.1f}"
+                    f"{r['peak_mb'] - r['baseline_mb']:>10.1f}{r['seconds']:>8.2f}"
+                )
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Run the benchmark suite and write a JSON or CSV report that can be compared across commits.
+
+Run from the src directory:
+
+    python -m benchmarks --output report.json
+    python -m benchmarks --output report.json --baseline previous.json
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import pandas as pd
+
+from benchmarks.common import (
+    load_report,
+    peak_rss_mb,
+    report_metadata,
+    reset_peak_rss,
+    summarize,
+    write_report,
+)
+from benchmarks.synthetic import generate_catalog
+
+DEFAULT_BATCH_SIZES = (1, 16, 256, 4096, 65536)
+
+
+def _result(benchmark: str, case: str, **values) -> dict:
+    return {"benchmark": benchmark, "case": case, "errors": 0, **values}
+
+
+def _time_batches(fn: Callable, batches: List[pd.DataFrame]) -> dict:
+    reset_peak_rss()
+    latencies = []
+    rows = 0
+    start = time.perf_counter()
+    for batch in batches:
+        call_start = time.perf_counter()
+        fn(batch)
+        latencies.append((time.perf_counter() - call_start) * 1000)
+        rows += len(batch)
+    seconds = time.perf_counter() - start
+    return {
+        "calls": len(batches),
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "throughput": round(rows / seconds, 1),
+        "unit": "rows/s",
+        **summarize(latencies),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def _batches(catalog: pd.DataFrame, batch_size: int, target_rows: int) -> list:
+    # Enough calls for stable percentiles at small sizes without letting the
+    # large sizes run for minutes
+    calls = max(5, min(500, target_rows // batch_size))
+    n = len(catalog)
+    batches = []
+    for i in range(calls):
+        start = (i * batch_size) % max(n - batch_size + 1, 1)
+        batches.append(catalog.iloc[start : start + batch_size])
+    return batches
+
+
+def run_micro(batch_sizes, target_rows: int) -> List[dict]:
+    from models.validation import validate_frame
+    from services.batch_engine import BatchEngine
+    from services.exoplanet_service import model_registry
+
+    catalog = generate_catalog(max(batch_sizes) * 2)
+    text_catalog = catalog.astype(str)
+    model = model_registry.get().model
+
+    results = []
+    for batch_size in batch_sizes:
+        batches = _batches(catalog, batch_size, target_rows)
+        derived = [BatchEngine.derive_features(b) for b in batches]
+        text_batches = _batches(text_catalog, batch_size, target_rows)
+
+        cases = [
+            ("features", "derive", BatchEngine.derive_features, batches),
+            ("validation", "float64", validate_frame, batches),
+            ("validation", "text", validate_frame, text_batches),
+            ("predict_proba", "model", model.predict_proba, derived),
+        ]
+        for benchmark, case, fn, inputs in cases:
+            results.append(
+                _result(
+                    benchmark,
+                    case,
+                    batch_size=batch_size,
+                    **_time_batches(fn, inputs),
+                )
+            )
+            print(_format(results[-1]))
+    return results
+
+
+async def _load(client, requests: list, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(send):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send()
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(send) for send in requests))
+    seconds = time.perf_counter() - start
+    return {
+        "calls": len(requests),
+        "seconds": round(seconds, 4),
+        "errors": errors,
+        **summarize(latencies),
+    }
+
+
+async def run_load(
+    requests: int, concurrency: int, upload_rows: int, uploads: int
+) -> List[dict]:
+    import httpx
+
+    from main import app
+
+    # Unique rows, so the prediction cache does not turn this into a cache benchmark
+    catalog = generate_catalog(requests, seed=1)
+    payloads = catalog.fillna(catalog.median()).to_dict(orient="records")
+    upload = generate_catalog(upload_rows, seed=2).to_csv(index=False).encode()
+
+    results = []
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None
+    ) as client:
+        # Loads the model outside of the measurement
+        await client.post("/exoplanet/", json=payloads[0])
+
+        reset_peak_rss()
+        single = await _load(
+            client,
+            [lambda p=p: client.post("/exoplanet/", json=p) for p in payloads],
+            concurrency,
+        )
+        results.append(
+            _result(
+                "load",
+                "POST /exoplanet/",
+                **single,
+                batch_size=1,
+                rows=requests,
+                throughput=round(requests / single["seconds"], 1),
+                unit="req/s",
+                peak_rss_mb=round(peak_rss_mb(), 1),
+            )
+        )
+        print(_format(results[-1]))
+
+        reset_peak_rss()
+        batch = await _load(
+            client,
+            [
+                lambda: client.post(
+                    "/exoplanet/upload", files={"file": ("catalog.csv", upload)}
+                )
+                for _ in range(uploads)
+            ],
+            max(1, min(concurrency, uploads)),
+        )
+        rows = upload_rows * uploads
+        results.append(
+            _result(
+                "load",
+                "POST /exoplanet/upload",
+                **batch,
+                batch_size=upload_rows,
+                rows=rows,
+                throughput=round(rows / batch["seconds"], 1),
+                unit="rows/s",
+                peak_rss_mb=round(peak_rss_mb(), 1),
+            )
+        )
+        print(_format(results[-1]))
+    return results
+
+
+def _format(result: dict) -> str:
+    return (
+        f"{result['benchmark']:<14}{result['case']:<24}{result['batch_size']:>8}"
+        f"{result['throughput']:>14,.0f} {result['unit']:<7}"
+        f"{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}{result['p99_ms']:>10.3f}"
+        f"{result['peak_rss_mb']:>10.1f}"
+    )
+
+
+def compare(results: List[dict], baseline: List[dict]) -> None:
+    previous = {
+        (r["benchmark"], r["case"], int(r["batch_size"])): r["throughput"]
+        for r in baseline
+    }
+    print(f"\n{'benchmark':<14}{'case':<24}{'batch':>8}{'baseline':>14}{'change':>10}")
+    for r in results:
+        before = previous.get((r["benchmark"], r["case"], int(r["batch_size"])))
+        if not before:
+            continue
+        change = (r["throughput"] / before - 1) * 100
+        print(
+            f"{r['benchmark']:<14}{r['case']:<24}{r['batch_size']:>8}"
+            f"{before:>14,.0f}{change:>+9.1f}%"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--output", type=Path, default=None, help="report path, .json or .csv"
+    )
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument(
+        "--batch-sizes",
+        type=lambda s: tuple(int(v) for v in s.split(",")),
+        default=DEFAULT_BATCH_SIZES,
+    )
+    parser.add_argument("--micro-rows", type=int, default=500_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--upload-rows", type=int, default=50_000)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    args = parser.parse_args()
+
+    # Measure queueing latency rather than 503 backpressure, and keep per-request
+    # log lines out of the measurement
+    os.environ.setdefault("INFERENCE_QUEUE_SIZE", str(args.concurrency))
+    logging.disable(logging.WARNING)
+
+    print(
+        f"{'benchmark':<14}{'case':<24}{'batch':>8}{'throughput':>22}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>10}"
+    )
+    results = []
+    if not args.skip_micro:
+        results.extend(run_micro(args.batch_sizes, args.micro_rows))
+    if not args.skip_load:
+        results.extend(
+            asyncio.run(
+                run_load(
+                    args.requests, args.concurrency, args.upload_rows, args.uploads
+                )
+            )
+        )
+
+    if args.output is not None:
+        metadata = report_metadata(
+            **{k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()}
+        )
+        write_report(args.output, metadata, results)
+        print(f"\nreport written to {args.output}")
+    if args.baseline is not None:
+        compare(results, load_report(args.baseline))
+
+
+if __name__ == "__main__":
+    main()
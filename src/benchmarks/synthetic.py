@@ -0,0 +1,157 @@
+"""Write a synthetic TESS-like catalog with the 30 ExoplanetData columns.
+
+Run from the src directory:
+
+    python -m benchmarks.synthetic catalog.parquet --rows 10000000
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from services.batch_engine import FEATURE_COLUMNS
+
+
+def generate_catalog(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    data = {
+        "ra": rng.uniform(0.0, 360.0, n_rows),
+        "dec": np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, n_rows))),
+        "st_pmra": rng.normal(0.0, 20.0, n_rows),
+        "st_pmraerr1": rng.lognormal(-2.5, 0.8, n_rows),
+        "st_pmdec": rng.normal(0.0, 20.0, n_rows),
+        "st_pmdecerr1": rng.lognormal(-2.5, 0.8, n_rows),
+        "pl_tranmid": rng.uniform(2458300.0, 2460500.0, n_rows),
+        "pl_tranmiderr1": rng.lognormal(-6.5, 1.0, n_rows),
+        "pl_orbper": rng.lognormal(1.5, 1.0, n_rows),
+        "pl_orbpererr1": rng.lognormal(-9.0, 1.5, n_rows),
+        "pl_trandurh": rng.lognormal(1.0, 0.5, n_rows),
+        "pl_trandurherr1": rng.lognormal(-1.5, 0.8, n_rows),
+        "pl_trandep": rng.lognormal(7.0, 1.5, n_rows),
+        "pl_trandeperr1": rng.lognormal(4.0, 1.0, n_rows),
+        "pl_rade": rng.lognormal(1.0, 0.8, n_rows),
+        "pl_radeerr1": rng.lognormal(-0.5, 0.8, n_rows),
+        "pl_insol": rng.lognormal(5.0, 2.0, n_rows),
+        "pl_eqt": rng.normal(1200.0, 500.0, n_rows).clip(100.0),
+        "st_tmag": rng.normal(10.5, 1.8, n_rows),
+        "st_tmagerr1": rng.lognormal(-4.0, 0.5, n_rows),
+        "st_dist": rng.lognormal(5.5, 0.8, n_rows),
+        "st_disterr1": rng.lognormal(1.5, 1.0, n_rows),
+        "st_teff": rng.normal(5700.0, 1100.0, n_rows).clip(2500.0),
+        "st_tefferr1": rng.lognormal(4.5, 0.6, n_rows),
+        "st_logg": rng.normal(4.3, 0.3, n_rows),
+        "st_loggerr1": rng.lognormal(-2.5, 0.5, n_rows),
+        "st_rad": rng.lognormal(0.1, 0.4, n_rows),
+        "st_raderr1": rng.lognormal(-3.0, 0.7, n_rows),
+    }
+
+    df = pd.DataFrame(data)
+    # Upstream catalogs leave roughly 5% of the uncertainty columns empty
+    for column in df.columns:
+        if column.endswith("err1"):
+            df.loc[rng.random(n_rows) < 0.05, column] = np.nan
+
+    return df.reindex(columns=[c for c in FEATURE_COLUMNS if c in df.columns])
+
+
+def iter_catalog(
+    n_rows: int, chunk_size: int = 100_000, seed: int = 0
+) -> Iterator[pd.DataFrame]:
+    # Chunks get their own seeds, so a 10M row catalog never has to be in memory
+    for i, start in enumerate(range(0, n_rows, chunk_size)):
+        yield generate_catalog(min(chunk_size, n_rows - start), seed=seed + i)
+
+
+def write_csv(
+    path: Path, n_rows: int, chunk_size: int = 100_000, seed: int = 0
+) -> Path:
+    # Written in chunks so the generator itself never holds the full catalog
+    path = Path(path)
+    for i, chunk in enumerate(iter_catalog(n_rows, chunk_size, seed)):
+        chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    return path
+
+
+def write_parquet(
+    path: Path, n_rows: int, chunk_size: int = 100_000, seed: int = 0
+) -> Path:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    writer = None
+    for chunk in iter_catalog(n_rows, chunk_size, seed):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema)
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+    return path
+
+
+def write_arrow(
+    path: Path, n_rows: int, chunk_size: int = 100_000, seed: int = 0
+) -> Path:
+    import pyarrow as pa
+
+    path = Path(path)
+    writer = None
+    with pa.OSFile(str(path), "wb") as sink:
+        for chunk in iter_catalog(n_rows, chunk_size, seed):
+            batch = pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pa.ipc.new_file(sink, batch.schema)
+            writer.write_batch(batch)
+        if writer is not None:
+            writer.close()
+    return path
+
+
+def write_excel(path: Path, n_rows: int, seed: int = 0) -> Path:
+    # openpyxl has no streaming writer through pandas, and xlsx caps a sheet
+    # at 1,048,576 rows, so keep Excel sizes modest
+    path = Path(path)
+    generate_catalog(n_rows, seed=seed).to_excel(path, index=False)
+    return path
+
+
+WRITERS = {
+    ".csv": write_csv,
+    ".parquet": write_parquet,
+    ".pq": write_parquet,
+    ".arrow": write_arrow,
+    ".feather": write_arrow,
+    ".xlsx": write_excel,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", type=Path, help=f"one of {', '.join(WRITERS)}")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.rows < 1 or args.rows > 10_000_000:
+        parser.error("--rows must be between 1 and 10,000,000")
+    writer = WRITERS.get(args.path.suffix.lower())
+    if writer is None:
+        parser.error(f"unsupported extension {args.path.suffix!r}")
+
+    start = time.perf_counter()
+    writer(args.path, args.rows, seed=args.seed)
+    size_mb = args.path.stat().st_size / (1024 * 1024)
+    print(
+        f"wrote {args.rows:,} rows to {args.path} "
+        f"({size_mb:.1f} MB in {time.perf_counter() - start:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
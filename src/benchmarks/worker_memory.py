@@ -0,0 +1,105 @@
+"""Startup time and per-worker memory for pre-fork vs per-worker model loading.
+
+Linux only (reads /proc/self/smaps_rollup). Run from the src directory:
+
+    python -m benchmarks.worker_memory --workers 1 4 8
+"""
+
+import argparse
+import multiprocessing
+import statistics
+import time
+
+
+def _memory_mb() -> dict:
+    fields = {}
+    with open("/proc/self/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": fields["Rss"],
+        "pss_mb": fields["Pss"],
+        "uss_mb": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def _worker(started_at: float, barrier, queue) -> None:
+    from benchmarks.synthetic import generate_catalog
+    from services.exoplanet_service import model_registry
+
+    model_registry.get().engine.predict_chunk(generate_catalog(100))
+    ready_seconds = time.time() - started_at
+
+    # Measure only once every sibling is alive, so PSS splits shared pages
+    barrier.wait()
+    queue.put({"ready_seconds": ready_seconds, **_memory_mb()})
+    barrier.wait()
+
+
+def _coordinate(mode: str, n_workers: int, results) -> None:
+    import logging
+
+    logging.disable(logging.INFO)
+    started_at = time.time()
+
+    if mode == "preload":
+        from services.exoplanet_service import model_registry
+
+        model_registry.preload()
+        ctx = multiprocessing.get_context("fork")
+    else:
+        ctx = multiprocessing.get_context("spawn")
+
+    barrier = ctx.Barrier(n_workers)
+    queue = ctx.Queue()
+    workers = [
+        ctx.Process(target=_worker, args=(started_at, barrier, queue))
+        for _ in range(n_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    samples = [queue.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    results.put(
+        {
+            "startup_seconds": max(s["ready_seconds"] for s in samples),
+            **{
+                key: statistics.fmean(s[key] for s in samples)
+                for key in ("rss_mb", "pss_mb", "uss_mb")
+            },
+        }
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--modes", nargs="+", default=["per-worker", "preload"])
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(
+        f"{'mode':<12}{'workers':>8}{'startup s':>11}"
+        f"{'RSS MB':>9}{'PSS MB':>9}{'USS MB':>9}"
+    )
+    for mode in args.modes:
+        for n_workers in args.workers:
+            results = ctx.Queue()
+            coordinator = ctx.Process(
+                target=_coordinate, args=(mode, n_workers, results)
+            )
+            coordinator.start()
+            r = results.get()
+            coordinator.join()
+            print(
+                f"{mode:<12}{n_workers:>8}{r['startup_seconds']:>11.2f}"
+                f"{r['rss_mb']:>9.1f}{r['pss_mb']:>9.1f}{r['uss_mb']:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
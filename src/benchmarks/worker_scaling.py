@@ -0,0 +1,129 @@
+"""Batch throughput of the shared-memory inference pool for 1 to N workers.
+
+Each configuration runs in its own process with INFERENCE_EXECUTOR=shm and
+INFERENCE_WORKERS=n, next to the default in-process thread executor. Run from
+the src directory:
+
+    python -m benchmarks.worker_scaling --rows 1000000 --workers 1 2 4 8 16 32
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+from benchmarks.common import (
+    peak_rss_mb,
+    report_metadata,
+    reset_peak_rss,
+    summarize,
+    write_report,
+)
+
+
+async def _drive(rows: int, chunk_size: int) -> dict:
+    from benchmarks.synthetic import generate_catalog
+    from services.exoplanet_service import ExoplanetService, inference_executor
+
+    catalog = generate_catalog(rows)
+    chunks = [catalog.iloc[i : i + chunk_size] for i in range(0, rows, chunk_size)]
+
+    async with ExoplanetService.pinned_model() as loaded:
+        # Starts the pool and loads the model outside of the measurement
+        await ExoplanetService.classify_chunk_columnar(chunks[0], loaded)
+
+        reset_peak_rss()
+        latencies = []
+        start = time.perf_counter()
+        for chunk in chunks:
+            call_start = time.perf_counter()
+            await ExoplanetService.classify_chunk_columnar(chunk, loaded)
+            latencies.append((time.perf_counter() - call_start) * 1000)
+        seconds = time.perf_counter() - start
+
+    shards = len(inference_executor.shards(chunk_size))
+    inference_executor.shutdown()
+    return {
+        "calls": len(chunks),
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "throughput": round(rows / seconds, 1),
+        "unit": "rows/s",
+        "shards_per_chunk": shards if inference_executor.shared_memory else 1,
+        **summarize(latencies),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def _child(kind: str, workers: int, rows: int, chunk_size: int, queue) -> None:
+    import logging
+
+    os.environ["INFERENCE_EXECUTOR"] = kind
+    os.environ["INFERENCE_WORKERS"] = str(workers)
+    # Every chunk goes to the model rather than the prediction cache
+    os.environ["PREDICTION_CACHE_ENABLED"] = "false"
+    logging.disable(logging.WARNING)
+    queue.put(asyncio.run(_drive(rows, chunk_size)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[n for n in (1, 2, 4, 8, 16, 32) if n <= (os.cpu_count() or 1)],
+    )
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(
+        f"{'executor':<10}{'workers':>8}{'shards':>8}{'rows/s':>14}{'speedup':>9}"
+        f"{'p50 ms':>10}{'p99 ms':>10}{'api MB':>10}"
+    )
+    results = []
+    baseline = None
+    for kind, workers in [("thread", 1)] + [("shm", n) for n in args.workers]:
+        queue = ctx.Queue()
+        process = ctx.Process(
+            target=_child, args=(kind, workers, args.rows, args.chunk_size, queue)
+        )
+        process.start()
+        result = queue.get()
+        process.join()
+
+        # Speedup is relative to a single shared-memory worker
+        if kind == "shm" and baseline is None:
+            baseline = result["throughput"]
+        speedup = result["throughput"] / baseline if baseline else 1.0
+        print(
+            f"{kind:<10}{workers:>8}{result['shards_per_chunk']:>8}"
+            f"{result['throughput']:>14,.0f}{speedup:>8.2f}x"
+            f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+            f"{result['peak_rss_mb']:>10.1f}"
+        )
+        results.append(
+            {
+                "benchmark": "worker_scaling",
+                "case": f"{kind} x{workers}",
+                "batch_size": args.chunk_size,
+                "errors": 0,
+                **result,
+            }
+        )
+
+    if args.output is not None:
+        metadata = report_metadata(
+            rows=args.rows, chunk_size=args.chunk_size, workers=args.workers
+        )
+        write_report(args.output, metadata, results)
+        print(f"\nreport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
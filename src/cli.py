@@ -0,0 +1,263 @@
+"""Score local catalog files offline with the service's model and feature logic.
+
+Files and directories (searched recursively) are spread over a process pool,
+one file per task. Each file is read in chunks and its results are written
+next to it as <name>.scored.parquet (or .arrow). Files whose output already
+exists for the current model version and options are skipped, so an
+interrupted run can simply be started again. Run from the src directory:
+
+    python cli.py /data/catalogs --workers 8
+"""
+
+import os
+
+# Parallelism comes from the file pool; nested inference pools are not
+# allowed inside its worker processes
+os.environ["INFERENCE_EXECUTOR"] = "thread"
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List
+from models.exoplanet import ProbabilityOptions
+from services.exoplanet_service import ExoplanetService, model_registry
+from services.file_readers import SUPPORTED_EXTENSIONS
+from services.result_encoders import ColumnarResult, to_arrow_table
+from config.env import settings
+from fastapi import UploadFile
+import argparse
+import asyncio
+import logging
+import sys
+import time
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_SUFFIX = ".scored"
+OUTPUT_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def output_path(path: Path, format: str) -> Path:
+    stem = path.name[: -len(path.suffix)] if path.suffix else path.name
+    return path.with_name(f"{stem}{OUTPUT_SUFFIX}{OUTPUT_EXTENSIONS[format]}")
+
+
+def find_files(paths: List[Path]) -> List[Path]:
+    found = []
+    for path in paths:
+        if path.is_dir():
+            candidates = sorted(p for p in path.rglob("*") if p.is_file())
+        elif path.is_file():
+            candidates = [path]
+        else:
+            raise ValueError(f"No such file or directory: {path}")
+        for candidate in candidates:
+            name = candidate.name.lower()
+            # Outputs of earlier runs are catalogs too, but not inputs
+            if name.endswith(SUPPORTED_EXTENSIONS) and OUTPUT_SUFFIX + "." not in name:
+                found.append(candidate)
+    return list(dict.fromkeys(found))
+
+
+def output_metadata(output: Path, format: str) -> dict:
+    try:
+        if format == "parquet":
+            schema = pa.parquet.read_schema(output)
+        else:
+            with pa.memory_map(str(output)) as source:
+                schema = pa.ipc.open_file(source).schema
+    except (OSError, pa.ArrowInvalid):
+        return {}
+    return {
+        key.decode(): value.decode() for key, value in (schema.metadata or {}).items()
+    }
+
+
+def is_done(path: Path, format: str, model_version: str, variant: str) -> bool:
+    # Done only if produced from this input, by this model, with the same
+    # output options
+    output = output_path(path, format)
+    if not output.exists() or output.stat().st_mtime < path.stat().st_mtime:
+        return False
+    metadata = output_metadata(output, format)
+    return (
+        metadata.get("model_version") == model_version
+        and metadata.get("variant") == variant
+    )
+
+
+def _chunk_table(
+    labels: list,
+    chunk_result: tuple,
+    model_version: str,
+    variant: str,
+) -> pa.Table:
+    index, prob, probs, row_errors = chunk_result
+    result = ColumnarResult(labels, index, prob, row_errors, model_version, probs)
+    table = to_arrow_table(result)
+    # Every chunk gets the same schema, whether or not it has failed rows
+    if "errors" not in table.column_names:
+        table = table.append_column("errors", pa.nulls(len(table), pa.string()))
+    return table.replace_schema_metadata(
+        {"model_version": model_version, "variant": variant}
+    )
+
+
+async def _score_file(
+    path: Path, output: Path, format: str, probabilities: bool
+) -> tuple:
+    options = ProbabilityOptions(probabilities=probabilities)
+    rows = 0
+    failed = 0
+    writer = None
+    async with ExoplanetService.pinned_model() as loaded:
+        labels = loaded.engine.labels.tolist()
+        with open(path, "rb") as fh:
+            file = UploadFile(file=fh, filename=path.name)
+            chunks = ExoplanetService.iter_exoplanet_file(
+                file, loaded, ExoplanetService.classify_chunk_columnar, options
+            )
+            try:
+                async for chunk_result in chunks:
+                    table = _chunk_table(
+                        labels, chunk_result, loaded.version, options.variant
+                    )
+                    if writer is None:
+                        if format == "parquet":
+                            writer = pa.parquet.ParquetWriter(
+                                output, table.schema, compression="zstd"
+                            )
+                        else:
+                            writer = pa.ipc.new_file(str(output), table.schema)
+                    writer.write_table(table)
+                    rows += len(table)
+                    failed += len(chunk_result[3])
+            finally:
+                if writer is not None:
+                    writer.close()
+    return rows, failed
+
+
+def score_file(path: Path, format: str, probabilities: bool) -> dict:
+    # Runs in a pool worker. The output only appears under its final name once
+    # it is complete, which is what makes a rerun skip it.
+    output = output_path(path, format)
+    partial = output.with_name(output.name + ".partial")
+    start = time.perf_counter()
+    try:
+        rows, failed = asyncio.run(_score_file(path, partial, format, probabilities))
+        if rows == 0:
+            raise ValueError("The file is empty")
+        os.replace(partial, output)
+    finally:
+        partial.unlink(missing_ok=True)
+    return {
+        "rows": rows,
+        "failed": failed,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _init_worker(threads: int) -> None:
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(threads)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", type=Path)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=settings.batch_chunk_size)
+    parser.add_argument(
+        "--format", choices=sorted(OUTPUT_EXTENSIONS), default="parquet"
+    )
+    parser.add_argument(
+        "--probabilities",
+        action="store_true",
+        help="Add a proba_<class> column for every class",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Rescore files that are already done"
+    )
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    if args.workers <= 0 or args.chunk_size <= 0:
+        parser.error("--workers and --chunk-size must be positive integers")
+    settings.batch_chunk_size = args.chunk_size
+
+    try:
+        files = find_files(args.paths)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Loaded before the pool forks, so every worker shares the booster's pages
+    loaded = model_registry.preload()
+    variant = ProbabilityOptions(probabilities=args.probabilities).variant
+    pending = [
+        path
+        for path in files
+        if args.force or not is_done(path, args.format, loaded.version, variant)
+    ]
+    skipped = len(files) - len(pending)
+    print(
+        f"{len(files)} files found, {skipped} already scored with model "
+        f"{loaded.version}, {len(pending)} to score"
+    )
+    if not pending:
+        return 0
+
+    # Largest first, so one big file is not left running alone at the end
+    pending.sort(key=lambda path: path.stat().st_size, reverse=True)
+    workers = min(args.workers, len(pending))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    rows = 0
+    failed_rows = 0
+    failed_files = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(threads,)
+    ) as pool:
+        futures = {
+            pool.submit(score_file, path, args.format, args.probabilities): path
+            for path in pending
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed_files += 1
+                print(f"[{done}/{len(pending)}] {path}: failed: {str(e)}")
+                continue
+            rows += result["rows"]
+            failed_rows += result["failed"]
+            rate = result["rows"] / result["seconds"] if result["seconds"] > 0 else 0
+            print(
+                f"[{done}/{len(pending)}] {path}: {result['rows']:,} rows "
+                f"({result['failed']:,} failed validation) in "
+                f"{result['seconds']:.1f}s, {rate:,.0f} rows/s"
+            )
+
+    seconds = time.perf_counter() - start
+    print(
+        f"\nScored {len(pending) - failed_files} files, {rows:,} rows "
+        f"({failed_rows:,} failed validation) in {seconds:.1f}s: "
+        f"{rows / seconds if seconds > 0 else 0:,.0f} rows/s with {workers} workers"
+    )
+    if failed_files:
+        print(f"{failed_files} files failed and will be retried on the next run")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -8,6 +9,50 @@ class Settings(BaseSettings):
     api_prefix: str = Field(default="/api/v1")
     debug: bool = Field(default=False)
     log_level: str = Field(default="INFO")
+    batch_chunk_size: int = Field(default=10000)
+    pipeline_path: Optional[str] = Field(default=None)
+    encoder_path: Optional[str] = Field(default=None)
+    preload_model: bool = Field(default=False)
+    compiled_model_enabled: bool = Field(default=True)
+    model_versions_dir: Optional[str] = Field(default=None)
+    model_versions_keep: int = Field(default=5)
+    model_resolved_versions: int = Field(default=2)
+    artifacts_dir: Optional[str] = Field(default=None)
+    admin_token: Optional[str] = Field(default=None)
+    inference_executor: str = Field(default="thread")
+    inference_workers: int = Field(default=4)
+    inference_queue_size: int = Field(default=64)
+    inference_shard_min_rows: int = Field(default=1024)
+    inference_priority_workers: int = Field(default=1)
+    micro_batch_enabled: bool = Field(default=True)
+    micro_batch_max_size: int = Field(default=64)
+    micro_batch_max_wait_ms: float = Field(default=2.0)
+    prediction_cache_enabled: bool = Field(default=True)
+    prediction_cache_size: int = Field(default=100000)
+    prediction_cache_ttl_seconds: float = Field(default=3600.0)
+    jobs_dir: Optional[str] = Field(default=None)
+    jobs_max_concurrent: int = Field(default=2)
+    jobs_retention_seconds: float = Field(default=7 * 86400.0)
+    jobs_lease_seconds: float = Field(default=60.0)
+    profiling_enabled: bool = Field(default=False)
+    profiling_dir: Optional[str] = Field(default=None)
+    profiling_sample_interval_ms: float = Field(default=5.0)
+    profiling_max_profiles: int = Field(default=50)
+    result_store_enabled: bool = Field(default=True)
+    result_store_dir: Optional[str] = Field(default=None)
+    result_store_max_bytes: int = Field(default=1024 * 1024 * 1024)
+    uploads_dir: Optional[str] = Field(default=None)
+    upload_session_ttl_seconds: float = Field(default=86400.0)
+    target_index_enabled: bool = Field(default=False)
+    target_index_dir: Optional[str] = Field(default=None)
+    target_index_max_rows: int = Field(default=5000000)
+    admission_enabled: bool = Field(default=True)
+    max_concurrent_uploads: int = Field(default=4)
+    max_inflight_rows: int = Field(default=2000000)
+    max_upload_bytes: int = Field(default=2 * 1024 * 1024 * 1024)
+    max_upload_rows: int = Field(default=10000000)
+    max_excel_upload_bytes: int = Field(default=100 * 1024 * 1024)
+    admission_retry_after_seconds: int = Field(default=5)
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,106 @@
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import Response as HTTPResponse
+from models.admin import ModelReloadRequest
+from models.exoplanet import Response
+from services.admin_service import AdminService
+from config.env import settings
+from typing import Optional
+import logging
+import secrets
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin")
+
+admin_service = AdminService()
+
+
+def _check_token(token: Optional[str]) -> None:
+    # Without a configured token the admin API does not exist, rather than
+    # being open to anyone who can reach the service
+    if settings.admin_token is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if token is None or not secrets.compare_digest(token, settings.admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing admin token",
+        )
+
+
+@router.get(
+    "/models",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def list_models(x_admin_token: Optional[str] = Header(default=None)):
+    _check_token(x_admin_token)
+    return await admin_service.list_models()
+
+
+@router.post(
+    "/models/reload",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def reload_model(
+    request: Optional[ModelReloadRequest] = None,
+    x_admin_token: Optional[str] = Header(default=None),
+):
+    _check_token(x_admin_token)
+    try:
+        response = await admin_service.reload_model(request or ModelReloadRequest())
+        return response
+
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Validation error: {str(e)}",
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while reloading the model",
+        )
+
+
+@router.get(
+    "/results",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def result_store_stats(x_admin_token: Optional[str] = Header(default=None)):
+    _check_token(x_admin_token)
+    return await admin_service.result_store_stats()
+
+
+@router.get(
+    "/profiles",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def list_profiles(x_admin_token: Optional[str] = Header(default=None)):
+    _check_token(x_admin_token)
+    return await admin_service.list_profiles()
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    status_code=status.HTTP_200_OK,
+)
+async def download_profile(
+    profile_id: str, x_admin_token: Optional[str] = Header(default=None)
+):
+    _check_token(x_admin_token)
+    try:
+        archive = await admin_service.profile_archive(profile_id)
+    except FileNotFoundError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+    return HTTPResponse(
+        content=archive,
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.zip"'},
+    )
@@ -1,13 +1,75 @@
-from fastapi import APIRouter, HTTPException, status, File, UploadFile
-from models.exoplanet import ExoplanetData, Response
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    status,
+    File,
+    Header,
+    UploadFile,
+)
+from fastapi.responses import Response as HTTPResponse, StreamingResponse
+from models.exoplanet import ExoplanetData, ProbabilityOptions, Response
 from services.exoplanet_service import ExoplanetService
+from services.inference_executor import ExecutorBusyError
+from services.file_readers import SUPPORTED_EXTENSIONS, UNSUPPORTED_FORMAT_MESSAGE
+from services.result_encoders import check_available, negotiate
+from services.upload_service import (
+    UploadNotFoundError,
+    UploadOffsetError,
+    UploadService,
+)
+from models.upload import UploadSessionRequest
+from config.env import settings
+from utils.admission import AdmissionRejectedError, UploadTooLargeError
+from utils.metrics import observe_upload_read
+from typing import Optional
 import logging
+import tempfile
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/exoplanet")
 
 exoplanet_service = ExoplanetService()
+upload_service = UploadService()
+
+
+def _busy(e: ExecutorBusyError) -> HTTPException:
+    logger.warning(f"Inference queue full: {str(e)}")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="The server is busy, please retry later",
+        headers={"Retry-After": str(settings.admission_retry_after_seconds)},
+    )
+
+
+def _rejected(e: AdmissionRejectedError) -> HTTPException:
+    logger.warning(str(e))
+    return HTTPException(
+        status_code=e.status_code,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def _too_large(e: UploadTooLargeError) -> HTTPException:
+    logger.warning(str(e))
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+    )
+
+
+def probability_options(
+    probabilities: bool = Query(
+        default=False, description="Include the full class-probability vector"
+    ),
+    top_k: Optional[int] = Query(
+        default=None, ge=1, description="Include the k most probable classes"
+    ),
+) -> ProbabilityOptions:
+    return ProbabilityOptions(probabilities=probabilities, top_k=top_k)
 
 
 @router.post(
@@ -15,11 +77,15 @@ exoplanet_service = ExoplanetService()
     response_model=Response,
     status_code=status.HTTP_200_OK,
 )
-async def process_exoplanet_data(data: ExoplanetData):
+async def process_exoplanet_data(
+    data: ExoplanetData, options: ProbabilityOptions = Depends(probability_options)
+):
     try:
-        response = await exoplanet_service.process_exoplanet_data(data)
+        response = await exoplanet_service.process_exoplanet_data(data, options)
         return response
 
+    except ExecutorBusyError as e:
+        raise _busy(e)
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(
@@ -34,22 +100,212 @@ async def process_exoplanet_data(data: ExoplanetData):
         )
 
 
+@router.get(
+    "/cache",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def get_cache_stats():
+    stats = exoplanet_service.cache_stats()
+    if stats is None:
+        return Response(success=True, message="Prediction cache is disabled")
+    return Response(success=True, data=stats, message="Prediction cache statistics")
+
+
+def _negotiate(request: Request, options: ProbabilityOptions) -> Optional[tuple]:
+    # Binary formats are opted into with the Accept header; JSON stays the default
+    negotiated = negotiate(request.headers.get("accept"))
+    if negotiated is not None:
+        try:
+            check_available(negotiated[0])
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=str(e)
+            )
+        if options.top_k is not None:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="top_k is only available for JSON responses, "
+                "binary formats can carry the full vector with probabilities=true",
+            )
+    return negotiated
+
+
 @router.post(
     "/upload",
     response_model=Response,
     status_code=status.HTTP_200_OK,
 )
-async def process_exoplanet_file(file: UploadFile = File(...)):
+async def process_exoplanet_file(
+    request: Request,
+    file: UploadFile = File(...),
+    options: ProbabilityOptions = Depends(probability_options),
+):
+    observe_upload_read(request.scope)
+    if not file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=UNSUPPORTED_FORMAT_MESSAGE,
+        )
+
+    negotiated = _negotiate(request, options)
     try:
-        if not file.filename.endswith((".csv", ".xlsx", ".xls")):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Only CSV and Excel files are supported",
-            )
+        rendered = await upload_service.classify_file(file, options, negotiated)
+        return rendered.to_response()
 
-        response = await exoplanet_service.process_exoplanet_file(file)
-        return response
+    except ExecutorBusyError as e:
+        raise _busy(e)
+    except UploadTooLargeError as e:
+        raise _too_large(e)
+    except AdmissionRejectedError as e:
+        raise _rejected(e)
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Validation error: {str(e)}",
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while processing the file",
+        )
+
+
+def _detach_upload(file: UploadFile) -> UploadFile:
+    # FastAPI closes form files once the endpoint returns, which is before a
+    # StreamingResponse body runs. Hand the spool to a new UploadFile owned by
+    # the stream and leave an empty placeholder behind for FastAPI to close.
+    detached = UploadFile(
+        file=file.file, filename=file.filename, size=file.size, headers=file.headers
+    )
+    file.file = tempfile.SpooledTemporaryFile()
+    return detached
+
+
+@router.post(
+    "/upload/stream",
+    status_code=status.HTTP_200_OK,
+)
+async def stream_exoplanet_file(
+    request: Request,
+    file: UploadFile = File(...),
+    options: ProbabilityOptions = Depends(probability_options),
+):
+    observe_upload_read(request.scope)
+    if not file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=UNSUPPORTED_FORMAT_MESSAGE,
+        )
 
+    try:
+        exoplanet_service.check_capacity()
+    except ExecutorBusyError as e:
+        raise _busy(e)
+
+    return StreamingResponse(
+        exoplanet_service.stream_exoplanet_file(_detach_upload(file), options),
+        media_type="application/x-ndjson",
+    )
+
+
+def _upload_not_found(e: UploadNotFoundError) -> HTTPException:
+    logger.warning(str(e))
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.post(
+    "/uploads",
+    response_model=Response,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_upload(request: UploadSessionRequest):
+    try:
+        session = await upload_service.create_session(request)
+        return Response(success=True, data=session, message="Upload session created")
+
+    except UploadTooLargeError as e:
+        raise _too_large(e)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.api_route(
+    "/uploads/{upload_id}",
+    methods=["GET", "HEAD"],
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def get_upload(upload_id: str, response: HTTPResponse):
+    try:
+        session = await upload_service.get_session(upload_id)
+    except UploadNotFoundError as e:
+        raise _upload_not_found(e)
+
+    response.headers["Upload-Offset"] = str(session["offset"])
+    return Response(success=True, data=session, message="Upload session retrieved")
+
+
+@router.patch(
+    "/uploads/{upload_id}",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def append_upload(
+    upload_id: str,
+    request: Request,
+    response: HTTPResponse,
+    upload_offset: int = Header(..., ge=0),
+):
+    try:
+        session = await upload_service.append_chunk(
+            upload_id, upload_offset, request.stream()
+        )
+    except UploadNotFoundError as e:
+        raise _upload_not_found(e)
+    except UploadOffsetError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload-Offset mismatch, resume from {e.offset}",
+            headers={"Upload-Offset": str(e.offset)},
+        )
+    except UploadTooLargeError as e:
+        raise _too_large(e)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Validation error: {str(e)}",
+        )
+
+    response.headers["Upload-Offset"] = str(session["offset"])
+    return Response(success=True, data=session, message="Upload chunk stored")
+
+
+@router.post(
+    "/uploads/{upload_id}/complete",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def complete_upload(
+    upload_id: str,
+    request: Request,
+    options: ProbabilityOptions = Depends(probability_options),
+):
+    negotiated = _negotiate(request, options)
+    try:
+        rendered = await upload_service.complete_session(upload_id, options, negotiated)
+        return rendered.to_response()
+
+    except UploadNotFoundError as e:
+        raise _upload_not_found(e)
+    except ExecutorBusyError as e:
+        raise _busy(e)
+    except UploadTooLargeError as e:
+        raise _too_large(e)
+    except AdmissionRejectedError as e:
+        raise _rejected(e)
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(
@@ -62,3 +318,16 @@ async def process_exoplanet_file(file: UploadFile = File(...)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred while processing the file",
         )
+
+
+@router.delete(
+    "/uploads/{upload_id}",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def delete_upload(upload_id: str):
+    try:
+        await upload_service.delete_session(upload_id)
+    except UploadNotFoundError as e:
+        raise _upload_not_found(e)
+    return Response(success=True, message="Upload session deleted")
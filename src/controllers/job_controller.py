@@ -0,0 +1,114 @@
+from fastapi import APIRouter, HTTPException, Query, Request, status, File, UploadFile
+from fastapi.responses import StreamingResponse
+from models.exoplanet import Response
+from services.job_service import JobNotFoundError, JobService
+from services.file_readers import SUPPORTED_EXTENSIONS, UNSUPPORTED_FORMAT_MESSAGE
+from utils.admission import UploadTooLargeError
+from utils.metrics import observe_upload_read
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/jobs")
+
+job_service = JobService()
+
+
+def _not_found(e: JobNotFoundError) -> HTTPException:
+    logger.warning(str(e))
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.post(
+    "/",
+    response_model=Response,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def submit_job(request: Request, file: UploadFile = File(...)):
+    observe_upload_read(request.scope)
+    if not file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=UNSUPPORTED_FORMAT_MESSAGE,
+        )
+
+    try:
+        response = await job_service.submit_job(file)
+        return response
+
+    except UploadTooLargeError as e:
+        logger.warning(str(e))
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while submitting the job",
+        )
+
+
+@router.get(
+    "/",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def list_jobs(limit: int = Query(default=100, ge=1, le=1000)):
+    return await job_service.list_jobs(limit)
+
+
+@router.get(
+    "/{job_id}",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def get_job(job_id: str):
+    try:
+        return await job_service.get_job(job_id)
+    except JobNotFoundError as e:
+        raise _not_found(e)
+
+
+@router.get(
+    "/{job_id}/results",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, ge=1, le=100000),
+):
+    try:
+        return await job_service.get_results(job_id, offset, limit)
+    except JobNotFoundError as e:
+        raise _not_found(e)
+
+
+@router.get(
+    "/{job_id}/results/stream",
+    status_code=status.HTTP_200_OK,
+)
+async def stream_job_results(job_id: str):
+    try:
+        await job_service.get_job(job_id)
+    except JobNotFoundError as e:
+        raise _not_found(e)
+
+    return StreamingResponse(
+        job_service.stream_results(job_id, page_size=10000),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.delete(
+    "/{job_id}",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def cancel_job(job_id: str):
+    try:
+        return await job_service.cancel_job(job_id)
+    except JobNotFoundError as e:
+        raise _not_found(e)
@@ -0,0 +1,104 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from models.exoplanet import Response
+from services.target_service import TargetIndexDisabledError, TargetService
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/targets")
+
+target_service = TargetService()
+
+
+def _search_error(e: Exception) -> HTTPException:
+    if isinstance(e, TargetIndexDisabledError):
+        logger.warning(str(e))
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e)
+        )
+    if isinstance(e, ValueError):
+        logger.error(f"Validation error: {str(e)}")
+        return HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Validation error: {str(e)}",
+        )
+    logger.error(f"Unexpected error: {str(e)}")
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail="An unexpected error occurred while searching targets",
+    )
+
+
+@router.get(
+    "/cone",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def cone_search(
+    ra: float = Query(ge=0, le=360),
+    dec: float = Query(ge=-90, le=90),
+    radius: float = Query(gt=0, le=180, description="Search radius in degrees"),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, ge=1, le=10000),
+    predicted_class: Optional[str] = Query(default=None),
+    model_version: Optional[str] = Query(default=None),
+    include_features: bool = Query(default=False),
+):
+    try:
+        return await target_service.cone_search(
+            ra,
+            dec,
+            radius,
+            offset,
+            limit,
+            predicted_class,
+            model_version,
+            include_features,
+        )
+    except Exception as e:
+        raise _search_error(e)
+
+
+@router.get(
+    "/box",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def box_search(
+    ra_min: float = Query(ge=0, le=360),
+    ra_max: float = Query(ge=0, le=360),
+    dec_min: float = Query(ge=-90, le=90),
+    dec_max: float = Query(ge=-90, le=90),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, ge=1, le=10000),
+    predicted_class: Optional[str] = Query(default=None),
+    model_version: Optional[str] = Query(default=None),
+    include_features: bool = Query(default=False),
+):
+    try:
+        return await target_service.box_search(
+            ra_min,
+            ra_max,
+            dec_min,
+            dec_max,
+            offset,
+            limit,
+            predicted_class,
+            model_version,
+            include_features,
+        )
+    except Exception as e:
+        raise _search_error(e)
+
+
+@router.get(
+    "/stats",
+    response_model=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def get_stats():
+    try:
+        return await target_service.stats()
+    except Exception as e:
+        raise _search_error(e)
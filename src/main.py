@@ -1,18 +1,71 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from config.env import settings
 from config.logger import setup_logging
 from controllers.exoplanet_controller import router as exoplanet_router
+from controllers.admin_controller import router as admin_router
+from controllers.job_controller import router as job_router
+from controllers.target_controller import router as target_router
+from services.exoplanet_service import (
+    admission_controller,
+    inference_executor,
+    model_registry,
+)
+from services.job_service import job_manager
+from services.target_service import target_indexer
+from services.admin_service import profiles_dir
+from utils.admission import AdmissionMiddleware
+from utils.metrics import MetricsMiddleware, metrics
+from utils.profiling import ProfilingMiddleware
 
 setup_logging()
 
-app = FastAPI()
+if settings.preload_model:
+    # Load before the server forks so workers share the model pages
+    model_registry.preload()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_manager.resume()
+    yield
+    await job_manager.shutdown()
+    await target_indexer.drain()
+    inference_executor.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+if admission_controller is not None:
+    # Inside the metrics middleware, so shed requests are still counted
+    app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+app.add_middleware(MetricsMiddleware)
+
+if settings.profiling_enabled:
+    # Only installed in profiling mode, so normal deployments pay nothing for it
+    app.add_middleware(
+        ProfilingMiddleware,
+        output_dir=profiles_dir,
+        sample_interval_ms=settings.profiling_sample_interval_ms,
+        admin_token=settings.admin_token,
+        max_profiles=settings.profiling_max_profiles,
+    )
 
 
 app.include_router(exoplanet_router)
+app.include_router(admin_router)
+app.include_router(job_router)
+app.include_router(target_router)
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "message": f"app is up and running on port {settings.port}"}
+    # model_version lets clients tell results of different models apart; None until the model is loaded
+    model_version = model_registry.get().version if model_registry.is_loaded else None
+    return {"status": "healthy", "message": f"app is up and running on port {settings.port}", "model_version": model_version}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class ModelReloadRequest(BaseModel):
+    pipeline_path: Optional[str] = None
+    encoder_path: Optional[str] = None
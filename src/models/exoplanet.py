@@ -36,8 +36,34 @@ class ExoplanetData(BaseModel):
 
 
 class Response(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
     success: bool
     message: Optional[str] = None
     prediction: Optional[str] = None
     confidence: Optional[float] = None
     data: Optional[Any] = None
+    model_version: Optional[str] = None
+
+
+class ProbabilityOptions(BaseModel):
+    # Frozen so it can key micro-batch groups
+    model_config = ConfigDict(frozen=True)
+
+    probabilities: bool = Field(
+        default=False, description="Include the full class-probability vector"
+    )
+    top_k: Optional[int] = Field(
+        default=None, ge=1, description="Include the k most probable classes"
+    )
+
+    @property
+    def requested(self) -> bool:
+        return self.probabilities or self.top_k is not None
+
+    @property
+    def variant(self) -> str:
+        # Folded into prediction cache keys, since the records differ in shape
+        if not self.requested:
+            return ""
+        return f"p{int(self.probabilities)}k{self.top_k or 0}"
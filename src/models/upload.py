@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: Optional[int] = Field(default=None, ge=0)
+    sha256: Optional[str] = Field(default=None, pattern=r"^[0-9a-fA-F]{64}$")
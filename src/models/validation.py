@@ -0,0 +1,104 @@
+from typing import List, Optional, Union, get_args, get_origin
+from models.exoplanet import ExoplanetData
+import numpy as np
+import pandas as pd
+
+
+def _column_dtype(annotation) -> str:
+    # Optional[float] -> float64; the batch path only knows how to coerce the
+    # field types ExoplanetData actually uses
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            annotation = args[0]
+    if annotation is float:
+        return "float64"
+    raise TypeError(f"No columnar coercion for field type {annotation!r}")
+
+
+SCHEMA = {
+    name: _column_dtype(field.annotation)
+    for name, field in ExoplanetData.model_fields.items()
+}
+
+
+class FrameValidationResult:
+    def __init__(
+        self,
+        frame: pd.DataFrame,
+        invalid_rows: np.ndarray,
+        errors: List[dict],
+        missing_columns: List[str],
+    ):
+        self.frame = frame
+        self.invalid_rows = invalid_rows
+        self.errors = errors
+        self.missing_columns = missing_columns
+
+    @property
+    def valid_frame(self) -> pd.DataFrame:
+        return self.frame[~self.invalid_rows]
+
+    def row_errors(self) -> dict:
+        by_row = {}
+        for error in self.errors:
+            by_row.setdefault(error["row"], []).append(
+                {"column": error["column"], "value": error["value"]}
+            )
+        return by_row
+
+
+def _coerce_column(column: pd.Series) -> tuple:
+    if pd.api.types.is_bool_dtype(column) or pd.api.types.is_numeric_dtype(column):
+        return column.astype("float64"), None
+
+    coerced = pd.to_numeric(column, errors="coerce").astype("float64")
+    # A cell is invalid if it had a value that did not survive coercion;
+    # empty cells and the literal "nan" are missing values, as in Pydantic
+    text = column.astype("string").str.strip().str.lower()
+    invalid = coerced.isna() & column.notna() & ~text.isin(["nan", ""]).fillna(True)
+    invalid = invalid.to_numpy(dtype=bool)
+    # pd.to_numeric rejects a few spellings that float(), and so Pydantic,
+    # accepts, such as "1_000"; only the rare leftover cells are retried
+    for row in np.flatnonzero(invalid):
+        try:
+            coerced.iat[row] = float(column.iat[row])
+        except (TypeError, ValueError):
+            continue
+        invalid[row] = False
+    return coerced, invalid
+
+
+def validate_frame(
+    df: pd.DataFrame, row_offset: int = 0, schema: Optional[dict] = None
+) -> FrameValidationResult:
+    schema = schema or SCHEMA
+    n_rows = len(df)
+    columns = {}
+    invalid_rows = np.zeros(n_rows, dtype=bool)
+    errors = []
+    missing_columns = []
+
+    for name, dtype in schema.items():
+        if name not in df.columns:
+            missing_columns.append(name)
+            columns[name] = np.full(n_rows, np.nan, dtype=dtype)
+            continue
+
+        values, invalid = _coerce_column(df[name])
+        columns[name] = values.to_numpy(dtype=dtype)
+        if invalid is not None and invalid.any():
+            invalid_rows |= invalid
+            raw = df[name].to_numpy()
+            for row in np.flatnonzero(invalid):
+                errors.append(
+                    {
+                        "row": row_offset + int(row),
+                        "column": name,
+                        "value": str(raw[row]),
+                    }
+                )
+
+    errors.sort(key=lambda error: error["row"])
+    frame = pd.DataFrame(columns, index=df.index, copy=False)
+    return FrameValidationResult(frame, invalid_rows, errors, missing_columns)
@@ -0,0 +1,127 @@
+from pathlib import Path
+from typing import Optional
+from models.admin import ModelReloadRequest
+from models.exoplanet import Response
+from services.exoplanet_service import model_registry
+from services.model_registry import ARTIFACTS_DIR
+from services.upload_service import get_result_store
+from utils.profiling import DEFAULT_PROFILES_DIR
+from config.env import settings
+from fastapi.concurrency import run_in_threadpool
+import io
+import json
+import logging
+import zipfile
+
+logger = logging.getLogger(__name__)
+artifacts_dir = Path(settings.artifacts_dir or ARTIFACTS_DIR).resolve()
+profiles_dir = Path(settings.profiling_dir or DEFAULT_PROFILES_DIR).resolve()
+
+
+def _resolve_artifact(path: Optional[str]) -> Optional[Path]:
+    if path is None:
+        return None
+
+    # Relative paths are taken from the artifacts directory, and nothing
+    # outside of it may be loaded: unpickling runs arbitrary code
+    resolved = (artifacts_dir / path).resolve()
+    if not resolved.is_relative_to(artifacts_dir):
+        raise ValueError(f"Artifact path must be inside {artifacts_dir}")
+    if not resolved.is_file():
+        raise ValueError(f"Artifact not found: {path}")
+    return resolved
+
+
+class AdminService:
+    @staticmethod
+    async def list_models() -> Response:
+        return Response(
+            success=True,
+            data=model_registry.versions(),
+            message="Model versions retrieved successfully",
+            model_version=(
+                model_registry.get().version if model_registry.is_loaded else None
+            ),
+        )
+
+    @staticmethod
+    async def reload_model(request: ModelReloadRequest) -> Response:
+        try:
+            pipeline_path = _resolve_artifact(request.pipeline_path)
+            encoder_path = _resolve_artifact(request.encoder_path)
+
+            logger.info(f"Reloading model from {pipeline_path or 'current paths'}")
+            # Loading and warm-up run on a worker thread; requests keep being
+            # served by the current version until the swap
+            loaded = await run_in_threadpool(
+                model_registry.reload, pipeline_path, encoder_path
+            )
+
+            return Response(
+                success=True,
+                data=loaded.describe(),
+                message="Model reloaded successfully",
+                model_version=loaded.version,
+            )
+
+        except Exception as e:
+            logger.error(f"Error reloading model: {str(e)}")
+            raise
+
+    @staticmethod
+    async def result_store_stats() -> Response:
+        store = get_result_store()
+        if store is None:
+            return Response(success=True, data=None, message="Result store is disabled")
+        return Response(
+            success=True,
+            data=await run_in_threadpool(store.stats),
+            message="Result store statistics retrieved successfully",
+        )
+
+    @staticmethod
+    def _profile_summaries() -> list:
+        if not profiles_dir.is_dir():
+            return []
+        summaries = []
+        for report_path in sorted(profiles_dir.glob("*/report.json"), reverse=True):
+            with open(report_path) as fh:
+                report = json.load(fh)
+            summaries.append(
+                {
+                    "id": report["id"],
+                    "method": report["method"],
+                    "path": report["path"],
+                    "status": report["status"],
+                    "mode": report["mode"],
+                    "duration_seconds": report["duration_seconds"],
+                    "tracemalloc_peak_bytes": report["tracemalloc"]["peak_bytes"],
+                    "files": sorted(p.name for p in report_path.parent.iterdir()),
+                }
+            )
+        return summaries
+
+    @staticmethod
+    async def list_profiles() -> Response:
+        profiles = await run_in_threadpool(AdminService._profile_summaries)
+        return Response(
+            success=True,
+            data=profiles,
+            message="Profiles retrieved successfully",
+        )
+
+    @staticmethod
+    def _zip_profile(profile_id: str) -> bytes:
+        directory = (profiles_dir / profile_id).resolve()
+        if not directory.is_relative_to(profiles_dir) or not directory.is_dir():
+            raise FileNotFoundError(f"Profile {profile_id} not found")
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for path in sorted(directory.iterdir()):
+                archive.write(path, f"{profile_id}/{path.name}")
+        return buffer.getvalue()
+
+    @staticmethod
+    async def profile_archive(profile_id: str) -> bytes:
+        return await run_in_threadpool(AdminService._zip_profile, profile_id)
@@ -0,0 +1,103 @@
+from typing import List, Optional
+from models.exoplanet import ExoplanetData, ProbabilityOptions
+from services.features import apply_derived_features
+from utils.metrics import timed
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FEATURE_COLUMNS = list(ExoplanetData.model_fields)
+
+
+class BatchEngine:
+    def __init__(self, model, encoder, chunk_size: int, compiled=None):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer")
+        self.model = model
+        self.encoder = encoder
+        self.chunk_size = chunk_size
+        # CompiledModel for single records and micro-batches, if it passed parity
+        self.compiled = compiled
+        # Decoded once; indexing this replaces an inverse_transform per call
+        self.labels = np.asarray(
+            [str(label) for label in encoder.classes_], dtype=object
+        )
+
+    @staticmethod
+    def derive_features(df: pd.DataFrame) -> pd.DataFrame:
+        frame = df.reindex(columns=FEATURE_COLUMNS).astype("float64")
+        return apply_derived_features(frame)
+
+    def predict_proba(self, df: pd.DataFrame) -> np.ndarray:
+        with timed("features"):
+            features = self.derive_features(df)
+
+        with timed("predict"):
+            return self.model.predict_proba(features)
+
+    def predict_columns(self, df: pd.DataFrame, probabilities: bool = False) -> tuple:
+        return self.columns_from_proba(self.predict_proba(df), probabilities)
+
+    def columns_from_proba(
+        self, probs: np.ndarray, probabilities: bool = False
+    ) -> tuple:
+        predicted_index = probs.argmax(axis=1)
+        predicted_prob = probs[np.arange(len(probs)), predicted_index]
+        return predicted_index, predicted_prob, probs if probabilities else None
+
+    def predict_chunk(
+        self, df: pd.DataFrame, options: Optional[ProbabilityOptions] = None
+    ) -> list:
+        return self.records_from_proba(self.predict_proba(df), options)
+
+    def predict_records(
+        self, records: List[dict], options: Optional[ProbabilityOptions] = None
+    ) -> list:
+        if self.compiled is None:
+            return self.predict_chunk(pd.DataFrame(records), options)
+
+        with timed("features"):
+            features = self.compiled.features_from_records(records)
+
+        with timed("predict"):
+            probs = self.compiled.predict_proba(features)
+
+        return self.records_from_proba(probs, options)
+
+    def records_from_proba(
+        self, probs: np.ndarray, options: Optional[ProbabilityOptions] = None
+    ) -> list:
+        with timed("encode"):
+            predicted_index = probs.argmax(axis=1)
+            predicted_prob = probs[np.arange(len(probs)), predicted_index]
+            predicted_class = self.labels[predicted_index]
+
+            records = [
+                {
+                    "predicted_class": label,
+                    "predicted_proba": f"{round(float(prob),2)}",
+                }
+                for label, prob in zip(predicted_class, predicted_prob)
+            ]
+            if options is None or not options.requested:
+                return records
+
+            # Everything below reuses the same predict_proba output
+            rounded = np.round(probs.astype("float64"), 6)
+            if options.probabilities:
+                labels = self.labels.tolist()
+                for record, row in zip(records, rounded.tolist()):
+                    record["probabilities"] = dict(zip(labels, row))
+            if options.top_k is not None:
+                k = min(options.top_k, probs.shape[1])
+                top = np.argsort(-probs, axis=1, kind="stable")[:, :k]
+                top_labels = self.labels[top].tolist()
+                top_probs = np.take_along_axis(rounded, top, axis=1).tolist()
+                for record, labels, values in zip(records, top_labels, top_probs):
+                    record["top_k"] = [
+                        {"class": label, "proba": value}
+                        for label, value in zip(labels, values)
+                    ]
+            return records
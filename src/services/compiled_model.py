@@ -0,0 +1,152 @@
+from typing import List, Optional
+from services.batch_engine import FEATURE_COLUMNS, BatchEngine
+from services.features import apply_derived_features_matrix
+import copy
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Probabilities are rounded into the response afterwards, so anything short
+# of an exact match could change what a client sees
+PARITY_TOLERANCE = 0.0
+PARITY_ROWS = 512
+
+
+class CompiledModel:
+    def __init__(
+        self,
+        fill_values: np.ndarray,
+        mean: np.ndarray,
+        scale: np.ndarray,
+        booster,
+        n_classes: int,
+        missing: float = np.nan,
+        iteration_range: tuple = (0, 0),
+    ):
+        # The pipeline flattened to constants in FEATURE_COLUMNS order: median
+        # fill values, the scaler's mean and scale, and the bare booster
+        self.fill_values = fill_values
+        self.mean = mean
+        self.scale = scale
+        self.booster = booster
+        self.n_classes = n_classes
+        self.missing = missing
+        self.iteration_range = iteration_range
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "CompiledModel":
+        names = getattr(pipeline, "feature_names_in_", None)
+        if names is not None and list(names) != FEATURE_COLUMNS:
+            raise ValueError("Pipeline features do not match ExoplanetData")
+
+        n_features = len(FEATURE_COLUMNS)
+        fill_values = np.full(n_features, np.nan)
+        mean = np.zeros(n_features)
+        scale = np.ones(n_features)
+        scaled = False
+        steps = getattr(pipeline, "steps", [(None, pipeline)])
+        for name, step in steps[:-1]:
+            kind = type(step).__name__
+            if kind == "SimpleImputer" and not scaled:
+                statistics = np.asarray(step.statistics_, dtype=np.float64)
+                # An all-missing training column is dropped by the imputer,
+                # which would shift every column after it
+                if step.add_indicator or np.isnan(statistics).any():
+                    raise ValueError(f"Unsupported imputer settings in step {name}")
+                fill_values = np.where(np.isnan(fill_values), statistics, fill_values)
+            elif kind == "StandardScaler" and not scaled:
+                if step.with_mean:
+                    mean = step.mean_
+                if step.with_std:
+                    scale = step.scale_
+                scaled = True
+            else:
+                raise ValueError(f"Cannot compile pipeline step {name} ({kind})")
+
+        classifier = steps[-1][1]
+        if type(classifier).__name__ != "XGBClassifier":
+            raise ValueError(f"Cannot compile estimator {type(classifier).__name__}")
+        # A private copy, so single-row predictions can run on one thread
+        # without changing the booster the batch path uses
+        booster = copy.copy(classifier.get_booster())
+        booster.set_param({"nthread": 1})
+        best = getattr(classifier, "best_iteration", None)
+        iteration_range = (0, best + 1) if best is not None else (0, 0)
+        if not np.isnan(classifier.missing):
+            raise ValueError(f"Unsupported missing value {classifier.missing}")
+
+        return cls(
+            fill_values,
+            np.asarray(mean, dtype=np.float64),
+            np.asarray(scale, dtype=np.float64),
+            booster,
+            int(classifier.n_classes_),
+            classifier.missing,
+            iteration_range,
+        )
+
+    @staticmethod
+    def features_from_records(records: List[dict]) -> np.ndarray:
+        # None becomes NaN, as in the DataFrame path
+        values = np.array(
+            [[record.get(name) for name in FEATURE_COLUMNS] for record in records],
+            dtype=np.float64,
+        )
+        return apply_derived_features_matrix(values, FEATURE_COLUMNS)
+
+    def predict_proba(self, values: np.ndarray) -> np.ndarray:
+        # Imputation and scaling in float64 like sklearn; the booster gets the
+        # float32 matrix XGBoost would have converted to anyway
+        filled = np.where(np.isnan(values), self.fill_values, values)
+        features = ((filled - self.mean) / self.scale).astype(np.float32)
+        probs = self.booster.inplace_predict(
+            features,
+            iteration_range=self.iteration_range,
+            missing=self.missing,
+            validate_features=False,
+        )
+        if probs.ndim == 1:
+            return np.column_stack([1 - probs, probs])
+        return probs
+
+    def parity_error(self, pipeline, rows: int = PARITY_ROWS) -> float:
+        # Synthetic rows around the imputer's medians, with missing cells and
+        # zeros that exercise the derived-feature edge cases
+        rng = np.random.default_rng(0)
+        center = np.where(np.isnan(self.fill_values), 1.0, self.fill_values)
+        values = center * rng.lognormal(0.0, 1.0, (rows, len(FEATURE_COLUMNS)))
+        values[rng.random(values.shape) < 0.1] = np.nan
+        values[rng.random(values.shape) < 0.02] = 0.0
+        records = [
+            {
+                name: None if np.isnan(value) else float(value)
+                for name, value in zip(FEATURE_COLUMNS, row)
+            }
+            for row in values
+        ]
+
+        expected = pipeline.predict_proba(
+            BatchEngine.derive_features(pd.DataFrame(records))
+        )
+        actual = self.predict_proba(self.features_from_records(records))
+        return float(np.max(np.abs(expected - actual)))
+
+
+def compile_pipeline(pipeline) -> Optional[CompiledModel]:
+    try:
+        compiled = CompiledModel.from_pipeline(pipeline)
+        error = compiled.parity_error(pipeline)
+    except Exception as e:
+        logger.warning(f"Single-record path uses the pipeline: {str(e)}")
+        return None
+
+    # Written so that a NaN error fails the check too
+    if not error <= PARITY_TOLERANCE:
+        logger.warning(
+            f"Single-record path uses the pipeline: compiled model differs by {error:.2e}"
+        )
+        return None
+    logger.info("Compiled single-record model matches the pipeline")
+    return compiled
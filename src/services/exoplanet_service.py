@@ -1,60 +1,421 @@
 from pathlib import Path
 from unittest import result
-from models.exoplanet import ExoplanetData, Response
+from models.exoplanet import ExoplanetData, ProbabilityOptions, Response
+from services.file_readers import iter_file_chunks
+from services.batch_engine import FEATURE_COLUMNS
+from services.inference_executor import InferenceExecutor, SharedArray
+from services.micro_batcher import MicroBatcher
+from services.prediction_cache import PredictionCache
+from services.result_encoders import ColumnarResult
+from services.target_service import target_indexer
+from services.target_store import TargetSpool
+from models.validation import validate_frame
+from services.model_registry import (
+    DEFAULT_ENCODER_PATH,
+    DEFAULT_MODEL_PATH,
+    DEFAULT_VERSIONS_DIR,
+    LoadedModel,
+    ModelRegistry,
+)
+from config.env import settings
+from utils.metrics import MODEL_INFO, MODEL_MEMORY, record_batch, timed
+from utils.admission import AdmissionController, current_upload
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 import logging
-import joblib
+import json
+import time
+import numpy as np
 import pandas as pd
-import io
 
 logger = logging.getLogger(__name__)
-model_path = Path().parent / "utils" / "xgb_pipeline.pkl"
-model = joblib.load(model_path)
-encoder_path = Path().parent / "utils" / "label_encoder.pkl"
-encoder = joblib.load(encoder_path)
+model_registry = ModelRegistry(
+    Path(settings.pipeline_path) if settings.pipeline_path else DEFAULT_MODEL_PATH,
+    Path(settings.encoder_path) if settings.encoder_path else DEFAULT_ENCODER_PATH,
+    settings.batch_chunk_size,
+    settings.compiled_model_enabled,
+    (
+        Path(settings.model_versions_dir)
+        if settings.model_versions_dir
+        else DEFAULT_VERSIONS_DIR
+    ),
+    settings.model_versions_keep,
+    settings.model_resolved_versions,
+)
+inference_executor = InferenceExecutor(
+    settings.inference_executor,
+    settings.inference_workers,
+    settings.inference_queue_size,
+    settings.inference_shard_min_rows,
+    settings.inference_priority_workers,
+)
+admission_controller = (
+    AdmissionController(
+        settings.max_concurrent_uploads,
+        settings.max_inflight_rows,
+        settings.max_upload_bytes,
+        settings.max_upload_rows,
+        settings.max_excel_upload_bytes,
+        settings.admission_retry_after_seconds,
+    )
+    if settings.admission_enabled
+    else None
+)
+prediction_cache = (
+    PredictionCache(
+        settings.prediction_cache_size,
+        settings.prediction_cache_ttl_seconds,
+        None,
+    )
+    if settings.prediction_cache_enabled
+    else None
+)
+if prediction_cache is not None:
+    model_registry.add_listener(
+        lambda loaded: prediction_cache.ensure_model_version(loaded.version)
+    )
+
+
+def _export_model_metrics(loaded: LoadedModel) -> None:
+    MODEL_INFO.clear()
+    MODEL_INFO.set(1, version=loaded.version)
+    if loaded.memory_bytes is not None:
+        MODEL_MEMORY.clear()
+        MODEL_MEMORY.set(loaded.memory_bytes, version=loaded.version)
+
+
+model_registry.add_listener(_export_model_metrics)
 
 
 class ExoplanetService:
     @staticmethod
-    async def process_exoplanet_data(data: ExoplanetData) -> Response:
+    @asynccontextmanager
+    async def pinned_model(
+        version: Optional[str] = None,
+    ) -> AsyncIterator[LoadedModel]:
+        loaded = model_registry.try_pin(version)
+        if loaded is None:
+            # First use in lazy mode, or an earlier version that has to be
+            # read back from its stored copy: deserialize off the event loop
+            loaded = await run_in_threadpool(model_registry.pin, version)
         try:
-            logger.info(f"Processing exoplanet data: RA={data.ra}, DEC={data.dec}")
+            yield loaded
+        finally:
+            model_registry.unpin(loaded)
+
+    @staticmethod
+    def classify_record(
+        data: ExoplanetData,
+        model_ref: tuple,
+        options: Optional[ProbabilityOptions] = None,
+    ) -> dict:
+        engine = model_registry.resolve(*model_ref).engine
+        return engine.predict_records([data.model_dump()], options)[0]
+
+    @staticmethod
+    def classify_records(items: list) -> list:
+        # Items are (record, model_ref, options) triples; a micro-batch collected
+        # across a reload can hold records pinned to different versions
+        groups = {}
+        for i, (_, model_ref, options) in enumerate(items):
+            groups.setdefault((model_ref, options), []).append(i)
+
+        result = [None] * len(items)
+        for (model_ref, options), indices in groups.items():
+            records = [items[i][0].model_dump() for i in indices]
+            engine = model_registry.resolve(*model_ref).engine
+            predicted = engine.predict_records(records, options)
+            for i, record in zip(indices, predicted):
+                result[i] = record
+        return result
+
+    @staticmethod
+    def classify_chunk(
+        chunk: pd.DataFrame,
+        model_ref: tuple,
+        options: Optional[ProbabilityOptions] = None,
+    ) -> list:
+        return model_registry.resolve(*model_ref).engine.predict_chunk(chunk, options)
+
+    @staticmethod
+    def classify_chunk_with_proba(
+        chunk: pd.DataFrame,
+        model_ref: tuple,
+        options: Optional[ProbabilityOptions] = None,
+    ) -> tuple:
+        engine = model_registry.resolve(*model_ref).engine
+        probs = engine.predict_proba(chunk)
+        return engine.records_from_proba(probs, options), probs.max(axis=1)
+
+    @staticmethod
+    def classify_chunk_columns(
+        chunk: pd.DataFrame, model_ref: tuple, probabilities: bool = False
+    ) -> tuple:
+        engine = model_registry.resolve(*model_ref).engine
+        return engine.predict_columns(chunk, probabilities)
+
+    @staticmethod
+    def predict_shard(
+        model_ref: tuple,
+        features_spec: tuple,
+        output_spec: tuple,
+        start: int,
+        stop: int,
+    ) -> None:
+        # Runs in a pool worker: reads its rows of the feature matrix and writes
+        # their class probabilities straight into the output block
+        engine = model_registry.resolve(*model_ref).engine
+        features = SharedArray.attach(features_spec)
+        output = SharedArray.attach(output_spec)
+        frame = None
+        try:
+            frame = pd.DataFrame(
+                features.array[start:stop], columns=FEATURE_COLUMNS, copy=False
+            )
+            output.array[start:stop] = engine.predict_proba(frame)
+        finally:
+            frame = None
+            features.close()
+            output.close()
+
+    @staticmethod
+    async def predict_proba_shared(
+        frame: pd.DataFrame, loaded: LoadedModel
+    ) -> np.ndarray:
+        rows = len(frame)
+        features = SharedArray((rows, len(FEATURE_COLUMNS)), np.float64, order="F")
+        output = SharedArray((rows, len(loaded.engine.labels)), np.float32)
+        try:
+            # Column-major, so every column is one contiguous copy
+            with timed("transport"):
+                for i, column in enumerate(FEATURE_COLUMNS):
+                    if column in frame.columns:
+                        features.array[:, i] = frame[column].to_numpy(np.float64)
+                    else:
+                        features.array[:, i] = np.nan
 
-            # Calculation needed before sending the data to the model will happen here!
-            planet_to_star_ratio = data.pl_rade / data.st_rad
-            duration_to_period = data.pl_trandurh / data.pl_orbper
-            depth_to_radius = data.pl_trandep / data.pl_rade
-            insolation_eff_ratio = data.pl_insol / (data.st_teff * 4)
-            eqt_to_insol = data.pl_eqt / (data.pl_insol * 0.25)
-            tran_snr_proxy = data.pl_trandep / data.pl_trandeperr1
-
-            data_dict = data.model_dump()
-            data_dict.update(
-                {
-                    "planet_to_star_ratio": planet_to_star_ratio,
-                    "duration_to_period": duration_to_period,
-                    "depth_to_radius": depth_to_radius,
-                    "insolation_eff_ratio": insolation_eff_ratio,
-                    "eqt_to_insol": eqt_to_insol,
-                    "tran_snr_proxy": tran_snr_proxy,
-                }
+            await inference_executor.run_sharded(
+                ExoplanetService.predict_shard,
+                rows,
+                loaded.ref,
+                features.spec,
+                output.spec,
             )
+            return output.array.copy()
+        finally:
+            features.close()
+            output.close()
 
-            df = pd.DataFrame(data_dict, index=[0])
+    @staticmethod
+    async def predict_records(
+        frame: pd.DataFrame,
+        loaded: LoadedModel,
+        options: Optional[ProbabilityOptions] = None,
+    ) -> list:
+        if inference_executor.shared_memory:
+            probs = await ExoplanetService.predict_proba_shared(frame, loaded)
+            return await run_in_threadpool(
+                loaded.engine.records_from_proba, probs, options
+            )
+        return await inference_executor.run(
+            ExoplanetService.classify_chunk, frame, loaded.ref, options
+        )
+
+    @staticmethod
+    async def predict_records_with_proba(
+        frame: pd.DataFrame,
+        loaded: LoadedModel,
+        options: Optional[ProbabilityOptions] = None,
+    ) -> tuple:
+        # The records plus each row's top probability at full precision, which
+        # the records only carry rounded for display
+        if inference_executor.shared_memory:
+            probs = await ExoplanetService.predict_proba_shared(frame, loaded)
+            records = await run_in_threadpool(
+                loaded.engine.records_from_proba, probs, options
+            )
+            return records, probs.max(axis=1)
+        return await inference_executor.run(
+            ExoplanetService.classify_chunk_with_proba, frame, loaded.ref, options
+        )
+
+    @staticmethod
+    async def predict_columns(
+        frame: pd.DataFrame, loaded: LoadedModel, probabilities: bool = False
+    ) -> tuple:
+        if inference_executor.shared_memory:
+            probs = await ExoplanetService.predict_proba_shared(frame, loaded)
+            return loaded.engine.columns_from_proba(probs, probabilities)
+        return await inference_executor.run(
+            ExoplanetService.classify_chunk_columns, frame, loaded.ref, probabilities
+        )
+
+    @staticmethod
+    def read_chunk(reader) -> Optional[pd.DataFrame]:
+        with timed("parse"):
+            return next(reader, None)
 
-            probs = model.predict_proba(df)[0]
-            predicted_index = probs.argmax()
-            predicted_prob = float(probs[predicted_index])
+    @staticmethod
+    def validate_chunk(chunk: pd.DataFrame):
+        with timed("validation"):
+            return validate_frame(chunk)
+
+    @staticmethod
+    def check_capacity() -> None:
+        inference_executor.check_capacity()
 
-            result = {
-                "predicted_class": f"{encoder.inverse_transform([predicted_index])[0]}",
-                "predicted_proba": f"{round(predicted_prob,2)}",
+    @staticmethod
+    def cache_stats() -> Optional[dict]:
+        if prediction_cache is None:
+            return None
+        return prediction_cache.stats()
+
+    @staticmethod
+    async def classify_chunk_cached(
+        chunk: pd.DataFrame,
+        loaded: LoadedModel,
+        options: Optional[ProbabilityOptions] = None,
+        spool: Optional[TargetSpool] = None,
+    ) -> list:
+        # One vectorized pass coerces every column and flags bad cells; rows
+        # with invalid values get an error record instead of failing the file
+        validated = await run_in_threadpool(ExoplanetService.validate_chunk, chunk)
+        result = [None] * len(chunk)
+        for row, errors in validated.row_errors().items():
+            result[row] = {
+                "predicted_class": None,
+                "predicted_proba": None,
+                "errors": errors,
             }
+        proba = np.full(len(chunk), np.nan, dtype=np.float32)
+
+        positions = np.flatnonzero(~validated.invalid_rows)
+        if len(positions):
+            frame = validated.frame
+            if len(positions) < len(frame):
+                frame = frame.iloc[positions]
+
+            keys = None
+            missed = list(range(len(positions)))
+            if prediction_cache is not None:
+                keys = await run_in_threadpool(
+                    PredictionCache.keys_for_frame,
+                    frame,
+                    loaded.version,
+                    options.variant if options is not None else "",
+                )
+                # Only the rows that missed the cache are sent to the model
+                missed = []
+                for i, (position, key) in enumerate(zip(positions, keys)):
+                    record = prediction_cache.get(key)
+                    if record is None:
+                        missed.append(i)
+                    else:
+                        result[position] = record
+                        # Cached records only hold the rounded value. A row
+                        # scored before by an indexed upload is already in the
+                        # index at full precision, and ingest skips it.
+                        proba[position] = float(record["predicted_proba"])
+
+            if missed:
+                if len(missed) < len(frame):
+                    frame = frame.iloc[missed]
+                if spool is None:
+                    predicted = await ExoplanetService.predict_records(
+                        frame, loaded, options
+                    )
+                else:
+                    predicted, raw = await ExoplanetService.predict_records_with_proba(
+                        frame, loaded, options
+                    )
+                    proba[positions[missed]] = raw
+                for i, record in zip(missed, predicted):
+                    result[positions[i]] = record
+                    if keys is not None:
+                        prediction_cache.put(keys[i], record)
+
+        if spool is not None:
+            await run_in_threadpool(
+                spool.add_records, chunk, result, loaded.engine.labels.tolist(), proba
+            )
+        return result
+
+    @staticmethod
+    async def classify_chunk_columnar(
+        chunk: pd.DataFrame,
+        loaded: LoadedModel,
+        options: Optional[ProbabilityOptions] = None,
+        spool: Optional[TargetSpool] = None,
+    ):
+        # Columnar counterpart of classify_chunk_cached for binary responses. It
+        # skips the prediction cache, whose entries hold rounded string records.
+        validated = await run_in_threadpool(ExoplanetService.validate_chunk, chunk)
+        class_index = np.full(len(chunk), -1, dtype=np.int16)
+        predicted_proba = np.full(len(chunk), np.nan, dtype=np.float32)
+        probabilities = None
+        if options is not None and options.probabilities:
+            probabilities = np.full(
+                (len(chunk), len(loaded.engine.labels)), np.nan, dtype=np.float32
+            )
+
+        positions = np.flatnonzero(~validated.invalid_rows)
+        if len(positions):
+            frame = validated.frame
+            if len(positions) < len(frame):
+                frame = frame.iloc[positions]
+            index, prob, probs = await ExoplanetService.predict_columns(
+                frame, loaded, probabilities is not None
+            )
+            class_index[positions] = index
+            predicted_proba[positions] = prob
+            if probabilities is not None:
+                probabilities[positions] = probs
+
+        if spool is not None:
+            await run_in_threadpool(
+                spool.add_columns, chunk, class_index, predicted_proba
+            )
+        return class_index, predicted_proba, probabilities, validated.row_errors()
+
+    @staticmethod
+    async def process_exoplanet_data(
+        data: ExoplanetData, options: Optional[ProbabilityOptions] = None
+    ) -> Response:
+        try:
+            logger.info(f"Processing exoplanet data: RA={data.ra}, DEC={data.dec}")
+
+            async with ExoplanetService.pinned_model() as loaded:
+                key = None
+                result = None
+                if prediction_cache is not None:
+                    key = PredictionCache.key_for_record(
+                        data.model_dump(),
+                        loaded.version,
+                        options.variant if options is not None else "",
+                    )
+                    result = prediction_cache.get(key)
+
+                if result is None:
+                    if micro_batcher is not None:
+                        result = await micro_batcher.submit((data, loaded.ref, options))
+                    else:
+                        result = await inference_executor.submit(
+                            ExoplanetService.classify_record,
+                            data,
+                            loaded.ref,
+                            options,
+                            priority=True,
+                        )
+                    if key is not None:
+                        prediction_cache.put(key, result)
 
             response = Response(
                 success=True,
                 data=result,
                 message="Exoplanet data processed successfully",
+                model_version=loaded.version,
             )
 
             logger.info("Exoplanet data processed successfully")
@@ -65,37 +426,190 @@ class ExoplanetService:
             raise
 
     @staticmethod
-    async def process_exoplanet_file(file: UploadFile) -> Response:
+    async def iter_exoplanet_file(
+        file: UploadFile,
+        loaded: LoadedModel,
+        classify=None,
+        options: Optional[ProbabilityOptions] = None,
+        spool: Optional[TargetSpool] = None,
+        hold_rows: bool = True,
+    ):
+        classify = classify or ExoplanetService.classify_chunk_cached
+        # Set by the admission middleware; rows stay reserved until the
+        # request ends unless the caller hands each chunk off as it goes
+        ticket = current_upload.get()
+        if ticket is not None:
+            ticket.check_file(file.filename, file.size)
+        await file.seek(0)
+        reader = iter_file_chunks(file.file, file.filename, settings.batch_chunk_size)
+
         try:
-            logger.info(f"Processing uploaded file: {file.filename}")
+            while True:
+                # Parsing is tied to the upload's file handle, so it runs on the
+                # request threadpool; only the model call goes to the inference pool
+                chunk = await run_in_threadpool(ExoplanetService.read_chunk, reader)
+                if chunk is None:
+                    break
+                if chunk.empty:
+                    continue
+                if ticket is not None:
+                    ticket.reserve(len(chunk))
+                result = await classify(chunk, loaded, options, spool)
+                yield result
+                if ticket is not None and not hold_rows:
+                    ticket.release(len(chunk))
+        except pd.errors.EmptyDataError:
+            raise ValueError("The uploaded file is empty")
+        finally:
+            reader.close()
+
+    @staticmethod
+    async def stream_exoplanet_file(
+        file: UploadFile, options: Optional[ProbabilityOptions] = None
+    ):
+        try:
+            logger.info(f"Streaming results for uploaded file: {file.filename}")
 
-            contents = await file.read()
+            index = 0
+            start = time.perf_counter()
+            async with ExoplanetService.pinned_model() as loaded, target_indexer.collect(
+                loaded, file.filename
+            ) as spool:
+                async for chunk_result in ExoplanetService.iter_exoplanet_file(
+                    file, loaded, options=options, spool=spool, hold_rows=False
+                ):
+                    with timed("serialize"):
+                        lines = []
+                        for record in chunk_result:
+                            lines.append(
+                                json.dumps(
+                                    {
+                                        "index": index,
+                                        **record,
+                                        "model_version": loaded.version,
+                                    }
+                                )
+                            )
+                            index += 1
+                        body = ("\n".join(lines) + "\n").encode()
+                    yield body
 
-            if file.filename.endswith(".csv"):
-                df = pd.read_csv(io.BytesIO(contents))
-            elif file.filename.endswith((".xlsx", ".xls")):
-                df = pd.read_excel(io.BytesIO(contents))
-            else:
-                raise ValueError(
-                    "Unsupported file format. Only CSV and Excel are supported."
-                )
-            if df.empty:
+            if index == 0:
                 raise ValueError("The uploaded file is empty")
 
-            # Process the first row (or you can modify to process all rows)
+            record_batch("stream", index, time.perf_counter() - start)
+
+            logger.info(f"Streamed {index} rows of {file.filename}")
+
+        except Exception as e:
+            # The status line is already sent, so the failure goes out as a final record
+            logger.error(f"Error streaming file: {str(e)}")
+            yield (json.dumps({"error": str(e)}) + "\n").encode()
+
+        finally:
+            await file.close()
+
+    @staticmethod
+    async def process_exoplanet_file(
+        file: UploadFile, options: Optional[ProbabilityOptions] = None
+    ) -> Response:
+        try:
+            logger.info(f"Processing uploaded file: {file.filename}")
+            inference_executor.check_capacity()
+
             result = []
-            for index, row in df.iterrows():
-                exoplanet_data = ExoplanetData(**row.to_dict())
-                response = await ExoplanetService.process_exoplanet_data(exoplanet_data)
-                result.append(response.data)
+            start = time.perf_counter()
+            # Pinned for the whole file so a reload mid-upload cannot mix versions
+            async with ExoplanetService.pinned_model() as loaded, target_indexer.collect(
+                loaded, file.filename
+            ) as spool:
+                async for chunk_result in ExoplanetService.iter_exoplanet_file(
+                    file, loaded, options=options, spool=spool
+                ):
+                    result.extend(chunk_result)
+                    logger.info(f"Processed {len(result)} rows of {file.filename}")
+
+            if not result:
+                raise ValueError("The uploaded file is empty")
+            record_batch("upload", len(result), time.perf_counter() - start)
+
+            message = "Exoplanet file processed successfully"
+            invalid = sum(1 for record in result if "errors" in record)
+            if invalid:
+                message = f"{message} ({invalid} rows failed validation)"
 
             logger.info("File processed successfully")
             return Response(
                 success=True,
                 data=result,
-                message="Exoplanet file processed successfully",
+                message=message,
+                model_version=loaded.version,
+            )
+
+        except Exception as e:
+            logger.error(f"Error processing file: {str(e)}")
+            raise
+
+    @staticmethod
+    async def process_exoplanet_file_columnar(
+        file: UploadFile, options: Optional[ProbabilityOptions] = None
+    ) -> ColumnarResult:
+        try:
+            logger.info(f"Processing uploaded file as columns: {file.filename}")
+            inference_executor.check_capacity()
+
+            class_index = []
+            predicted_proba = []
+            probabilities = []
+            errors = {}
+            rows = 0
+            start = time.perf_counter()
+            async with ExoplanetService.pinned_model() as loaded, target_indexer.collect(
+                loaded, file.filename
+            ) as spool:
+                chunks = ExoplanetService.iter_exoplanet_file(
+                    file,
+                    loaded,
+                    ExoplanetService.classify_chunk_columnar,
+                    options,
+                    spool,
+                )
+                async for index, prob, probs, row_errors in chunks:
+                    for row, row_error in row_errors.items():
+                        errors[rows + row] = row_error
+                    class_index.append(index)
+                    predicted_proba.append(prob)
+                    if probs is not None:
+                        probabilities.append(probs)
+                    rows += len(index)
+                    logger.info(f"Processed {rows} rows of {file.filename}")
+
+            if rows == 0:
+                raise ValueError("The uploaded file is empty")
+            record_batch("upload", rows, time.perf_counter() - start)
+
+            logger.info("File processed successfully")
+            return ColumnarResult(
+                loaded.engine.labels.tolist(),
+                np.concatenate(class_index),
+                np.concatenate(predicted_proba),
+                errors,
+                loaded.version,
+                np.concatenate(probabilities) if probabilities else None,
             )
 
         except Exception as e:
             logger.error(f"Error processing file: {str(e)}")
             raise
+
+
+micro_batcher = (
+    MicroBatcher(
+        ExoplanetService.classify_records,
+        inference_executor,
+        settings.micro_batch_max_size,
+        settings.micro_batch_max_wait_ms,
+    )
+    if settings.micro_batch_enabled
+    else None
+)
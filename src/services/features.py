@@ -0,0 +1,63 @@
+from typing import Dict, Mapping
+import numpy as np
+import pandas as pd
+
+DERIVED_FEATURES = (
+    "planet_to_star_ratio",
+    "duration_to_period",
+    "depth_to_radius",
+    "insolation_eff_ratio",
+    "eqt_to_insol",
+    "tran_snr_proxy",
+)
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    # Missing inputs, zero denominators and overflows all yield NaN, which
+    # XGBoost treats as a missing value. inf would be rejected by the
+    # pipeline and fail the whole batch.
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        result = np.true_divide(numerator, denominator)
+    result[~np.isfinite(result)] = np.nan
+    return result
+
+
+def derive_features(columns: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    pl_rade = columns["pl_rade"]
+    pl_trandep = columns["pl_trandep"]
+    pl_insol = columns["pl_insol"]
+
+    return {
+        "planet_to_star_ratio": _ratio(pl_rade, columns["st_rad"]),
+        "duration_to_period": _ratio(columns["pl_trandurh"], columns["pl_orbper"]),
+        "depth_to_radius": _ratio(pl_trandep, pl_rade),
+        "insolation_eff_ratio": _ratio(pl_insol, columns["st_teff"] * 4),
+        "eqt_to_insol": _ratio(columns["pl_eqt"], pl_insol * 0.25),
+        "tran_snr_proxy": _ratio(pl_trandep, columns["pl_trandeperr1"]),
+    }
+
+
+def apply_derived_features(frame: pd.DataFrame) -> pd.DataFrame:
+    # frame holds every ExoplanetData column as float64 and is updated in place
+    derived = derive_features({name: frame[name].to_numpy() for name in frame.columns})
+
+    for name, values in derived.items():
+        # A derived value wins when it can be computed; otherwise a value the
+        # caller supplied for the feature is kept instead of being discarded
+        provided = frame[name].to_numpy()
+        frame[name] = np.where(np.isnan(values), provided, values)
+
+    return frame
+
+
+def apply_derived_features_matrix(values: np.ndarray, columns: list) -> np.ndarray:
+    # Same rules as apply_derived_features, on a (rows, columns) float64 matrix
+    # in the given column order; values is updated in place
+    index = {name: i for i, name in enumerate(columns)}
+    derived = derive_features({name: values[:, i] for name, i in index.items()})
+
+    for name, computed in derived.items():
+        i = index[name]
+        values[:, i] = np.where(np.isnan(computed), values[:, i], computed)
+
+    return values
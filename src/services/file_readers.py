@@ -0,0 +1,137 @@
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional
+from services.batch_engine import FEATURE_COLUMNS
+import pandas as pd
+
+CSV_EXTENSIONS = (".csv",)
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc", ".arrows")
+SUPPORTED_EXTENSIONS = (
+    CSV_EXTENSIONS + EXCEL_EXTENSIONS + PARQUET_EXTENSIONS + ARROW_EXTENSIONS
+)
+UNSUPPORTED_FORMAT_MESSAGE = "Only CSV, Excel, Parquet and Arrow files are supported"
+
+_FEATURE_SET = frozenset(FEATURE_COLUMNS)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet and Arrow uploads require the pyarrow package")
+    return pyarrow
+
+
+def _projected(names: List[str]) -> List[str]:
+    return [name for name in FEATURE_COLUMNS if name in set(names)]
+
+
+def _batch_to_frame(batch, columns: List[str]) -> pd.DataFrame:
+    # Null-free float64 columns come out as views over the Arrow buffers; only
+    # columns with nulls or other dtypes are materialized
+    return pd.DataFrame(
+        {name: batch.column(name).to_numpy(zero_copy_only=False) for name in columns},
+        copy=False,
+    )
+
+
+def _iter_arrow_batches(batches, columns: List[str], chunk_size: int):
+    for batch in batches:
+        for start in range(0, batch.num_rows, chunk_size):
+            yield _batch_to_frame(batch.slice(start, chunk_size), columns)
+
+
+def _open_arrow(file: BinaryIO):
+    pa = _import_pyarrow()
+
+    # Files on disk (spooled uploads, job inputs) are memory-mapped so that
+    # only the projected columns' pages are ever read
+    source = file
+    name = getattr(file, "name", None)
+    if isinstance(name, str) and Path(name).is_file():
+        source = pa.memory_map(name)
+
+    try:
+        return pa.ipc.open_file(source)
+    except pa.ArrowInvalid:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return pa.ipc.open_stream(source)
+
+
+def iter_file_chunks(
+    file: BinaryIO, filename: str, chunk_size: int
+) -> Iterator[pd.DataFrame]:
+    filename = filename.lower()
+
+    if filename.endswith(CSV_EXTENSIONS):
+        # The reader pulls from the upload spool as it goes, so only one chunk
+        # of rows is parsed and held at a time
+        with pd.read_csv(
+            file, chunksize=chunk_size, usecols=lambda c: c in _FEATURE_SET
+        ) as reader:
+            for chunk in reader:
+                yield chunk
+    elif filename.endswith(EXCEL_EXTENSIONS):
+        # Excel workbooks cannot be parsed incrementally by pandas
+        df = pd.read_excel(file, usecols=lambda c: c in _FEATURE_SET)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start : start + chunk_size]
+    elif filename.endswith(PARQUET_EXTENSIONS):
+        pa = _import_pyarrow()
+        parquet = pa.parquet.ParquetFile(file)
+        columns = _projected(parquet.schema_arrow.names)
+        yield from _iter_arrow_batches(
+            parquet.iter_batches(batch_size=chunk_size, columns=columns),
+            columns,
+            chunk_size,
+        )
+    elif filename.endswith(ARROW_EXTENSIONS):
+        reader = _open_arrow(file)
+        columns = _projected(reader.schema.names)
+        if hasattr(reader, "num_record_batches"):
+            batches = (
+                reader.get_batch(i).select(columns)
+                for i in range(reader.num_record_batches)
+            )
+        else:
+            batches = (batch.select(columns) for batch in reader)
+        yield from _iter_arrow_batches(batches, columns, chunk_size)
+    else:
+        raise ValueError(f"Unsupported file format. {UNSUPPORTED_FORMAT_MESSAGE}.")
+
+
+def count_rows(path: Path, filename: str) -> Optional[int]:
+    filename = filename.lower()
+
+    if filename.endswith(PARQUET_EXTENSIONS):
+        pa = _import_pyarrow()
+        return pa.parquet.ParquetFile(path).metadata.num_rows
+
+    if filename.endswith(ARROW_EXTENSIONS):
+        with open(path, "rb") as fh:
+            reader = _open_arrow(fh)
+            if hasattr(reader, "num_record_batches"):
+                return sum(
+                    reader.get_batch(i).num_rows
+                    for i in range(reader.num_record_batches)
+                )
+        return None
+
+    if not filename.endswith(CSV_EXTENSIONS):
+        return None
+
+    # A newline count is a cheap upper bound for progress reporting; quoted
+    # fields that span lines make it overshoot slightly
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
@@ -0,0 +1,211 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, List, Optional, Tuple
+from utils.metrics import ADMISSION_DECISIONS, collect_stages, observe_stage
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ("thread", "process", "shm")
+
+
+class ExecutorBusyError(Exception):
+    pass
+
+
+class SharedArray:
+    def __init__(
+        self,
+        shape: tuple,
+        dtype,
+        order: str = "C",
+        name: Optional[str] = None,
+    ):
+        # The API process creates the block; workers attach to it by name, so
+        # only the (name, shape, dtype, order) spec is pickled per task
+        dtype = np.dtype(dtype)
+        self.owner = name is None
+        if self.owner:
+            size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.spec = (self._shm.name, tuple(shape), dtype.str, order)
+        self.array = np.ndarray(shape, dtype, buffer=self._shm.buf, order=order)
+
+    @classmethod
+    def attach(cls, spec: tuple) -> "SharedArray":
+        name, shape, dtype, order = spec
+        return cls(shape, dtype, order, name=name)
+
+    def close(self) -> None:
+        self.array = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A view is still referenced (e.g. by a traceback); the mapping is
+            # released together with it
+            logger.warning(f"Shared block {self._shm.name} still has live views")
+        if self.owner:
+            self._shm.unlink()
+
+
+def _call_with_stages(fn: Callable, *args: Any) -> Tuple[Any, list]:
+    # Runs in a pool process, whose own metrics are never scraped: its stage
+    # timings travel back with the result and are observed by the API process
+    with collect_stages() as timings:
+        return fn(*args), timings
+
+
+def _limit_worker_threads(threads: int) -> None:
+    # Each worker gets its share of the cores instead of every worker's
+    # OpenMP pool claiming all of them
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(threads)
+
+
+class InferenceExecutor:
+    def __init__(
+        self,
+        kind: str,
+        max_workers: int,
+        queue_size: int,
+        shard_min_rows: int = 1024,
+        priority_workers: int = 1,
+    ):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown inference executor kind: {kind}")
+        if shard_min_rows <= 0:
+            raise ValueError("shard_min_rows must be a positive integer")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.shard_min_rows = shard_min_rows
+        self.priority_workers = priority_workers
+        self.pending = 0
+        self.priority_pending = 0
+        self._pool: Optional[Executor] = None
+        self._priority_pool: Optional[Executor] = None
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.queue_size
+
+    @property
+    def shared_memory(self) -> bool:
+        return self.kind == "shm"
+
+    @property
+    def pool(self) -> Executor:
+        if self._pool is None:
+            logger.info(
+                f"Starting {self.kind} inference pool with {self.max_workers} workers"
+            )
+            if self.kind == "shm":
+                # Created on first use, after the model is loaded, so forked
+                # workers share the booster's pages with the API process
+                threads = max(1, (os.cpu_count() or 1) // self.max_workers)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_limit_worker_threads,
+                    initargs=(threads,),
+                )
+            elif self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="inference"
+                )
+        return self._pool
+
+    @property
+    def priority_pool(self) -> Executor:
+        if self.priority_workers <= 0:
+            return self.pool
+        if self._priority_pool is None:
+            # Single records get threads of their own, so they never queue
+            # behind the chunks of a large upload, whatever the pool kind
+            self._priority_pool = ThreadPoolExecutor(
+                max_workers=self.priority_workers,
+                thread_name_prefix="inference-priority",
+            )
+        return self._priority_pool
+
+    def check_capacity(self, priority: bool = False) -> None:
+        if priority:
+            pending = self.priority_pending
+            capacity = max(self.priority_workers, 1) + self.queue_size
+        else:
+            pending = self.pending
+            capacity = self.capacity
+        if pending >= capacity:
+            ADMISSION_DECISIONS.inc(
+                lane="single" if priority else "batch", decision="busy"
+            )
+            raise ExecutorBusyError(
+                f"Inference queue is full ({pending} tasks pending)"
+            )
+
+    async def run(self, fn: Callable, *args: Any, priority: bool = False) -> Any:
+        # Work that was already admitted (e.g. later chunks of an upload) waits
+        # for a worker instead of being rejected
+        loop = asyncio.get_running_loop()
+        pool = self.priority_pool if priority else self.pool
+        if priority:
+            self.priority_pending += 1
+        else:
+            self.pending += 1
+        try:
+            if isinstance(pool, ProcessPoolExecutor):
+                result, timings = await loop.run_in_executor(
+                    pool, functools.partial(_call_with_stages, fn, *args)
+                )
+                for stage, seconds in timings:
+                    observe_stage(stage, seconds)
+                return result
+            # Threads run in a copy of the caller's context, so their stage
+            # timings count towards the request that submitted them
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                pool, functools.partial(context.run, fn, *args)
+            )
+        finally:
+            if priority:
+                self.priority_pending -= 1
+            else:
+                self.pending -= 1
+
+    async def submit(self, fn: Callable, *args: Any, priority: bool = False) -> Any:
+        self.check_capacity(priority)
+        return await self.run(fn, *args, priority=priority)
+
+    def shards(self, rows: int) -> List[Tuple[int, int]]:
+        count = max(1, min(self.max_workers, rows // self.shard_min_rows))
+        return [(rows * i // count, rows * (i + 1) // count) for i in range(count)]
+
+    async def run_sharded(self, fn: Callable, rows: int, *args: Any) -> list:
+        # fn(*args, start, stop) runs once per contiguous row range. Every shard
+        # is awaited before an error is raised, so none is still writing to
+        # shared memory when the caller releases it.
+        results = await asyncio.gather(
+            *(self.run(fn, *args, start, stop) for start, stop in self.shards(rows)),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    def shutdown(self) -> None:
+        if self._priority_pool is not None:
+            self._priority_pool.shutdown(wait=True, cancel_futures=True)
+            self._priority_pool = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,395 @@
+from pathlib import Path
+from typing import Optional
+from models.exoplanet import Response
+from services.exoplanet_service import ExoplanetService, admission_controller
+from services.file_readers import count_rows, iter_file_chunks
+from services.job_store import FINISHED_STATUSES, JobStore
+from services.target_service import target_indexer
+from config.env import settings
+from utils.admission import current_upload
+from utils.metrics import record_batch
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+import asyncio
+import json
+import logging
+import os
+import shutil
+import socket
+import time
+import uuid
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "jobs"
+
+
+class JobNotFoundError(Exception):
+    pass
+
+
+class JobInterruptedError(Exception):
+    pass
+
+
+class JobManager:
+    def __init__(
+        self,
+        jobs_dir: Path,
+        max_concurrent: int,
+        retention_seconds: float,
+        lease_seconds: float,
+    ):
+        self.jobs_dir = Path(jobs_dir)
+        self.max_concurrent = max_concurrent
+        self.retention_seconds = retention_seconds
+        self.lease_seconds = lease_seconds
+        self._owner: Optional[str] = None
+        self._store: Optional[JobStore] = None
+        self._tasks: dict = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._shutting_down = False
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = JobStore(self.jobs_dir / "jobs.sqlite3")
+        return self._store
+
+    @property
+    def owner(self) -> str:
+        # Set on first use rather than at import, so forked workers differ
+        if self._owner is None:
+            self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        return self._owner
+
+    def _schedule(self, job_id: str) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        task = asyncio.get_running_loop().create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def submit(self, file: UploadFile) -> dict:
+        ticket = current_upload.get()
+        if ticket is not None:
+            ticket.check_file(file.filename, file.size)
+
+        job_id = uuid.uuid4().hex
+        job_dir = self.jobs_dir / job_id
+        upload_path = job_dir / Path(file.filename).name
+
+        def save() -> None:
+            job_dir.mkdir(parents=True, exist_ok=True)
+            file.file.seek(0)
+            with open(upload_path, "wb") as out:
+                shutil.copyfileobj(file.file, out, 1024 * 1024)
+
+        await run_in_threadpool(save)
+        job = await run_in_threadpool(
+            self.store.create_job,
+            job_id,
+            file.filename,
+            upload_path,
+            self.owner,
+            self.lease_seconds,
+        )
+        self._schedule(job_id)
+        logger.info(f"Queued job {job_id} for {file.filename}")
+        return job
+
+    async def _run(self, job_id: str) -> None:
+        job = await run_in_threadpool(self.store.get_job, job_id)
+        if job is None:
+            return
+
+        completed = False
+        try:
+            while True:
+                # Waited for inside the try, so a job cancelled while queued
+                # still has its files removed below
+                async with self._semaphore:
+                    claimed = await run_in_threadpool(
+                        self.store.claim, job_id, self.owner, self.lease_seconds
+                    )
+                    if claimed is not None:
+                        await self._process(claimed)
+                        completed = True
+                        break
+
+                job = await run_in_threadpool(self.store.get_job, job_id)
+                if job is None or job["status"] in FINISHED_STATUSES:
+                    if job is not None and job["status"] == "cancelled":
+                        await run_in_threadpool(self._remove_files, job, True)
+                    return
+                # Another worker holds the lease; take over if it stops renewing
+                await asyncio.sleep(max(job["lease_until"] - time.time(), 0) + 1)
+
+            if await run_in_threadpool(self.store.finish, job_id, "completed"):
+                logger.info(f"Job {job_id} completed")
+            else:
+                logger.info(f"Job {job_id} was cancelled as it completed")
+        except asyncio.CancelledError:
+            # On shutdown the job stays running and is resumed on next start
+            if self._shutting_down:
+                await run_in_threadpool(self.store.release, job_id, self.owner)
+            else:
+                await run_in_threadpool(self.store.finish, job_id, "cancelled")
+                await run_in_threadpool(self._remove_files, job, True)
+            raise
+        except JobInterruptedError:
+            job = await run_in_threadpool(self.store.get_job, job_id)
+            if job is None or job["status"] != "cancelled":
+                # Its files now belong to the worker that took it over
+                logger.warning(f"Job {job_id} was taken over by another worker")
+                return
+            logger.info(f"Job {job_id} stopped after it was cancelled")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            await run_in_threadpool(self.store.finish, job_id, "failed", str(e))
+        # A completed job's target spool is still being indexed, and the
+        # indexer removes it when done
+        await run_in_threadpool(self._remove_files, job, not completed)
+        await self.purge()
+
+    @staticmethod
+    def _remove_files(job: dict, with_spool: bool) -> None:
+        # Results live in the store; the upload is only needed to resume
+        upload_path = Path(job["upload_path"])
+        if with_spool:
+            shutil.rmtree(upload_path.parent, ignore_errors=True)
+        else:
+            upload_path.unlink(missing_ok=True)
+
+    async def purge(self) -> None:
+        jobs = await run_in_threadpool(
+            self.store.purge_finished, time.time() - self.retention_seconds
+        )
+        for job in jobs:
+            await run_in_threadpool(self._remove_files, job, True)
+        if jobs:
+            logger.info(f"Removed {len(jobs)} jobs older than the retention period")
+
+    async def _process(self, job: dict) -> None:
+        job_id = job["id"]
+        upload_path = Path(job["upload_path"])
+        rows_done = job["rows_done"]
+
+        if job["rows_total"] is None:
+            rows_total = await run_in_threadpool(
+                count_rows, upload_path, job["filename"]
+            )
+            await run_in_threadpool(self.store.set_rows_total, job_id, rows_total)
+            # CSV counts are an upper bound, so this is only a first check
+            if rows_total is not None and admission_controller is not None:
+                admission_controller.check_rows(rows_total)
+
+        start_time = time.perf_counter()
+        # A resumed job keeps the version it started with, so its rows are
+        # never scored by two models. If that version is gone, the job fails.
+        async with ExoplanetService.pinned_model(job["model_version"]) as loaded:
+            running = await run_in_threadpool(
+                self.store.mark_running,
+                job_id,
+                loaded.version,
+                self.owner,
+                self.lease_seconds,
+            )
+            if not running:
+                raise JobInterruptedError(job_id)
+            # Kept next to the upload, so a resumed job indexes its earlier rows too
+            spool = target_indexer.spool(upload_path.parent / "targets.npy")
+
+            with open(upload_path, "rb") as fh:
+                reader = iter_file_chunks(
+                    fh, job["filename"], settings.batch_chunk_size
+                )
+                try:
+                    position = 0
+                    while True:
+                        chunk = await run_in_threadpool(
+                            ExoplanetService.read_chunk, reader
+                        )
+                        if chunk is None:
+                            break
+                        # Also re-reads the status, so a job cancelled by any
+                        # worker stops before its next chunk
+                        renewed = await run_in_threadpool(
+                            self.store.renew_lease,
+                            job_id,
+                            self.owner,
+                            self.lease_seconds,
+                        )
+                        if not renewed:
+                            raise JobInterruptedError(job_id)
+
+                        # Skip rows already committed before a restart
+                        start = position
+                        position += len(chunk)
+                        if admission_controller is not None:
+                            admission_controller.check_rows(position)
+                        if position <= rows_done:
+                            continue
+                        if start < rows_done:
+                            chunk = chunk.iloc[rows_done - start :]
+                            start = rows_done
+                        if chunk.empty:
+                            continue
+
+                        chunk_result = await ExoplanetService.classify_chunk_cached(
+                            chunk, loaded, spool=spool
+                        )
+                        await run_in_threadpool(
+                            self.store.append_results, job_id, start, chunk_result
+                        )
+                except pd.errors.EmptyDataError:
+                    raise ValueError("The uploaded file is empty")
+                finally:
+                    reader.close()
+
+            if spool is not None:
+                target_indexer.submit(spool, loaded, job["filename"])
+
+        rows = max(position - rows_done, 0)
+        record_batch("job", rows, time.perf_counter() - start_time)
+
+    def progress(self, job_id: str) -> dict:
+        job = self.store.get_job(job_id)
+        if job is None:
+            raise JobNotFoundError(f"Job {job_id} not found")
+
+        rows_per_second = None
+        eta_seconds = None
+        if job["started_at"] is not None and job["rows_done"]:
+            elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+            if elapsed > 0:
+                rows_per_second = job["rows_done"] / elapsed
+        if (
+            rows_per_second
+            and job["rows_total"] is not None
+            and job["status"] == "running"
+        ):
+            eta_seconds = max(job["rows_total"] - job["rows_done"], 0) / rows_per_second
+
+        for column in ("upload_path", "owner", "lease_until"):
+            job.pop(column)
+        return {
+            **job,
+            "rows_per_second": round(rows_per_second, 1) if rows_per_second else None,
+            "eta_seconds": round(eta_seconds, 1) if eta_seconds is not None else None,
+        }
+
+    async def cancel(self, job_id: str) -> dict:
+        job = await run_in_threadpool(self.store.get_job, job_id)
+        if job is None:
+            raise JobNotFoundError(f"Job {job_id} not found")
+
+        if job["status"] not in FINISHED_STATUSES:
+            await run_in_threadpool(self.store.finish, job_id, "cancelled")
+            task = self._tasks.get(job_id)
+            if task is not None:
+                task.cancel()
+            logger.info(f"Job {job_id} cancelled")
+        return await run_in_threadpool(self.progress, job_id)
+
+    async def resume(self) -> None:
+        await self.purge()
+        jobs = await run_in_threadpool(self.store.unfinished_jobs)
+        for job in jobs:
+            logger.info(f"Resuming job {job['id']} from row {job['rows_done']}")
+            self._schedule(job["id"])
+
+    async def shutdown(self) -> None:
+        self._shutting_down = True
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+
+job_manager = JobManager(
+    Path(settings.jobs_dir) if settings.jobs_dir else DEFAULT_JOBS_DIR,
+    settings.jobs_max_concurrent,
+    settings.jobs_retention_seconds,
+    settings.jobs_lease_seconds,
+)
+
+
+class JobService:
+    @staticmethod
+    async def submit_job(file: UploadFile) -> Response:
+        try:
+            logger.info(f"Submitting batch job for {file.filename}")
+            job = await job_manager.submit(file)
+            return Response(
+                success=True,
+                data={"job_id": job["id"], "status": job["status"]},
+                message="Job queued successfully",
+            )
+
+        except Exception as e:
+            logger.error(f"Error submitting job: {str(e)}")
+            raise
+
+    @staticmethod
+    async def list_jobs(limit: int) -> Response:
+        jobs = await run_in_threadpool(job_manager.store.list_jobs, limit)
+        for job in jobs:
+            for column in ("upload_path", "owner", "lease_until"):
+                job.pop(column)
+        return Response(success=True, data=jobs, message="Jobs retrieved successfully")
+
+    @staticmethod
+    async def get_job(job_id: str) -> Response:
+        progress = await run_in_threadpool(job_manager.progress, job_id)
+        return Response(
+            success=True,
+            data=progress,
+            message="Job retrieved successfully",
+            model_version=progress["model_version"],
+        )
+
+    @staticmethod
+    async def get_results(job_id: str, offset: int, limit: int) -> Response:
+        progress = await run_in_threadpool(job_manager.progress, job_id)
+        items = await run_in_threadpool(
+            job_manager.store.get_results, job_id, offset, limit
+        )
+        return Response(
+            success=True,
+            data={
+                "items": items,
+                "offset": offset,
+                "limit": limit,
+                "rows_done": progress["rows_done"],
+                "status": progress["status"],
+            },
+            message="Job results retrieved successfully",
+            model_version=progress["model_version"],
+        )
+
+    @staticmethod
+    async def stream_results(job_id: str, page_size: int):
+        offset = 0
+        while True:
+            items = await run_in_threadpool(
+                job_manager.store.get_results, job_id, offset, page_size
+            )
+            if not items:
+                break
+            yield ("\n".join(json.dumps(item) for item in items) + "\n").encode()
+            offset = items[-1]["index"] + 1
+
+    @staticmethod
+    async def cancel_job(job_id: str) -> Response:
+        progress = await job_manager.cancel(job_id)
+        return Response(
+            success=True,
+            data=progress,
+            message="Job cancelled successfully",
+            model_version=progress["model_version"],
+        )
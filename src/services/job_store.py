@@ -0,0 +1,261 @@
+from pathlib import Path
+from typing import List, Optional
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    upload_path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    rows_total INTEGER,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    model_version TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (job_id, row_index)
+) WITHOUT ROWID;
+"""
+
+JOB_COLUMNS = (
+    "id",
+    "filename",
+    "upload_path",
+    "status",
+    "rows_total",
+    "rows_done",
+    "model_version",
+    "error",
+    "created_at",
+    "started_at",
+    "finished_at",
+    "owner",
+    "lease_until",
+)
+
+# Columns added after the first release, for databases created before them
+MIGRATED_COLUMNS = (("owner", "TEXT"), ("lease_until", "REAL"))
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._lock = threading.Lock()
+
+    def _migrate(self) -> None:
+        for column, kind in MIGRATED_COLUMNS:
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if column in existing:
+                continue
+            try:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            except sqlite3.OperationalError:
+                # Another worker added it meanwhile
+                existing = {
+                    row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")
+                }
+                if column not in existing:
+                    raise
+
+    @staticmethod
+    def _row_to_job(row) -> Optional[dict]:
+        if row is None:
+            return None
+        return dict(zip(JOB_COLUMNS, row))
+
+    def create_job(
+        self,
+        job_id: str,
+        filename: str,
+        upload_path: Path,
+        owner: str,
+        lease_seconds: float,
+    ) -> dict:
+        # Leased from the start, so a worker that starts up meanwhile does not
+        # take over a job that is only waiting in this worker's queue
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, filename, upload_path, status, created_at, "
+                "owner, lease_until) VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, filename, str(upload_path), now, owner, now + lease_seconds),
+            )
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row)
+
+    def list_jobs(self, limit: int = 100) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs "
+                "ORDER BY created_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def unfinished_jobs(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs "
+                "WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> Optional[dict]:
+        # A single UPDATE, so of several workers resuming the same job only one
+        # gets it: it must be unfinished and unowned, ours, or its lease expired
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET owner = ?, lease_until = ? "
+                "WHERE id = ? AND status IN ('queued', 'running') "
+                "AND (owner IS NULL OR owner = ? OR lease_until < ?)",
+                (owner, now + lease_seconds, job_id, owner, now),
+            )
+        if cursor.rowcount != 1:
+            return None
+        return self.get_job(job_id)
+
+    def renew_lease(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        # False once the job was cancelled or another worker took it over
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_until = ? "
+                "WHERE id = ? AND owner = ? AND status = 'running'",
+                (time.time() + lease_seconds, job_id, owner),
+            )
+        return cursor.rowcount == 1
+
+    def release(self, job_id: str, owner: str) -> None:
+        # On shutdown, so the next worker to start resumes the job right away
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET owner = NULL, lease_until = NULL "
+                "WHERE id = ? AND owner = ?",
+                (job_id, owner),
+            )
+
+    def mark_running(
+        self, job_id: str, model_version: str, owner: str, lease_seconds: float
+    ) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'running', "
+                "model_version = COALESCE(model_version, ?), "
+                "started_at = COALESCE(started_at, ?), lease_until = ? "
+                "WHERE id = ? AND owner = ? AND status IN ('queued', 'running')",
+                (
+                    model_version,
+                    time.time(),
+                    time.time() + lease_seconds,
+                    job_id,
+                    owner,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def set_rows_total(self, job_id: str, rows_total: Optional[int]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET rows_total = ? WHERE id = ?", (rows_total, job_id)
+            )
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None) -> bool:
+        # A job that already finished keeps its status: a job cancelled while
+        # its last chunk was scored stays cancelled. False in that case.
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, "
+                "owner = NULL, lease_until = NULL "
+                "WHERE id = ? AND status NOT IN ('completed', 'failed', 'cancelled')",
+                (status, error, time.time(), job_id),
+            )
+        return cursor.rowcount == 1
+
+    def append_results(self, job_id: str, start_index: int, records: list) -> None:
+        # Results and progress are committed together, so after a crash
+        # rows_done always matches what is stored and the job resumes from there
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO results (job_id, row_index, payload) "
+                    "VALUES (?, ?, ?)",
+                    (
+                        (job_id, start_index + i, json.dumps(record))
+                        for i, record in enumerate(records)
+                    ),
+                )
+                self._conn.execute(
+                    "UPDATE jobs SET rows_done = ? WHERE id = ?",
+                    (start_index + len(records), job_id),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_results(self, job_id: str, offset: int, limit: int) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT row_index, payload FROM results "
+                "WHERE job_id = ? AND row_index >= ? ORDER BY row_index LIMIT ?",
+                (job_id, offset, limit),
+            ).fetchall()
+        return [{"index": index, **json.loads(payload)} for index, payload in rows]
+
+    def purge_finished(self, before: float) -> List[dict]:
+        # Jobs that finished before the cutoff are removed with their results
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs "
+                "WHERE status IN ('completed', 'failed', 'cancelled') "
+                "AND finished_at < ?",
+                (before,),
+            ).fetchall()
+            jobs = [self._row_to_job(row) for row in rows]
+            if not jobs:
+                return []
+            self._conn.execute("BEGIN")
+            try:
+                for job in jobs:
+                    self._conn.execute(
+                        "DELETE FROM results WHERE job_id = ?", (job["id"],)
+                    )
+                    self._conn.execute("DELETE FROM jobs WHERE id = ?", (job["id"],))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return jobs
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,360 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+from services.batch_engine import FEATURE_COLUMNS, BatchEngine
+from services.compiled_model import CompiledModel, compile_pipeline
+from utils.metrics import current_rss_bytes
+import gc
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import joblib
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ARTIFACTS_DIR = Path(__file__).resolve().parent.parent / "utils"
+DEFAULT_MODEL_PATH = ARTIFACTS_DIR / "xgb_pipeline.pkl"
+DEFAULT_ENCODER_PATH = ARTIFACTS_DIR / "label_encoder.pkl"
+DEFAULT_VERSIONS_DIR = (
+    Path(__file__).resolve().parent.parent.parent / "data" / "models"
+)
+MODEL_FILENAME = "xgb_pipeline.pkl"
+ENCODER_FILENAME = "label_encoder.pkl"
+
+
+def artifact_version(model_path: Path, encoder_path: Path) -> str:
+    # Both files, so a new label encoder alone is a new version too
+    digest = hashlib.sha256()
+    for path in (model_path, encoder_path):
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class ModelVersionMismatchError(Exception):
+    pass
+
+
+class LoadedModel:
+    def __init__(
+        self,
+        version: str,
+        model,
+        encoder,
+        model_path: Path,
+        encoder_path: Path,
+        chunk_size: int,
+        load_seconds: float,
+        memory_bytes: Optional[int] = None,
+        compiled: Optional[CompiledModel] = None,
+    ):
+        self.version = version
+        self.model = model
+        self.encoder = encoder
+        self.model_path = model_path
+        self.encoder_path = encoder_path
+        self.engine = BatchEngine(model, encoder, chunk_size, compiled)
+        self.load_seconds = load_seconds
+        self.memory_bytes = memory_bytes
+        self.loaded_at = time.time()
+
+    @property
+    def ref(self) -> Tuple[str, str, str]:
+        # Small, picklable handle that lets executor workers resolve this exact
+        # version, even in another process
+        return (self.version, str(self.model_path), str(self.encoder_path))
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "model_path": str(self.model_path),
+            "encoder_path": str(self.encoder_path),
+            "load_seconds": round(self.load_seconds, 4),
+            "memory_bytes": self.memory_bytes,
+            "compiled": self.engine.compiled is not None,
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        model_path: Path,
+        encoder_path: Path,
+        chunk_size: int,
+        compile_model: bool = True,
+        versions_dir: Path = DEFAULT_VERSIONS_DIR,
+        versions_keep: int = 5,
+        max_resolved: int = 2,
+    ):
+        if max_resolved <= 0:
+            raise ValueError("max_resolved must be a positive integer")
+        self.model_path = Path(model_path)
+        self.encoder_path = Path(encoder_path)
+        self.chunk_size = chunk_size
+        self.compile_model = compile_model
+        self.versions_dir = Path(versions_dir)
+        self.versions_keep = versions_keep
+        self.max_resolved = max_resolved
+        self._active: Optional[LoadedModel] = None
+        self._versions: dict = {}
+        self._in_flight: dict = {}
+        self._resolved: "OrderedDict[str, None]" = OrderedDict()
+        self._history: List[dict] = []
+        self._listeners: List[Callable[[LoadedModel], None]] = []
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+
+    def snapshot(self, model_path: Path, encoder_path: Path) -> Tuple[str, Path, Path]:
+        # Artifacts are copied to a directory named after their version before
+        # loading. Executor processes load from there, so replacing the files
+        # in place cannot change what an already pinned version scores with.
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=self.versions_dir))
+        try:
+            shutil.copyfile(model_path, staging / MODEL_FILENAME)
+            shutil.copyfile(encoder_path, staging / ENCODER_FILENAME)
+            version = artifact_version(
+                staging / MODEL_FILENAME, staging / ENCODER_FILENAME
+            )
+            target = self.versions_dir / version
+            if not target.is_dir():
+                try:
+                    os.rename(staging, target)
+                except OSError:
+                    # Another process stored the same version meanwhile
+                    if not target.is_dir():
+                        raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        # Touched on every use, so pruning keeps the recently used versions
+        os.utime(target)
+        return version, target / MODEL_FILENAME, target / ENCODER_FILENAME
+
+    def prune_snapshots(self) -> None:
+        with self._lock:
+            keep = set(self._versions) | set(self._in_flight)
+        snapshots = sorted(
+            (
+                path
+                for path in self.versions_dir.iterdir()
+                if path.is_dir() and not path.name.startswith(".")
+            ),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True,
+        )
+        for path in snapshots[self.versions_keep :]:
+            if path.name not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+                logger.info(f"Removed stored model version {path.name}")
+
+    def load(self, model_path: Path, encoder_path: Path) -> LoadedModel:
+        version, model_path, encoder_path = self.snapshot(model_path, encoder_path)
+        return self.load_version(version, model_path, encoder_path)
+
+    def load_version(
+        self, version: str, model_path: Path, encoder_path: Path
+    ) -> LoadedModel:
+        start = time.perf_counter()
+        rss_before = current_rss_bytes()
+        model = joblib.load(model_path)
+        encoder = joblib.load(encoder_path)
+        rss_after = current_rss_bytes()
+        # RSS growth across the load; approximate if other threads allocate meanwhile
+        memory_bytes = (
+            max(rss_after - rss_before, 0)
+            if rss_before is not None and rss_after is not None
+            else None
+        )
+        # Checked against the pipeline here, so a model that cannot be
+        # compiled exactly keeps serving single records through the pipeline
+        compiled = compile_pipeline(model) if self.compile_model else None
+        loaded = LoadedModel(
+            version,
+            model,
+            encoder,
+            Path(model_path),
+            Path(encoder_path),
+            self.chunk_size,
+            time.perf_counter() - start,
+            memory_bytes,
+            compiled,
+        )
+        logger.info(
+            f"Loaded model {version} from {model_path} in {loaded.load_seconds:.2f}s"
+        )
+        return loaded
+
+    @staticmethod
+    def warm_up(loaded: LoadedModel, rows: int = 8) -> None:
+        # A few throwaway predictions catch incompatible artifacts before the
+        # swap and pay first-call costs outside of a real request
+        sample = pd.DataFrame(
+            np.ones((rows, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS
+        )
+        loaded.engine.predict_chunk(sample)
+
+    def add_listener(self, callback: Callable[[LoadedModel], None]) -> None:
+        self._listeners.append(callback)
+
+    def _activate(self, loaded: LoadedModel) -> None:
+        with self._lock:
+            previous = self._active
+            self._versions[loaded.version] = loaded
+            self._active = loaded
+            self._history = [
+                entry for entry in self._history if entry["version"] != loaded.version
+            ]
+            self._history.append(loaded.describe())
+            if previous is not None and previous.version != loaded.version:
+                self._retire_if_idle(previous.version)
+
+        for callback in self._listeners:
+            callback(loaded)
+
+    def _retire_if_idle(self, version: str) -> None:
+        if self._active is not None and version == self._active.version:
+            return
+        if self._in_flight.get(version):
+            return
+        if self._versions.pop(version, None) is not None:
+            logger.info(f"Released model {version}")
+
+    def get(self) -> LoadedModel:
+        # Lazy load on first use; double-checked so concurrent first requests
+        # only deserialize the artifacts once. Serialized with reloads rather
+        # than under _lock, so pinning resident versions is not held up.
+        if self._active is None:
+            with self._reload_lock:
+                if self._active is None:
+                    self._activate(self.load(self.model_path, self.encoder_path))
+        return self._active
+
+    def load_checked(
+        self, version: str, model_path: Path, encoder_path: Path
+    ) -> LoadedModel:
+        model_path = Path(model_path)
+        encoder_path = Path(encoder_path)
+        if not model_path.is_file() or not encoder_path.is_file():
+            raise ModelVersionMismatchError(
+                f"Model version {version} is no longer stored"
+            )
+        found = artifact_version(model_path, encoder_path)
+        if found != version:
+            raise ModelVersionMismatchError(
+                f"Artifacts for model version {version} were changed (found {found})"
+            )
+        return self.load_version(version, model_path, encoder_path)
+
+    def resolve(self, version: str, model_path: str, encoder_path: str) -> LoadedModel:
+        loaded = self._versions.get(version)
+        if loaded is None:
+            # Only reached in executor processes that have not seen this
+            # version yet. It is kept without becoming active, so tasks for
+            # the old and the new version during a reload can alternate
+            # without reloading the artifacts each time.
+            candidate = self.load_checked(version, model_path, encoder_path)
+            with self._lock:
+                loaded = self._versions.setdefault(version, candidate)
+
+        with self._lock:
+            self._resolved[version] = None
+            self._resolved.move_to_end(version)
+            # Least recently used versions beyond the cap are released, unless
+            # they are active or pinned
+            while len(self._resolved) > self.max_resolved:
+                evicted, _ = self._resolved.popitem(last=False)
+                self._retire_if_idle(evicted)
+        return loaded
+
+    def try_pin(self, version: Optional[str] = None) -> Optional[LoadedModel]:
+        # Pins without loading anything, so it is safe on the event loop;
+        # None when the version first has to be read from its stored copy
+        with self._lock:
+            loaded = self._active if version is None else self._versions.get(version)
+            if loaded is not None:
+                self._in_flight[loaded.version] = (
+                    self._in_flight.get(loaded.version, 0) + 1
+                )
+            return loaded
+
+    def pin(self, version: Optional[str] = None) -> LoadedModel:
+        # Pin a version so a concurrent reload cannot release it: the active
+        # one, or an earlier one that is still stored (a resumed job)
+        if version is None:
+            self.get()
+        loaded = self.try_pin(version)
+        if loaded is not None:
+            return loaded
+
+        # Deserialized outside the lock; if another thread loaded the same
+        # version meanwhile, its copy wins and this one is dropped
+        directory = self.versions_dir / version
+        candidate = self.load_checked(
+            version, directory / MODEL_FILENAME, directory / ENCODER_FILENAME
+        )
+        with self._lock:
+            loaded = self._versions.setdefault(version, candidate)
+            if all(entry["version"] != version for entry in self._history):
+                self._history.append(loaded.describe())
+            self._in_flight[version] = self._in_flight.get(version, 0) + 1
+        return loaded
+
+    def unpin(self, loaded: LoadedModel) -> None:
+        with self._lock:
+            self._in_flight[loaded.version] -= 1
+            if self._in_flight[loaded.version] == 0:
+                del self._in_flight[loaded.version]
+                self._retire_if_idle(loaded.version)
+
+    def reload(
+        self,
+        model_path: Optional[Path] = None,
+        encoder_path: Optional[Path] = None,
+    ) -> LoadedModel:
+        with self._reload_lock:
+            model_path = Path(model_path) if model_path else self.model_path
+            encoder_path = Path(encoder_path) if encoder_path else self.encoder_path
+
+            loaded = self.load(model_path, encoder_path)
+            self.warm_up(loaded)
+            self._activate(loaded)
+
+            self.model_path = model_path
+            self.encoder_path = encoder_path
+            logger.info(f"Model {loaded.version} is now active")
+            self.prune_snapshots()
+            return loaded
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._active is not None
+
+    def versions(self) -> List[dict]:
+        with self._lock:
+            active = self._active.version if self._active is not None else None
+            return [
+                {
+                    **entry,
+                    "active": entry["version"] == active,
+                    "resident": entry["version"] in self._versions,
+                    "in_flight": self._in_flight.get(entry["version"], 0),
+                }
+                for entry in self._history
+            ]
+
+    def preload(self) -> LoadedModel:
+        loaded = self.get()
+        # Move everything allocated so far into the permanent GC generation.
+        # Forked workers then never have the collector write to these pages,
+        # so the booster and encoder stay shared copy-on-write.
+        gc.collect()
+        gc.freeze()
+        return loaded
@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from typing import Any, List, Optional
+from services.batch_engine import FEATURE_COLUMNS
+import hashlib
+import logging
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    def __init__(self, capacity: int, ttl_seconds: float, model_version: Optional[str]):
+        if capacity <= 0:
+            raise ValueError("capacity must be a positive integer")
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.model_version = model_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _canonicalize(values: np.ndarray) -> np.ndarray:
+        # Collapse every NaN payload to one bit pattern and -0.0 to 0.0 so
+        # equal feature vectors always hash to the same key
+        values = np.where(np.isnan(values), np.nan, values) + 0.0
+        return np.ascontiguousarray(values, dtype="<f8")
+
+    @staticmethod
+    def keys_for_frame(
+        df: pd.DataFrame, model_version: str, variant: str = ""
+    ) -> List[bytes]:
+        # The model version keys the hash, so predictions from two versions
+        # that are in flight during a reload never collide. The variant keeps
+        # records with extra probability fields apart from plain ones.
+        values = df.reindex(columns=FEATURE_COLUMNS).to_numpy(dtype="float64")
+        values = PredictionCache._canonicalize(values)
+        salt = (model_version + variant).encode()
+        return [
+            hashlib.blake2b(row.tobytes(), digest_size=16, key=salt).digest()
+            for row in values
+        ]
+
+    @staticmethod
+    def key_for_record(record: dict, model_version: str, variant: str = "") -> bytes:
+        values = np.array(
+            [np.nan if record.get(c) is None else record[c] for c in FEATURE_COLUMNS],
+            dtype="float64",
+        )
+        values = PredictionCache._canonicalize(values)
+        return hashlib.blake2b(
+            values.tobytes(), digest_size=16, key=(model_version + variant).encode()
+        ).digest()
+
+    def ensure_model_version(self, model_version: str) -> None:
+        if model_version == self.model_version:
+            return
+        if self.model_version is None:
+            self.model_version = model_version
+            return
+        with self._lock:
+            logger.info(
+                f"Model changed from {self.model_version} to {model_version}, "
+                f"dropping {len(self._entries)} cached predictions"
+            )
+            self._entries.clear()
+            self.model_version = model_version
+            self.invalidations += 1
+
+    def get(self, key: bytes) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: bytes, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model_version": self.model_version,
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
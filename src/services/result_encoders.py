@@ -0,0 +1,212 @@
+from typing import List, Optional
+import json
+import numpy as np
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_MEDIA_TYPE = "application/vnd.apache.arrow.file"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Accepted media types and aliases -> (format, media type of the response)
+MEDIA_TYPES = {
+    ARROW_STREAM_MEDIA_TYPE: ("arrow", ARROW_STREAM_MEDIA_TYPE),
+    ARROW_FILE_MEDIA_TYPE: ("arrow_file", ARROW_FILE_MEDIA_TYPE),
+    PARQUET_MEDIA_TYPE: ("parquet", PARQUET_MEDIA_TYPE),
+    "application/x-parquet": ("parquet", PARQUET_MEDIA_TYPE),
+    MSGPACK_MEDIA_TYPE: ("msgpack", MSGPACK_MEDIA_TYPE),
+    "application/x-msgpack": ("msgpack", MSGPACK_MEDIA_TYPE),
+    "application/vnd.msgpack": ("msgpack", MSGPACK_MEDIA_TYPE),
+}
+
+
+class ColumnarResult:
+    def __init__(
+        self,
+        labels: List[str],
+        class_index: np.ndarray,
+        predicted_proba: np.ndarray,
+        errors: dict,
+        model_version: Optional[str] = None,
+        probabilities: Optional[np.ndarray] = None,
+    ):
+        # class_index is -1 and predicted_proba NaN for rows that failed
+        # validation; probabilities is an optional (rows, classes) matrix
+        self.labels = labels
+        self.class_index = class_index
+        self.predicted_proba = predicted_proba
+        self.errors = errors
+        self.model_version = model_version
+        self.probabilities = probabilities
+
+    def __len__(self) -> int:
+        return len(self.class_index)
+
+    def to_records(self) -> list:
+        records = []
+        for row, (code, prob) in enumerate(zip(self.class_index, self.predicted_proba)):
+            if code < 0:
+                records.append(
+                    {
+                        "predicted_class": None,
+                        "predicted_proba": None,
+                        "errors": self.errors.get(row, []),
+                    }
+                )
+            else:
+                records.append(
+                    {
+                        "predicted_class": self.labels[code],
+                        "predicted_proba": f"{round(float(prob),2)}",
+                    }
+                )
+        return records
+
+
+def negotiate(accept: Optional[str]) -> Optional[tuple]:
+    # Highest q-value wins; ties keep the client's order. None means JSON.
+    if not accept:
+        return None
+
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            candidates.append((-q, position, media_type.lower()))
+
+    for _, _, media_type in sorted(candidates):
+        if media_type in MEDIA_TYPES:
+            return MEDIA_TYPES[media_type]
+        if media_type in ("application/json", "*/*", "application/*"):
+            return None
+    return None
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Arrow and Parquet responses require the pyarrow package")
+    return pyarrow
+
+
+def _import_msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise ValueError("MessagePack responses require the msgpack package")
+    return msgpack
+
+
+def _errors_column(result: ColumnarResult) -> list:
+    column = [None] * len(result)
+    for row, errors in result.errors.items():
+        column[row] = json.dumps(errors)
+    return column
+
+
+def to_arrow_table(result: ColumnarResult):
+    pa = _import_pyarrow()
+    invalid = result.class_index < 0
+
+    indices = pa.array(result.class_index.astype(np.int16), mask=invalid)
+    predicted_class = pa.DictionaryArray.from_arrays(
+        indices, pa.array(result.labels, pa.string())
+    )
+    predicted_proba = pa.array(result.predicted_proba.astype(np.float32), mask=invalid)
+    columns = {"predicted_class": predicted_class, "predicted_proba": predicted_proba}
+    if result.probabilities is not None:
+        for i, label in enumerate(result.labels):
+            columns[f"proba_{label}"] = pa.array(
+                result.probabilities[:, i].astype(np.float32), mask=invalid
+            )
+    if result.errors:
+        columns["errors"] = pa.array(_errors_column(result), pa.string())
+
+    metadata = {"rows_failed": str(len(result.errors))}
+    if result.model_version is not None:
+        metadata["model_version"] = result.model_version
+    return pa.table(columns).replace_schema_metadata(metadata)
+
+
+def encode_arrow(result: ColumnarResult) -> bytes:
+    pa = _import_pyarrow()
+    table = to_arrow_table(result)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_arrow_file(result: ColumnarResult) -> bytes:
+    pa = _import_pyarrow()
+    table = to_arrow_table(result)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_parquet(result: ColumnarResult) -> bytes:
+    pa = _import_pyarrow()
+    table = to_arrow_table(result)
+    sink = pa.BufferOutputStream()
+    pa.parquet.write_table(table, sink, compression="zstd")
+    return sink.getvalue().to_pybytes()
+
+
+def encode_msgpack(result: ColumnarResult) -> bytes:
+    msgpack = _import_msgpack()
+    # Arrays go out as raw little-endian buffers with their dtype, so a reader
+    # can wrap them with numpy.frombuffer without a per-row decode
+    payload = {
+        "model_version": result.model_version,
+        "rows": len(result),
+        "labels": list(result.labels),
+        "class_index": {
+            "dtype": "<i2",
+            "data": result.class_index.astype("<i2").tobytes(),
+        },
+        "predicted_proba": {
+            "dtype": "<f4",
+            "data": result.predicted_proba.astype("<f4").tobytes(),
+        },
+        "errors": [
+            {"row": row, "errors": errors} for row, errors in result.errors.items()
+        ],
+    }
+    if result.probabilities is not None:
+        payload["probabilities"] = {
+            "dtype": "<f4",
+            "shape": list(result.probabilities.shape),
+            "data": result.probabilities.astype("<f4").tobytes(),
+        }
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def check_available(format: str) -> None:
+    if format == "msgpack":
+        _import_msgpack()
+    else:
+        _import_pyarrow()
+
+
+ENCODERS = {
+    "arrow": encode_arrow,
+    "arrow_file": encode_arrow_file,
+    "parquet": encode_parquet,
+    "msgpack": encode_msgpack,
+}
+
+
+def encode(result: ColumnarResult, format: str) -> bytes:
+    return ENCODERS[format](result)
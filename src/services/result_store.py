@@ -0,0 +1,136 @@
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    media_type TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at);
+"""
+
+
+class ResultStore:
+    def __init__(self, directory: Path, max_bytes: int):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be a positive integer")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            self.directory / "index.sqlite3",
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _path(self, filename: str) -> Path:
+        return self.directory / filename
+
+    def open(self, key: str) -> Optional[Tuple[BinaryIO, dict]]:
+        # The handle is opened under the lock, so a concurrent eviction can
+        # unlink the file without breaking a response that is already streaming
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename, size, media_type, headers FROM results WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            filename, size, media_type, headers = row
+            try:
+                handle = open(self._path(filename), "rb")
+            except FileNotFoundError:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+
+        return handle, {
+            "size": size,
+            "media_type": media_type,
+            "headers": json.loads(headers),
+        }
+
+    def put(self, key: str, body: bytes, media_type: str, headers: dict) -> None:
+        if len(body) > self.max_bytes:
+            logger.info(f"Not storing result {key}: {len(body)} bytes exceeds the cap")
+            return
+
+        # Unique file per write; the rename makes a half-written body invisible
+        filename = f"{key}-{uuid.uuid4().hex[:8]}.bin"
+        temp_path = self._path(filename + ".tmp")
+        with open(temp_path, "wb") as fh:
+            fh.write(body)
+        os.replace(temp_path, self._path(filename))
+
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT filename FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(key, filename, size, media_type, headers, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, filename, len(body), media_type, json.dumps(headers), now, now),
+            )
+            if previous is not None:
+                self._path(previous[0]).unlink(missing_ok=True)
+            self._evict()
+
+    def _evict(self) -> None:
+        # Least recently served results go first until the store fits its cap
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, filename, size FROM results ORDER BY accessed_at"
+        ).fetchall()
+        for key, filename, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._path(filename).unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+            logger.info(f"Evicted stored result {key} ({size} bytes)")
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        return {
+            "results": count,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
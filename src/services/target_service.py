@@ -0,0 +1,183 @@
+from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from models.exoplanet import Response
+from services.model_registry import LoadedModel
+from services.target_store import TargetSpool, TargetStore
+from config.env import settings
+from fastapi.concurrency import run_in_threadpool
+import asyncio
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGETS_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "targets"
+
+
+class TargetIndexDisabledError(Exception):
+    pass
+
+
+_target_store: Optional[TargetStore] = None
+
+
+def get_target_store() -> Optional[TargetStore]:
+    global _target_store
+    if not settings.target_index_enabled:
+        return None
+    if _target_store is None:
+        _target_store = TargetStore(
+            Path(settings.target_index_dir or DEFAULT_TARGETS_DIR),
+            settings.target_index_max_rows,
+        )
+    return _target_store
+
+
+class TargetIndexer:
+    def __init__(self):
+        self._tasks: set = set()
+
+    def spool(self, path: Optional[Path] = None) -> Optional[TargetSpool]:
+        store = get_target_store()
+        if store is None:
+            return None
+        return TargetSpool(path or store.spool_path(uuid.uuid4().hex))
+
+    async def _ingest(
+        self, spool: TargetSpool, loaded: LoadedModel, source: str
+    ) -> None:
+        try:
+            await run_in_threadpool(
+                get_target_store().ingest,
+                spool,
+                loaded.engine.labels.tolist(),
+                loaded.version,
+                source,
+            )
+        except Exception as e:
+            logger.error(f"Error indexing targets from {source}: {str(e)}")
+        finally:
+            await run_in_threadpool(spool.discard)
+
+    def submit(self, spool: TargetSpool, loaded: LoadedModel, source: str) -> None:
+        # Indexed after the response has gone out, so uploads do not wait on it
+        task = asyncio.get_running_loop().create_task(
+            self._ingest(spool, loaded, source)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @asynccontextmanager
+    async def collect(
+        self, loaded: LoadedModel, source: str
+    ) -> AsyncIterator[Optional[TargetSpool]]:
+        # Rows of an upload are indexed only once the whole upload has succeeded
+        spool = self.spool()
+        try:
+            yield spool
+        except BaseException:
+            if spool is not None:
+                await run_in_threadpool(spool.discard)
+            raise
+        if spool is not None:
+            self.submit(spool, loaded, source)
+
+    async def drain(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if _target_store is not None:
+            _target_store.close()
+
+
+target_indexer = TargetIndexer()
+
+
+class TargetService:
+    @staticmethod
+    def _store() -> TargetStore:
+        store = get_target_store()
+        if store is None:
+            raise TargetIndexDisabledError("The target index is disabled")
+        return store
+
+    @staticmethod
+    async def cone_search(
+        ra: float,
+        dec: float,
+        radius: float,
+        offset: int,
+        limit: int,
+        predicted_class: Optional[str] = None,
+        model_version: Optional[str] = None,
+        include_features: bool = False,
+    ) -> Response:
+        try:
+            store = TargetService._store()
+            total, items = await run_in_threadpool(
+                store.cone,
+                ra,
+                dec,
+                radius,
+                offset,
+                limit,
+                predicted_class,
+                model_version,
+                include_features,
+            )
+            return Response(
+                success=True,
+                data={"items": items, "offset": offset, "limit": limit, "total": total},
+                message="Cone search completed successfully",
+            )
+
+        except Exception as e:
+            logger.error(f"Error running cone search: {str(e)}")
+            raise
+
+    @staticmethod
+    async def box_search(
+        ra_min: float,
+        ra_max: float,
+        dec_min: float,
+        dec_max: float,
+        offset: int,
+        limit: int,
+        predicted_class: Optional[str] = None,
+        model_version: Optional[str] = None,
+        include_features: bool = False,
+    ) -> Response:
+        try:
+            if dec_min > dec_max:
+                raise ValueError("dec_min must not be greater than dec_max")
+            store = TargetService._store()
+            total, items = await run_in_threadpool(
+                store.box,
+                ra_min,
+                ra_max,
+                dec_min,
+                dec_max,
+                offset,
+                limit,
+                predicted_class,
+                model_version,
+                include_features,
+            )
+            return Response(
+                success=True,
+                data={"items": items, "offset": offset, "limit": limit, "total": total},
+                message="Box search completed successfully",
+            )
+
+        except Exception as e:
+            logger.error(f"Error running box search: {str(e)}")
+            raise
+
+    @staticmethod
+    async def stats() -> Response:
+        store = TargetService._store()
+        return Response(
+            success=True,
+            data=await run_in_threadpool(store.stats),
+            message="Target index statistics retrieved successfully",
+        )
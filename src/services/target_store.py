@@ -0,0 +1,512 @@
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+from services.batch_engine import FEATURE_COLUMNS
+import copy
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS targets (
+    id INTEGER PRIMARY KEY,
+    row_hash BLOB NOT NULL,
+    model_version TEXT NOT NULL,
+    ra REAL NOT NULL,
+    dec REAL NOT NULL,
+    predicted_class TEXT NOT NULL,
+    predicted_proba REAL,
+    features BLOB NOT NULL,
+    source TEXT,
+    created_at REAL NOT NULL,
+    UNIQUE (row_hash, model_version)
+);
+"""
+
+RA_INDEX = FEATURE_COLUMNS.index("ra")
+DEC_INDEX = FEATURE_COLUMNS.index("dec")
+# Boundary points per box edge when fitting the cone that encloses a box
+BOX_EDGE_SAMPLES = 64
+
+
+def unit_vectors(ra: np.ndarray, dec: np.ndarray) -> np.ndarray:
+    ra = np.radians(ra)
+    dec = np.radians(dec)
+    cos_dec = np.cos(dec)
+    return np.column_stack([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)])
+
+
+def angular_distance(xyz: np.ndarray, center: np.ndarray) -> np.ndarray:
+    # From the chord length, which stays accurate for tiny separations
+    chord = np.linalg.norm(xyz - center, axis=1)
+    return np.degrees(2 * np.arcsin(np.clip(chord / 2, 0.0, 1.0)))
+
+
+def in_ra_range(ra: np.ndarray, ra_min: float, ra_max: float) -> np.ndarray:
+    # ra_min > ra_max is a range that wraps through 0
+    if ra_min <= ra_max:
+        return (ra >= ra_min) & (ra <= ra_max)
+    return (ra >= ra_min) | (ra <= ra_max)
+
+
+class TargetSpool:
+    def __init__(self, path: Path):
+        # Classified chunks of one upload, appended as .npy triples and ingested
+        # in a single transaction once the upload has completed
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.rows = 0
+
+    @staticmethod
+    def _features(chunk: pd.DataFrame) -> np.ndarray:
+        frame = chunk.reindex(columns=FEATURE_COLUMNS)
+        return frame.apply(pd.to_numeric, errors="coerce").to_numpy(np.float64)
+
+    def add_columns(
+        self, chunk: pd.DataFrame, class_index: np.ndarray, proba: np.ndarray
+    ) -> None:
+        with open(self.path, "ab") as fh:
+            np.save(fh, self._features(chunk))
+            np.save(fh, np.asarray(class_index, dtype=np.int16))
+            np.save(fh, np.asarray(proba, dtype=np.float32))
+        self.rows += len(chunk)
+
+    def add_records(
+        self, chunk: pd.DataFrame, records: list, labels: List[str], proba: np.ndarray
+    ) -> None:
+        # proba is the raw top-class probability; the records only carry it
+        # rounded for display
+        codes = {label: i for i, label in enumerate(labels)}
+        class_index = np.array(
+            [codes.get(record["predicted_class"], -1) for record in records],
+            dtype=np.int16,
+        )
+        self.add_columns(chunk, class_index, proba)
+
+    def chunks(self) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as fh:
+            size = self.path.stat().st_size
+            while fh.tell() < size:
+                yield np.load(fh), np.load(fh), np.load(fh)
+
+    def discard(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+class SkyIndex:
+    def __init__(self, rebuild_ratio: float = 0.25, min_rebuild_rows: int = 50000):
+        # A k-d tree over unit vectors for the bulk of the rows, plus a tail of
+        # recent rows that is scanned directly until it is big enough to be
+        # worth rebuilding the tree for. Rows before `start` were evicted.
+        # An index is never changed once built: append and drop_before return
+        # a new one, so searches can run on it while the next one is built.
+        self.rebuild_ratio = rebuild_ratio
+        self.min_rebuild_rows = min_rebuild_rows
+        self.ids = np.empty(0, dtype=np.int64)
+        self.ra = np.empty(0)
+        self.dec = np.empty(0)
+        self.class_codes = np.empty(0, dtype=np.int16)
+        self.version_codes = np.empty(0, dtype=np.int16)
+        self.classes: dict = {}
+        self.versions: dict = {}
+        self.tree: Optional[cKDTree] = None
+        self.tree_rows = 0
+        self.start = 0
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.start
+
+    @property
+    def last_id(self) -> int:
+        return int(self.ids[-1]) if len(self.ids) else 0
+
+    @property
+    def indexed(self) -> int:
+        return max(self.tree_rows - self.start, 0)
+
+    @staticmethod
+    def _encode(values: list, codes: dict) -> np.ndarray:
+        return np.array(
+            [codes.setdefault(value, len(codes)) for value in values], dtype=np.int16
+        )
+
+    def append(self, rows: list) -> "SkyIndex":
+        ids, ra, dec, classes, versions = zip(*rows)
+        index = copy.copy(self)
+        index.classes = dict(self.classes)
+        index.versions = dict(self.versions)
+        index.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        index.ra = np.concatenate([self.ra, np.asarray(ra, dtype=np.float64)])
+        index.dec = np.concatenate([self.dec, np.asarray(dec, dtype=np.float64)])
+        index.class_codes = np.concatenate(
+            [self.class_codes, self._encode(classes, index.classes)]
+        )
+        index.version_codes = np.concatenate(
+            [self.version_codes, self._encode(versions, index.versions)]
+        )
+
+        tail = len(index.ids) - index.tree_rows
+        if tail >= max(self.min_rebuild_rows, self.rebuild_ratio * index.tree_rows):
+            index._rebuild()
+        return index
+
+    def _rebuild(self) -> None:
+        # Only called on an index that is not published yet
+        start = time.perf_counter()
+        if self.start:
+            self.ids = self.ids[self.start :]
+            self.ra = self.ra[self.start :]
+            self.dec = self.dec[self.start :]
+            self.class_codes = self.class_codes[self.start :]
+            self.version_codes = self.version_codes[self.start :]
+            self.start = 0
+        self.tree = cKDTree(unit_vectors(self.ra, self.dec)) if len(self.ids) else None
+        self.tree_rows = len(self.ids)
+        logger.info(
+            f"Rebuilt sky index over {self.tree_rows} targets "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+    def drop_before(self, first_id: int) -> "SkyIndex":
+        # Evicted rows are always the oldest, a prefix of the id-sorted arrays.
+        # They are skipped by moving `start`; removing them shifts positions
+        # and so rebuilds the tree, which waits until enough have piled up.
+        start = int(np.searchsorted(self.ids, first_id))
+        if start <= self.start:
+            return self
+        index = copy.copy(self)
+        index.start = start
+        if start >= max(self.min_rebuild_rows, self.rebuild_ratio * len(self.ids)):
+            index._rebuild()
+        return index
+
+    @staticmethod
+    def _present(codes: dict, column: np.ndarray) -> List[str]:
+        present = set(np.unique(column).tolist())
+        return sorted(value for value, code in codes.items() if code in present)
+
+    def present_classes(self) -> List[str]:
+        return self._present(self.classes, self.class_codes[self.start :])
+
+    def present_versions(self) -> List[str]:
+        return self._present(self.versions, self.version_codes[self.start :])
+
+    def _filter(
+        self,
+        positions: np.ndarray,
+        predicted_class: Optional[str],
+        model_version: Optional[str],
+    ) -> np.ndarray:
+        for value, codes, column in (
+            (predicted_class, self.classes, self.class_codes),
+            (model_version, self.versions, self.version_codes),
+        ):
+            if value is None:
+                continue
+            if value not in codes:
+                return positions[:0]
+            positions = positions[column[positions] == codes[value]]
+        return positions
+
+    def _within(self, center: np.ndarray, radius_deg: float) -> np.ndarray:
+        # Chord length of the radius, padded so float error never drops a
+        # boundary target before the exact angular test
+        chord = 2 * np.sin(np.radians(min(radius_deg, 180.0)) / 2) + 1e-9
+        positions = []
+        if self.tree is not None:
+            positions.append(
+                np.asarray(
+                    self.tree.query_ball_point(center, chord, return_sorted=False),
+                    dtype=np.int64,
+                )
+            )
+        if self.tree_rows < len(self.ids):
+            tail = unit_vectors(self.ra[self.tree_rows :], self.dec[self.tree_rows :])
+            near = np.linalg.norm(tail - center, axis=1) <= chord
+            positions.append(self.tree_rows + np.flatnonzero(near))
+        if not positions:
+            return np.empty(0, dtype=np.int64)
+        positions = np.concatenate(positions)
+        return positions[positions >= self.start]
+
+    def cone(
+        self,
+        ra: float,
+        dec: float,
+        radius_deg: float,
+        predicted_class: Optional[str] = None,
+        model_version: Optional[str] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        center = unit_vectors(np.array([ra]), np.array([dec]))[0]
+        positions = self._filter(
+            self._within(center, radius_deg), predicted_class, model_version
+        )
+        distance = angular_distance(
+            unit_vectors(self.ra[positions], self.dec[positions]), center
+        )
+        keep = distance <= radius_deg
+        positions = positions[keep]
+        distance = distance[keep]
+        # Nearest first, ties in insertion order, so pages are stable
+        order = np.lexsort((self.ids[positions], distance))
+        return self.ids[positions[order]], distance[order]
+
+    def box(
+        self,
+        ra_min: float,
+        ra_max: float,
+        dec_min: float,
+        dec_max: float,
+        predicted_class: Optional[str] = None,
+        model_version: Optional[str] = None,
+    ) -> np.ndarray:
+        span = ra_max - ra_min if ra_min <= ra_max else 360 - ra_min + ra_max
+        if span >= 180:
+            positions = np.arange(self.start, len(self.ids))
+        else:
+            # The tree answers cones, so the box is narrowed to the smallest
+            # cone around its center that holds every sampled boundary point
+            ra_center = (ra_min + span / 2) % 360
+            dec_center = (dec_min + dec_max) / 2
+            center = unit_vectors(np.array([ra_center]), np.array([dec_center]))[0]
+            steps = np.linspace(0, 1, BOX_EDGE_SAMPLES + 1)
+            along_ra = ra_min + steps * span
+            along_dec = dec_min + steps * (dec_max - dec_min)
+            edge_ra = np.concatenate(
+                [
+                    along_ra,
+                    along_ra,
+                    np.full_like(steps, ra_min),
+                    np.full_like(steps, ra_max),
+                ]
+            )
+            edge_dec = np.concatenate(
+                [
+                    np.full_like(steps, dec_min),
+                    np.full_like(steps, dec_max),
+                    along_dec,
+                    along_dec,
+                ]
+            )
+            distance = angular_distance(unit_vectors(edge_ra, edge_dec), center)
+            step = max(span, dec_max - dec_min) / BOX_EDGE_SAMPLES
+            positions = self._within(center, float(distance.max()) + step)
+
+        positions = self._filter(positions, predicted_class, model_version)
+        inside = in_ra_range(self.ra[positions], ra_min, ra_max) & (
+            (self.dec[positions] >= dec_min) & (self.dec[positions] <= dec_max)
+        )
+        return np.sort(self.ids[positions[inside]])
+
+
+class TargetStore:
+    def __init__(self, directory: Path, max_rows: int):
+        if max_rows <= 0:
+            raise ValueError("max_rows must be a positive integer")
+        self.max_rows = max_rows
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / "targets.sqlite3"
+        # Separate connections, so a long bulk insert does not hold up searches
+        self._writer = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+        self._writer.executescript(SCHEMA)
+        self._reader = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self.index = SkyIndex()
+
+    def spool_path(self, name: str) -> Path:
+        return self.directory / "spool" / f"{name}.npy"
+
+    def ingest(
+        self, spool: TargetSpool, labels: List[str], model_version: str, source: str
+    ) -> int:
+        # One transaction per upload; rows already indexed for the same model
+        # version (a re-uploaded catalog, a resumed job) are skipped
+        start = time.perf_counter()
+        labels = np.asarray(labels, dtype=object)
+        inserted = 0
+        now = time.time()
+        with self._write_lock:
+            self._writer.execute("BEGIN")
+            try:
+                for features, class_index, proba in spool.chunks():
+                    keep = (
+                        (class_index >= 0)
+                        & np.isfinite(features[:, RA_INDEX])
+                        & np.isfinite(features[:, DEC_INDEX])
+                    )
+                    features = features[keep]
+                    # Hashed at float32, the precision they are stored at, so the
+                    # same catalog parsed from CSV or Parquet maps to the same rows
+                    stored = features.astype(np.float32)
+                    rows = [
+                        (
+                            hashlib.blake2b(blob, digest_size=16).digest(),
+                            model_version,
+                            float(row[RA_INDEX]) % 360,
+                            float(row[DEC_INDEX]),
+                            label,
+                            None if np.isnan(prob) else float(prob),
+                            blob,
+                            source,
+                            now,
+                        )
+                        for row, blob, label, prob in zip(
+                            features,
+                            (values.tobytes() for values in stored),
+                            labels[class_index[keep]],
+                            proba[keep],
+                        )
+                    ]
+                    before = self._writer.total_changes
+                    self._writer.executemany(
+                        "INSERT OR IGNORE INTO targets (row_hash, model_version, ra, "
+                        "dec, predicted_class, predicted_proba, features, source, "
+                        "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    inserted += self._writer.total_changes - before
+                # Oldest rows go first once the index is over its size cap
+                evicted = self._writer.execute(
+                    "DELETE FROM targets WHERE id <= "
+                    "(SELECT id FROM targets ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (self.max_rows,),
+                ).rowcount
+                self._writer.execute("COMMIT")
+            except Exception:
+                self._writer.execute("ROLLBACK")
+                raise
+
+        logger.info(
+            f"Indexed {inserted} targets from {source} "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        if evicted:
+            logger.info(f"Evicted the {evicted} oldest targets from the index")
+        return inserted
+
+    def refresh(self) -> SkyIndex:
+        # Picks up rows inserted since the last search, including rows written
+        # by other worker processes sharing the database. Callers search the
+        # returned index, which later refreshes never change.
+        with self._read_lock:
+            index = self.index
+            if len(index):
+                # Rows evicted by any process since the last search
+                (first_id,) = self._reader.execute(
+                    "SELECT MIN(id) FROM targets"
+                ).fetchone()
+                if first_id is None:
+                    first_id = index.last_id + 1
+                index = index.drop_before(first_id)
+            rows = self._reader.execute(
+                "SELECT id, ra, dec, predicted_class, model_version FROM targets "
+                "WHERE id > ? ORDER BY id",
+                (index.last_id,),
+            ).fetchall()
+            if rows:
+                index = index.append(rows)
+            self.index = index
+            return index
+
+    def fetch(self, ids: np.ndarray, include_features: bool = False) -> List[dict]:
+        if len(ids) == 0:
+            return []
+        with self._read_lock:
+            rows = self._reader.execute(
+                "SELECT id, ra, dec, predicted_class, predicted_proba, model_version, "
+                "source, created_at, features FROM targets WHERE id IN "
+                f"({','.join('?' * len(ids))})",
+                [int(i) for i in ids],
+            ).fetchall()
+
+        by_id = {}
+        for row in rows:
+            item = {
+                "id": row[0],
+                "ra": row[1],
+                "dec": row[2],
+                "predicted_class": row[3],
+                "predicted_proba": row[4],
+                "model_version": row[5],
+                "source": row[6],
+                "created_at": row[7],
+            }
+            if include_features:
+                values = np.frombuffer(row[8], dtype=np.float32).tolist()
+                item["features"] = {
+                    name: None if value != value else value
+                    for name, value in zip(FEATURE_COLUMNS, values)
+                }
+            by_id[row[0]] = item
+        # A row can be evicted between the search and this lookup
+        return [by_id[int(i)] for i in ids if int(i) in by_id]
+
+    def cone(
+        self,
+        ra: float,
+        dec: float,
+        radius: float,
+        offset: int,
+        limit: int,
+        predicted_class: Optional[str] = None,
+        model_version: Optional[str] = None,
+        include_features: bool = False,
+    ) -> Tuple[int, List[dict]]:
+        index = self.refresh()
+        ids, distance = index.cone(ra, dec, radius, predicted_class, model_version)
+        page = ids[offset : offset + limit]
+        # fetch skips rows evicted since the search, so match by id
+        distances = dict(zip(page.tolist(), distance[offset : offset + limit].tolist()))
+        items = self.fetch(page, include_features)
+        for item in items:
+            item["distance_deg"] = distances[item["id"]]
+        return len(ids), items
+
+    def box(
+        self,
+        ra_min: float,
+        ra_max: float,
+        dec_min: float,
+        dec_max: float,
+        offset: int,
+        limit: int,
+        predicted_class: Optional[str] = None,
+        model_version: Optional[str] = None,
+        include_features: bool = False,
+    ) -> Tuple[int, List[dict]]:
+        index = self.refresh()
+        ids = index.box(
+            ra_min, ra_max, dec_min, dec_max, predicted_class, model_version
+        )
+        return len(ids), self.fetch(ids[offset : offset + limit], include_features)
+
+    def stats(self) -> dict:
+        index = self.refresh()
+        return {
+            "targets": len(index),
+            "indexed": index.indexed,
+            "max_targets": self.max_rows,
+            "classes": index.present_classes(),
+            "model_versions": index.present_versions(),
+        }
+
+    def close(self) -> None:
+        with self._write_lock, self._read_lock:
+            self._writer.close()
+            self._reader.close()
@@ -0,0 +1,320 @@
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional
+from models.exoplanet import ProbabilityOptions
+from models.upload import UploadSessionRequest
+from services.exoplanet_service import (
+    ExoplanetService,
+    admission_controller,
+    model_registry,
+)
+from services.file_readers import SUPPORTED_EXTENSIONS, UNSUPPORTED_FORMAT_MESSAGE
+from services.result_encoders import encode
+from services.result_store import ResultStore
+from config.env import settings
+from utils.metrics import RESULT_STORE_LOOKUPS, timed
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import Response as HTTPResponse, StreamingResponse
+import asyncio
+import hashlib
+import json
+import logging
+import shutil
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+DEFAULT_RESULTS_DIR = DATA_DIR / "results"
+DEFAULT_UPLOADS_DIR = DATA_DIR / "uploads"
+JSON_MEDIA_TYPE = "application/json"
+
+
+class UploadNotFoundError(Exception):
+    pass
+
+
+class UploadOffsetError(Exception):
+    def __init__(self, offset: int):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class RenderedResult:
+    def __init__(
+        self,
+        media_type: str,
+        headers: dict,
+        body: Optional[bytes] = None,
+        handle: Optional[BinaryIO] = None,
+    ):
+        self.media_type = media_type
+        self.headers = headers
+        self.body = body
+        self.handle = handle
+
+    def to_response(self) -> HTTPResponse:
+        if self.handle is None:
+            return HTTPResponse(
+                content=self.body, media_type=self.media_type, headers=self.headers
+            )
+
+        handle = self.handle
+
+        def chunks():
+            with handle:
+                for block in iter(lambda: handle.read(1024 * 1024), b""):
+                    yield block
+
+        return StreamingResponse(
+            chunks(), media_type=self.media_type, headers=self.headers
+        )
+
+
+def content_digest(fileobj: BinaryIO) -> str:
+    with timed("hash"):
+        fileobj.seek(0)
+        digest = hashlib.file_digest(fileobj, "sha256").hexdigest()
+        fileobj.seek(0)
+        return digest
+
+
+def result_key(
+    digest: str, model_version: str, options: ProbabilityOptions, format: str
+) -> str:
+    # Same bytes, same model, same output options and same encoding
+    return hashlib.sha256(
+        f"{digest}:{model_version}:{options.variant}:{format}".encode()
+    ).hexdigest()
+
+
+_result_store: Optional[ResultStore] = None
+
+
+def get_result_store() -> Optional[ResultStore]:
+    global _result_store
+    if not settings.result_store_enabled:
+        return None
+    if _result_store is None:
+        _result_store = ResultStore(
+            Path(settings.result_store_dir or DEFAULT_RESULTS_DIR),
+            settings.result_store_max_bytes,
+        )
+    return _result_store
+
+
+class UploadSessions:
+    def __init__(self, directory: Path, ttl_seconds: float):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self._locks: dict = {}
+
+    def _dir(self, upload_id: str) -> Path:
+        directory = (self.directory / upload_id).resolve()
+        if directory.parent != self.directory.resolve() or not directory.is_dir():
+            raise UploadNotFoundError(f"Upload {upload_id} not found")
+        return directory
+
+    def data_path(self, upload_id: str) -> Path:
+        return self._dir(upload_id) / "data"
+
+    def create(self, request: UploadSessionRequest) -> dict:
+        if admission_controller is not None:
+            admission_controller.check_file(request.filename, request.size)
+        self.expire()
+        upload_id = uuid.uuid4().hex
+        directory = self.directory / upload_id
+        directory.mkdir(parents=True)
+        (directory / "data").touch()
+        meta = {
+            "upload_id": upload_id,
+            "filename": Path(request.filename).name,
+            "size": request.size,
+            "sha256": request.sha256.lower() if request.sha256 else None,
+            "created_at": time.time(),
+        }
+        with open(directory / "meta.json", "w") as fh:
+            json.dump(meta, fh)
+        return {**meta, "offset": 0}
+
+    def get(self, upload_id: str) -> dict:
+        directory = self._dir(upload_id)
+        with open(directory / "meta.json") as fh:
+            meta = json.load(fh)
+        # The bytes on disk are the source of truth for where to resume
+        return {**meta, "offset": (directory / "data").stat().st_size}
+
+    async def append(
+        self, upload_id: str, offset: int, stream: AsyncIterator[bytes]
+    ) -> dict:
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        if lock.locked():
+            raise UploadOffsetError(
+                (await run_in_threadpool(self.get, upload_id))["offset"]
+            )
+
+        async with lock:
+            session = await run_in_threadpool(self.get, upload_id)
+            if offset != session["offset"]:
+                raise UploadOffsetError(session["offset"])
+
+            # Every chunk lands on disk as it arrives, so a dropped connection
+            # keeps what was received and the client resumes from there.
+            # Unbuffered, so the offset read from the file size is never behind.
+            fh = await run_in_threadpool(open, self.data_path(upload_id), "r+b", 0)
+            try:
+                fh.seek(offset)
+                async for chunk in stream:
+                    if not chunk:
+                        continue
+                    offset += len(chunk)
+                    size = session["size"]
+                    if size is not None and offset > size:
+                        raise ValueError(
+                            f"Upload exceeds its declared size of {size} bytes"
+                        )
+                    if admission_controller is not None:
+                        admission_controller.check_file(session["filename"], offset)
+                    await run_in_threadpool(fh.write, chunk)
+            finally:
+                await run_in_threadpool(fh.close)
+                self._locks.pop(upload_id, None)
+
+        return await run_in_threadpool(self.get, upload_id)
+
+    def delete(self, upload_id: str) -> None:
+        shutil.rmtree(self._dir(upload_id))
+
+    def expire(self) -> None:
+        if not self.directory.is_dir():
+            return
+        cutoff = time.time() - self.ttl_seconds
+        for meta_path in self.directory.glob("*/meta.json"):
+            if meta_path.stat().st_mtime < cutoff:
+                directory = meta_path.parent
+                if (directory / "data").stat().st_mtime < cutoff:
+                    shutil.rmtree(directory, ignore_errors=True)
+                    logger.info(f"Expired upload session {directory.name}")
+
+
+upload_sessions = UploadSessions(
+    Path(settings.uploads_dir) if settings.uploads_dir else DEFAULT_UPLOADS_DIR,
+    settings.upload_session_ttl_seconds,
+)
+
+
+class UploadService:
+    @staticmethod
+    async def classify_file(
+        file: UploadFile,
+        options: ProbabilityOptions,
+        negotiated: Optional[tuple] = None,
+        digest: Optional[str] = None,
+    ) -> RenderedResult:
+        try:
+            format, media_type = negotiated or ("json", JSON_MEDIA_TYPE)
+            if digest is None:
+                digest = await run_in_threadpool(content_digest, file.file)
+
+            store = get_result_store()
+            if store is not None:
+                if not model_registry.is_loaded:
+                    await run_in_threadpool(model_registry.get)
+                key = result_key(digest, model_registry.get().version, options, format)
+                stored = await run_in_threadpool(store.open, key)
+                if stored is not None:
+                    RESULT_STORE_LOOKUPS.inc(result="hit")
+                    handle, meta = stored
+                    logger.info(f"Serving stored result for {file.filename} ({digest})")
+                    return RenderedResult(
+                        meta["media_type"],
+                        {
+                            **meta["headers"],
+                            "X-Content-SHA256": digest,
+                            "X-Result-Cache": "hit",
+                        },
+                        handle=handle,
+                    )
+                RESULT_STORE_LOOKUPS.inc(result="miss")
+
+            if format == "json":
+                response = await ExoplanetService.process_exoplanet_file(file, options)
+                # Serialized here so the cost of large payloads shows up as its own stage
+                with timed("serialize"):
+                    body = response.model_dump_json().encode()
+                model_version = response.model_version
+                headers = {"X-Model-Version": model_version}
+            else:
+                result = await ExoplanetService.process_exoplanet_file_columnar(
+                    file, options
+                )
+                with timed("serialize"):
+                    body = await run_in_threadpool(encode, result, format)
+                model_version = result.model_version
+                headers = {
+                    "X-Model-Version": model_version,
+                    "X-Rows-Failed": str(len(result.errors)),
+                }
+
+            if store is not None:
+                # Keyed by the version that actually produced the result
+                key = result_key(digest, model_version, options, format)
+                await run_in_threadpool(store.put, key, body, media_type, headers)
+
+            return RenderedResult(
+                media_type,
+                {**headers, "X-Content-SHA256": digest, "X-Result-Cache": "miss"},
+                body=body,
+            )
+
+        except Exception as e:
+            logger.error(f"Error classifying upload: {str(e)}")
+            raise
+
+    @staticmethod
+    async def create_session(request: UploadSessionRequest) -> dict:
+        if not request.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+            raise ValueError(UNSUPPORTED_FORMAT_MESSAGE)
+        session = await run_in_threadpool(upload_sessions.create, request)
+        logger.info(f"Created upload session {session['upload_id']}")
+        return session
+
+    @staticmethod
+    async def get_session(upload_id: str) -> dict:
+        return await run_in_threadpool(upload_sessions.get, upload_id)
+
+    @staticmethod
+    async def append_chunk(
+        upload_id: str, offset: int, stream: AsyncIterator[bytes]
+    ) -> dict:
+        return await upload_sessions.append(upload_id, offset, stream)
+
+    @staticmethod
+    async def delete_session(upload_id: str) -> None:
+        await run_in_threadpool(upload_sessions.delete, upload_id)
+
+    @staticmethod
+    async def complete_session(
+        upload_id: str, options: ProbabilityOptions, negotiated: Optional[tuple]
+    ) -> RenderedResult:
+        session = await run_in_threadpool(upload_sessions.get, upload_id)
+        if session["size"] is not None and session["offset"] != session["size"]:
+            raise ValueError(
+                f"Upload is incomplete: {session['offset']} of {session['size']} bytes"
+            )
+
+        fh = await run_in_threadpool(open, upload_sessions.data_path(upload_id), "rb")
+        try:
+            digest = await run_in_threadpool(content_digest, fh)
+            if session["sha256"] is not None and digest != session["sha256"]:
+                raise ValueError("Upload does not match its declared sha256")
+
+            # Sessions stay until they expire, so retrying a completion whose
+            # response was lost is answered from the result store
+            file = UploadFile(
+                file=fh, filename=session["filename"], size=session["offset"]
+            )
+            return await UploadService.classify_file(file, options, negotiated, digest)
+        finally:
+            await run_in_threadpool(fh.close)
@@ -1,9 +1,23 @@
 import streamlit as st
 import requests
 import pandas as pd
+import hashlib
 import io
 import json
-from typing import Dict, Any
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, Optional
+
+PREVIEW_ROWS = 10
+RESULTS_PAGE_SIZE = 10000
+LIVE_TABLE_ROWS = 1000
+POLL_INTERVAL_SECONDS = 0.5
+CLASSIFIED_FILES_MAX_ENTRIES = 256
+# (connect, read) timeouts; jobs answer straight away, so none of them needs
+# to cover the classification itself
+REQUEST_TIMEOUT = (5, 30)
+UPLOAD_TIMEOUT = (5, 300)
 
 # Page configuration
 st.set_page_config(
@@ -81,10 +95,25 @@ with st.sidebar:
     )
 
 
+# One pooled session per server process, shared by every browser session, so
+# polling and paging reuse connections instead of opening one per call
+@st.cache_resource
+def get_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.3, allowed_methods=["GET"]),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 # API Health Check Function
 def check_api_health():
     try:
-        response = requests.get(f"{API_BASE_URL}/health", timeout=5)
+        response = get_session().get(f"{API_BASE_URL}/health", timeout=5)
         if response.status_code == 200:
             return True, response.json()
         return False, None
@@ -95,7 +124,9 @@ def check_api_health():
 # Single Prediction Function
 def predict_single(data: Dict[str, Any]):
     try:
-        response = requests.post(f"{API_BASE_URL}/exoplanet/", json=data, timeout=30)
+        response = get_session().post(
+            f"{API_BASE_URL}/exoplanet/", json=data, timeout=REQUEST_TIMEOUT
+        )
         if response.status_code == 200:
             return True, response.json()
         else:
@@ -104,19 +135,161 @@ def predict_single(data: Dict[str, Any]):
         return False, str(e)
 
 
-# Batch Upload Function
-def predict_batch(file):
+# Reads only the first rows; the server parses the whole file
+def preview_file(file) -> pd.DataFrame:
+    name = file.name.lower()
+    file.seek(0)
     try:
-        files = {"file": (file.name, file, file.type)}
-        response = requests.post(
-            f"{API_BASE_URL}/exoplanet/upload", files=files, timeout=60
+        if name.endswith(".csv"):
+            return pd.read_csv(file, nrows=PREVIEW_ROWS)
+        if name.endswith((".xlsx", ".xls")):
+            return pd.read_excel(file, nrows=PREVIEW_ROWS)
+        if name.endswith((".parquet", ".pq")):
+            import pyarrow.parquet as pq
+
+            batches = pq.ParquetFile(file).iter_batches(batch_size=PREVIEW_ROWS)
+            return next(batches).to_pandas()
+
+        import pyarrow as pa
+
+        try:
+            reader = pa.ipc.open_file(file)
+            batch = reader.get_batch(0)
+        except pa.ArrowInvalid:
+            file.seek(0)
+            batch = pa.ipc.open_stream(file).read_next_batch()
+        return batch.slice(0, PREVIEW_ROWS).to_pandas()
+    finally:
+        file.seek(0)
+
+
+# Batch Upload Functions
+def active_model_version(api_base_url: str) -> Optional[str]:
+    response = get_session().get(f"{api_base_url}/health", timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json().get("model_version")
+
+
+def submit_job(api_base_url: str, file) -> str:
+    file.seek(0)
+    response = get_session().post(
+        f"{api_base_url}/jobs/",
+        files={"file": (file.name, file, file.type)},
+        timeout=UPLOAD_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()["data"]["job_id"]
+
+
+# One job per file, server and model version, shared across browser sessions.
+# The model version is part of the key, so after a reload a file is classified
+# again instead of showing the previous model's results.
+@st.cache_data(show_spinner=False, max_entries=CLASSIFIED_FILES_MAX_ENTRIES)
+def classified_file_job(
+    api_base_url: str, model_version: Optional[str], digest: str, _file
+) -> str:
+    return submit_job(api_base_url, _file)
+
+
+def get_job(api_base_url: str, job_id: str) -> dict:
+    response = get_session().get(
+        f"{api_base_url}/jobs/{job_id}", timeout=REQUEST_TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json()["data"]
+
+
+# Only called for rows the job has already committed, which never change, so
+# a cached page stays valid and reruns never fetch it again
+@st.cache_data(show_spinner=False, max_entries=2000)
+def fetch_results_page(
+    api_base_url: str, job_id: str, offset: int, limit: int
+) -> pd.DataFrame:
+    response = get_session().get(
+        f"{api_base_url}/jobs/{job_id}/results",
+        params={"offset": offset, "limit": limit},
+        timeout=REQUEST_TIMEOUT,
+    )
+    response.raise_for_status()
+    return pd.DataFrame(response.json()["data"]["items"])
+
+
+def fetch_ready_pages(
+    api_base_url: str, job: dict, pages: list, rows_fetched: int
+) -> int:
+    # Full pages while the job runs, the remainder once it has finished
+    finished = job["status"] == "completed"
+    while job["rows_done"] - rows_fetched >= RESULTS_PAGE_SIZE or (
+        finished and rows_fetched < job["rows_done"]
+    ):
+        page = fetch_results_page(
+            api_base_url, job["id"], rows_fetched, RESULTS_PAGE_SIZE
         )
-        if response.status_code == 200:
-            return True, response.json()
-        else:
-            return False, response.json()
-    except Exception as e:
-        return False, str(e)
+        if page.empty:
+            break
+        pages.append(page)
+        rows_fetched += len(page)
+    return rows_fetched
+
+
+def render_progress(progress_bar, status_text, job: dict) -> None:
+    total = job["rows_total"]
+    done = job["rows_done"]
+    # rows_total is an upper bound for CSV files
+    if job["status"] == "completed":
+        fraction = 1.0
+    elif total:
+        fraction = min(done / total, 1.0)
+    else:
+        fraction = 0.0
+    details = [f"{done:,} rows classified"]
+    if job["rows_per_second"]:
+        details.append(f"{job['rows_per_second']:,.0f} rows/s")
+    if job["eta_seconds"] is not None:
+        details.append(f"about {job['eta_seconds']:.0f}s left")
+    progress_bar.progress(fraction, text=f"{job['status'].capitalize()}")
+    status_text.caption(" · ".join(details))
+
+
+def render_partial(placeholder, pages: list) -> None:
+    if not pages:
+        return
+    rows = sum(len(page) for page in pages)
+    with placeholder.container():
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Rows received", f"{rows:,}")
+        with col2:
+            counts = pd.concat(
+                [page["predicted_class"].value_counts() for page in pages]
+            )
+            st.write(counts.groupby(level=0).sum())
+        st.dataframe(pages[0].head(LIVE_TABLE_ROWS), use_container_width=True)
+
+
+def run_job(job_id: str) -> Optional[pd.DataFrame]:
+    progress_bar = st.progress(0.0, text="Classifying...")
+    status_text = st.empty()
+    partial = st.empty()
+
+    pages = []
+    rows_fetched = 0
+    while True:
+        job = get_job(API_BASE_URL, job_id)
+        render_progress(progress_bar, status_text, job)
+        fetched = fetch_ready_pages(API_BASE_URL, job, pages, rows_fetched)
+        if fetched != rows_fetched:
+            rows_fetched = fetched
+            render_partial(partial, pages)
+        if job["status"] not in ("queued", "running"):
+            break
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+    partial.empty()
+    if job["status"] != "completed":
+        st.error(f"Job {job['status']}: {job.get('error') or 'no results'}")
+        return None
+    return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
 
 
 # Mode: API Health Check
@@ -271,7 +444,7 @@ elif app_mode == "Batch Upload":
 
     st.markdown(
         """
-    Upload a CSV or Excel file containing exoplanet data for batch classification.
+    Upload a CSV, Excel, Parquet or Arrow file containing exoplanet data for batch classification.
     
     **Required columns:**
     - `ra`, `dec` (positional data)
@@ -284,76 +457,91 @@ elif app_mode == "Batch Upload":
     # File uploader
     uploaded_file = st.file_uploader(
         "Choose a file",
-        type=["csv", "xlsx", "xls"],
-        help="Upload a CSV or Excel file with exoplanet data",
+        type=["csv", "xlsx", "xls", "parquet", "pq", "arrow", "feather", "ipc"],
+        help="Upload a CSV, Excel, Parquet or Arrow file with exoplanet data",
     )
 
     if uploaded_file is not None:
         # Preview the file
         st.subheader("📋 Data Preview")
         try:
-            if uploaded_file.name.endswith(".csv"):
-                df_preview = pd.read_csv(uploaded_file)
-                uploaded_file.seek(0)  # Reset file pointer
-            else:
-                df_preview = pd.read_excel(uploaded_file)
-                uploaded_file.seek(0)  # Reset file pointer
-
-            st.dataframe(df_preview.head(10), use_container_width=True)
-            st.info(f"Total rows: {len(df_preview)}")
+            st.dataframe(preview_file(uploaded_file), use_container_width=True)
+            st.info(
+                f"First {PREVIEW_ROWS} rows of {uploaded_file.name} "
+                f"({uploaded_file.size / (1024 * 1024):.1f} MB)"
+            )
 
         except Exception as e:
             st.error(f"Error reading file: {str(e)}")
 
         st.markdown("---")
 
-        if st.button(
-            "🚀 Classify All Exoplanets", type="primary", use_container_width=True
+        digest = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+        try:
+            model_version = active_model_version(API_BASE_URL)
+        except requests.RequestException:
+            # Submitting the job reports the problem
+            model_version = None
+        cache_key = (API_BASE_URL, model_version, digest)
+
+        if (
+            st.button(
+                "🚀 Classify All Exoplanets", type="primary", use_container_width=True
+            )
+            or st.session_state.get("classified_file") == cache_key
         ):
-            with st.spinner("Processing batch classification..."):
-                success, result = predict_batch(uploaded_file)
-
-                if success:
-                    st.markdown('<div class="success-box">', unsafe_allow_html=True)
-                    st.success("✅ Batch Classification Complete!")
-                    st.markdown("</div>", unsafe_allow_html=True)
-
-                    # Convert results to DataFrame
-                    if "data" in result and isinstance(result["data"], list):
-                        results_df = pd.DataFrame(result["data"])
-
-                        # Display summary
-                        st.subheader("📊 Classification Summary")
-                        col1, col2 = st.columns(2)
-
-                        with col1:
-                            st.metric("Total Classified", len(results_df))
-
-                        with col2:
-                            if "predicted_class" in results_df.columns:
-                                st.write("**Class Distribution:**")
-                                st.write(results_df["predicted_class"].value_counts())
-
-                        # Display results table
-                        st.subheader("🔍 Detailed Results")
-                        st.dataframe(results_df, use_container_width=True)
-
-                        # Download results
-                        csv = results_df.to_csv(index=False)
-                        st.download_button(
-                            label="📥 Download Results as CSV",
-                            data=csv,
-                            file_name="exoplanet_classifications.csv",
-                            mime="text/csv",
-                            use_container_width=True,
-                        )
-                    else:
-                        st.json(result)
-                else:
-                    st.markdown('<div class="error-box">', unsafe_allow_html=True)
-                    st.error("❌ Batch Classification Failed")
-                    st.write(result)
-                    st.markdown("</div>", unsafe_allow_html=True)
+            try:
+                # A file that was classified before reuses its job, whose
+                # result pages are already cached
+                with st.spinner("Uploading..."):
+                    job_id = classified_file_job(
+                        API_BASE_URL, model_version, digest, uploaded_file
+                    )
+                results_df = run_job(job_id)
+            except Exception as e:
+                # The job may be gone (server restarted with another JOBS_DIR)
+                results_df = None
+                st.markdown('<div class="error-box">', unsafe_allow_html=True)
+                st.error("❌ Batch Classification Failed")
+                st.write(str(e))
+                st.markdown("</div>", unsafe_allow_html=True)
+
+            if results_df is None:
+                # Entries cannot be dropped one at a time. A lost or failed job
+                # is rare, and other files then only get classified again.
+                classified_file_job.clear()
+                st.session_state.pop("classified_file", None)
+            else:
+                st.session_state["classified_file"] = cache_key
+                st.markdown('<div class="success-box">', unsafe_allow_html=True)
+                st.success("✅ Batch Classification Complete!")
+                st.markdown("</div>", unsafe_allow_html=True)
+
+                # Display summary
+                st.subheader("📊 Classification Summary")
+                col1, col2 = st.columns(2)
+
+                with col1:
+                    st.metric("Total Classified", len(results_df))
+
+                with col2:
+                    if "predicted_class" in results_df.columns:
+                        st.write("**Class Distribution:**")
+                        st.write(results_df["predicted_class"].value_counts())
+
+                # Display results table
+                st.subheader("🔍 Detailed Results")
+                st.dataframe(results_df, use_container_width=True)
+
+                # Download results
+                csv = results_df.to_csv(index=False)
+                st.download_button(
+                    label="📥 Download Results as CSV",
+                    data=csv,
+                    file_name="exoplanet_classifications.csv",
+                    mime="text/csv",
+                    use_container_width=True,
+                )
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,14 @@
+"""Per-record reference implementations the vectorized code is checked against."""
+
+
+def scalar_reference(row: dict) -> dict:
+    # The per-record formulas the single-record endpoint used before
+    # services.features existed
+    return {
+        "planet_to_star_ratio": row["pl_rade"] / row["st_rad"],
+        "duration_to_period": row["pl_trandurh"] / row["pl_orbper"],
+        "depth_to_radius": row["pl_trandep"] / row["pl_rade"],
+        "insolation_eff_ratio": row["pl_insol"] / (row["st_teff"] * 4),
+        "eqt_to_insol": row["pl_eqt"] / (row["pl_insol"] * 0.25),
+        "tran_snr_proxy": row["pl_trandep"] / row["pl_trandeperr1"],
+    }
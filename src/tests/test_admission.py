@@ -0,0 +1,128 @@
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from utils.admission import (
+    AdmissionController,
+    AdmissionMiddleware,
+    AdmissionRejectedError,
+    UploadTooLargeError,
+    current_upload,
+)
+
+
+@pytest.fixture
+def controller() -> AdmissionController:
+    return AdmissionController(
+        max_concurrent_uploads=2,
+        max_inflight_rows=100,
+        max_upload_bytes=1000,
+        max_upload_rows=500,
+        max_excel_upload_bytes=100,
+        retry_after_seconds=7,
+    )
+
+
+@pytest.fixture
+def client(controller) -> TestClient:
+    app = FastAPI()
+
+    @app.post("/exoplanet/upload")
+    async def upload(request: Request, rows: int = 0):
+        try:
+            body = await request.body()
+        except UploadTooLargeError:
+            # Whatever the app answers here is replaced by the middleware
+            raise HTTPException(status_code=422, detail="unreadable body")
+        ticket = current_upload.get()
+        try:
+            ticket.reserve(rows)
+        except AdmissionRejectedError as e:
+            raise HTTPException(
+                status_code=e.status_code,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)},
+            )
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        return {"bytes": len(body), "rows": ticket.rows}
+
+    @app.post("/exoplanet/")
+    async def single(request: Request):
+        return {"bytes": len(await request.body())}
+
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    return TestClient(app)
+
+
+def test_uploads_are_admitted_and_released(client, controller):
+    response = client.post("/exoplanet/upload", content=b"x" * 10, params={"rows": 5})
+    assert response.status_code == 200
+    assert response.json() == {"bytes": 10, "rows": 5}
+    assert controller.uploads == 0
+    assert controller.inflight_rows == 0
+
+
+def test_too_many_uploads_are_turned_away_with_retry_after(client, controller):
+    controller.uploads = controller.max_concurrent_uploads
+    response = client.post("/exoplanet/upload", content=b"x")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    # Single records do not go through upload admission
+    assert client.post("/exoplanet/", content=b"x").status_code == 200
+    assert controller.uploads == controller.max_concurrent_uploads
+
+
+def test_uploads_are_shed_while_the_row_budget_is_used_up(client, controller):
+    controller.inflight_rows = controller.max_inflight_rows
+    response = client.post("/exoplanet/upload", content=b"x")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+
+
+def test_an_upload_alone_may_always_go_on(client, controller):
+    # Over the shared row budget, but nothing else is in flight
+    response = client.post("/exoplanet/upload", content=b"x", params={"rows": 300})
+    assert response.status_code == 200
+    assert controller.inflight_rows == 0
+
+    # With rows of another upload held, the same request is shed
+    other = controller.admit()
+    other.reserve(10)
+    response = client.post("/exoplanet/upload", content=b"x", params={"rows": 300})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    controller.finish(other)
+    assert controller.inflight_rows == 0
+
+
+def test_row_limit_applies_to_an_upload_alone(client):
+    response = client.post("/exoplanet/upload", content=b"x", params={"rows": 501})
+    assert response.status_code == 413
+
+
+def test_declared_length_over_the_limit_is_rejected_before_reading(client, controller):
+    response = client.post("/exoplanet/upload", content=b"x" * 1001)
+    assert response.status_code == 413
+    assert controller.uploads == 0
+
+
+def test_streamed_body_over_the_limit_gets_413_instead_of_the_app_response(
+    client, controller
+):
+    def chunks():
+        # No Content-Length: only counting the body as it arrives catches it
+        for _ in range(5):
+            yield b"x" * 300
+
+    response = client.post("/exoplanet/upload", content=chunks())
+    assert response.status_code == 413
+    assert "1000 bytes" in response.json()["detail"]
+    assert controller.uploads == 0
+
+    def small():
+        yield b"x" * 300
+
+    response = client.post("/exoplanet/upload", content=small())
+    assert response.status_code == 200
+    assert response.json()["bytes"] == 300
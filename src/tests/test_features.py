@@ -0,0 +1,71 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.batch_engine import FEATURE_COLUMNS
+from services.features import DERIVED_FEATURES, apply_derived_features
+from tests.reference import scalar_reference
+
+# The inputs of the derived features
+INPUT_COLUMNS = (
+    "pl_rade",
+    "st_rad",
+    "pl_trandurh",
+    "pl_orbper",
+    "pl_trandep",
+    "pl_trandeperr1",
+    "pl_insol",
+    "st_teff",
+    "pl_eqt",
+)
+
+
+def _frame(rows: list) -> pd.DataFrame:
+    return pd.DataFrame(rows).reindex(columns=FEATURE_COLUMNS).astype("float64")
+
+
+@pytest.fixture(scope="module")
+def rows() -> list:
+    rng = np.random.default_rng(7)
+    catalog = pd.DataFrame(
+        {column: rng.lognormal(1.0, 2.0, 20_000) for column in INPUT_COLUMNS}
+    )
+    return catalog.to_dict(orient="records")
+
+
+def test_vectorized_features_match_scalar_formulas(rows):
+    derived = apply_derived_features(_frame(rows))
+    for i, row in enumerate(rows):
+        expected = scalar_reference(row)
+        for name in DERIVED_FEATURES:
+            # Same IEEE operations in the same order, so equality is exact
+            assert derived[name].iat[i] == expected[name], (i, name)
+
+
+@pytest.mark.parametrize(
+    "overrides, name, expected",
+    [
+        ({"st_rad": 0.0}, "planet_to_star_ratio", math.nan),
+        ({"pl_trandeperr1": 0.0}, "tran_snr_proxy", math.nan),
+        ({"pl_insol": 0.0}, "eqt_to_insol", math.nan),
+        ({"pl_rade": None}, "depth_to_radius", math.nan),
+        ({"pl_orbper": math.inf}, "duration_to_period", 0.0),
+        ({"pl_trandurh": math.inf}, "duration_to_period", math.nan),
+        ({"st_rad": None, "planet_to_star_ratio": 0.42}, "planet_to_star_ratio", 0.42),
+    ],
+)
+def test_edge_cases(rows, overrides, name, expected):
+    value = apply_derived_features(_frame([{**rows[0], **overrides}]))[name].iat[0]
+    if math.isnan(expected):
+        assert math.isnan(value)
+    else:
+        assert value == expected
+
+
+def test_computable_features_override_input_values(rows):
+    # A precomputed value from the input is replaced when it can be derived
+    frame = apply_derived_features(_frame([{**rows[0], "planet_to_star_ratio": 99.0}]))
+    expected = scalar_reference(rows[0])["planet_to_star_ratio"]
+    assert frame["planet_to_star_ratio"].iat[0] == expected
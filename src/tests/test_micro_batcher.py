@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.inference_executor import ExecutorBusyError, InferenceExecutor
+from services.micro_batcher import MicroBatcher
+
+
+def _executor(queue_size: int = 64) -> InferenceExecutor:
+    return InferenceExecutor("thread", 2, queue_size, priority_workers=1)
+
+
+def test_concurrent_items_are_coalesced_and_fanned_out_in_order():
+    calls = []
+
+    def predict_batch(items):
+        calls.append(list(items))
+        return [item * 10 for item in items]
+
+    async def run():
+        batcher = MicroBatcher(predict_batch, _executor(), 8, 50.0)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert asyncio.run(run()) == [0, 10, 20, 30, 40]
+    assert calls == [[0, 1, 2, 3, 4]]
+
+
+def test_full_batch_is_flushed_without_waiting():
+    calls = []
+
+    def predict_batch(items):
+        calls.append(len(items))
+        return items
+
+    async def run():
+        # A wait far longer than the test: only the size trigger can flush
+        batcher = MicroBatcher(predict_batch, _executor(), 4, 60_000.0)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(i) for i in range(8))), timeout=5
+        )
+
+    assert asyncio.run(run()) == list(range(8))
+    assert calls == [4, 4]
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    def predict_batch(items):
+        raise ValueError("bad batch")
+
+    async def run():
+        batcher = MicroBatcher(predict_batch, _executor(), 8, 1.0)
+        return await asyncio.gather(
+            *(batcher.submit(i) for i in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert len(results) == 3
+    assert all(isinstance(r, ValueError) and str(r) == "bad batch" for r in results)
+
+
+def test_cancelled_caller_does_not_break_the_batch():
+    release = threading.Event()
+
+    def predict_batch(items):
+        release.wait(5)
+        return items
+
+    async def run():
+        batcher = MicroBatcher(predict_batch, _executor(), 8, 1.0)
+        first = asyncio.ensure_future(batcher.submit("a"))
+        second = asyncio.ensure_future(batcher.submit("b"))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        release.set()
+        return await second
+
+    assert asyncio.run(run()) == "b"
+
+
+def test_submit_is_rejected_when_the_priority_lane_is_full():
+    async def run():
+        executor = _executor(queue_size=0)
+        executor.priority_pending = executor.priority_workers
+        batcher = MicroBatcher(lambda items: items, executor, 8, 1.0)
+        await batcher.submit(1)
+
+    with pytest.raises(ExecutorBusyError):
+        asyncio.run(run())
+
+
+def test_batch_size_must_be_positive():
+    with pytest.raises(ValueError):
+        MicroBatcher(lambda items: items, _executor(), 0, 1.0)
@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.batch_engine import FEATURE_COLUMNS
+from services.prediction_cache import PredictionCache
+
+
+def _record(**overrides) -> dict:
+    record = {column: float(i + 1) for i, column in enumerate(FEATURE_COLUMNS)}
+    record.update(overrides)
+    return record
+
+
+def test_frame_and_record_keys_agree():
+    records = [_record(), _record(pl_rade=None), _record(st_teff=5777.0)]
+    frame = pd.DataFrame(records)
+    keys = PredictionCache.keys_for_frame(frame, "v1", "p1k0")
+    assert keys == [PredictionCache.key_for_record(r, "v1", "p1k0") for r in records]
+
+
+def test_nan_payloads_and_negative_zero_are_canonicalized():
+    # A NaN with a different payload, and -0.0, describe the same input
+    odd_nan = np.frombuffer(np.uint64(0x7FF8000000000001).tobytes(), np.float64)[0]
+    assert math.isnan(odd_nan)
+    assert PredictionCache.key_for_record(
+        _record(pl_rade=odd_nan), "v1"
+    ) == PredictionCache.key_for_record(_record(pl_rade=None), "v1")
+    assert PredictionCache.key_for_record(
+        _record(pl_rade=-0.0), "v1"
+    ) == PredictionCache.key_for_record(_record(pl_rade=0.0), "v1")
+
+
+def test_column_order_and_extra_columns_do_not_change_keys():
+    record = _record()
+    frame = pd.DataFrame([record])
+    shuffled = frame[list(reversed(frame.columns))].assign(unused=1.0)
+    assert PredictionCache.keys_for_frame(frame, "v1") == PredictionCache.keys_for_frame(
+        shuffled, "v1"
+    )
+
+
+def test_model_version_and_variant_salt_the_key():
+    record = _record()
+    keys = {
+        PredictionCache.key_for_record(record, "v1"),
+        PredictionCache.key_for_record(record, "v2"),
+        PredictionCache.key_for_record(record, "v1", "p1k0"),
+    }
+    assert len(keys) == 3
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = PredictionCache(2, 60.0, "v1")
+    cache.put(b"a", 1)
+    cache.put(b"b", 2)
+    assert cache.get(b"a") == 1
+    cache.put(b"c", 3)
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") == 1
+    assert cache.get(b"c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("services.prediction_cache.time.monotonic", lambda: now[0])
+    cache = PredictionCache(10, 5.0, "v1")
+    cache.put(b"a", 1)
+    now[0] += 4.0
+    assert cache.get(b"a") == 1
+    now[0] += 2.0
+    assert cache.get(b"a") is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["size"] == 0
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_new_model_version_drops_entries():
+    cache = PredictionCache(10, 60.0, None)
+    cache.ensure_model_version("v1")
+    cache.put(b"a", 1)
+    cache.ensure_model_version("v1")
+    assert cache.get(b"a") == 1
+    cache.ensure_model_version("v2")
+    assert cache.get(b"a") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        PredictionCache(0, 60.0, None)
@@ -0,0 +1,152 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import UploadFile
+
+from models.exoplanet import ProbabilityOptions, Response
+from services import upload_service
+from services.exoplanet_service import ExoplanetService
+from services.result_store import ResultStore
+from services.upload_service import UploadService, content_digest, result_key
+
+
+@pytest.fixture
+def store(tmp_path) -> ResultStore:
+    store = ResultStore(tmp_path / "results", max_bytes=10)
+    yield store
+    store.close()
+
+
+def _read(store: ResultStore, key: str):
+    opened = store.open(key)
+    if opened is None:
+        return None
+    handle, meta = opened
+    with handle:
+        return handle.read(), meta
+
+
+def test_put_and_open(store):
+    store.put("a", b"abc", "text/csv", {"X-Model-Version": "v1"})
+    assert _read(store, "a") == (
+        b"abc",
+        {"size": 3, "media_type": "text/csv", "headers": {"X-Model-Version": "v1"}},
+    )
+    assert store.open("missing") is None
+
+
+def test_least_recently_served_results_are_evicted_first(store):
+    store.put("a", b"aaaa", "text/csv", {})
+    store.put("b", b"bbbb", "text/csv", {})
+    assert _read(store, "a") is not None
+    store.put("c", b"cccc", "text/csv", {})
+
+    assert _read(store, "b") is None
+    assert _read(store, "a") is not None
+    assert _read(store, "c") is not None
+    assert store.stats() == {
+        "results": 2,
+        "size_bytes": 8,
+        "max_bytes": 10,
+        "evictions": 1,
+    }
+    assert len(list(store.directory.glob("*.bin"))) == 2
+
+
+def test_results_larger_than_the_store_are_not_kept(store):
+    store.put("big", b"x" * 11, "text/csv", {})
+    assert store.open("big") is None
+    assert store.stats()["results"] == 0
+
+
+def test_replacing_a_key_removes_the_old_file(store):
+    store.put("a", b"old", "text/csv", {})
+    store.put("a", b"new", "text/csv", {})
+    assert _read(store, "a")[0] == b"new"
+    assert len(list(store.directory.glob("*.bin"))) == 1
+
+
+def test_open_handles_survive_eviction(store):
+    store.put("a", b"aaaa", "text/csv", {})
+    handle, _ = store.open("a")
+    store.put("b", b"bbbbbbbbbb", "text/csv", {})
+    with handle:
+        assert handle.read() == b"aaaa"
+    assert store.open("a") is None
+
+
+def test_key_depends_on_content_model_options_and_format():
+    digest = content_digest(io.BytesIO(b"pl_rade\n1.0\n"))
+    options = ProbabilityOptions()
+    key = result_key(digest, "v1", options, "json")
+
+    assert key == result_key(digest, "v1", ProbabilityOptions(), "json")
+    assert key != result_key(digest, "v2", options, "json")
+    assert key != result_key(digest, "v1", ProbabilityOptions(top_k=2), "json")
+    assert key != result_key(digest, "v1", options, "csv")
+    other = content_digest(io.BytesIO(b"pl_rade\n2.0\n"))
+    assert key != result_key(other, "v1", options, "json")
+
+
+class _Registry:
+    is_loaded = True
+
+    def __init__(self, version: str):
+        self.version = version
+
+    def get(self):
+        return self
+
+
+def _classify(body: bytes, filename: str = "a.csv", **options):
+    file = UploadFile(file=io.BytesIO(body), filename=filename)
+    rendered = asyncio.run(
+        UploadService.classify_file(file, ProbabilityOptions(**options))
+    )
+    if rendered.handle is not None:
+        with rendered.handle:
+            return rendered.headers, rendered.handle.read()
+    return rendered.headers, rendered.body
+
+
+def test_same_content_is_served_from_the_store(tmp_path, monkeypatch):
+    registry = _Registry("v1")
+    calls = []
+
+    async def process_exoplanet_file(file, options):
+        calls.append(file.filename)
+        return Response(
+            success=True, data=[{"n": len(calls)}], model_version=registry.version
+        )
+
+    store = ResultStore(tmp_path / "results", max_bytes=1024 * 1024)
+    monkeypatch.setattr(upload_service, "get_result_store", lambda: store)
+    monkeypatch.setattr(upload_service, "model_registry", registry)
+    monkeypatch.setattr(
+        ExoplanetService,
+        "process_exoplanet_file",
+        staticmethod(process_exoplanet_file),
+    )
+
+    headers, first = _classify(b"pl_rade\n1.0\n")
+    assert headers["X-Result-Cache"] == "miss"
+
+    # The file name does not matter, only its bytes
+    headers, again = _classify(b"pl_rade\n1.0\n", filename="renamed.csv")
+    assert headers["X-Result-Cache"] == "hit"
+    assert headers["X-Model-Version"] == "v1"
+    assert again == first
+    assert calls == ["a.csv"]
+
+    assert _classify(b"pl_rade\n2.0\n")[0]["X-Result-Cache"] == "miss"
+    assert _classify(b"pl_rade\n1.0\n", top_k=2)[0]["X-Result-Cache"] == "miss"
+
+    # A new model version never serves results of the previous one
+    registry.version = "v2"
+    headers, body = _classify(b"pl_rade\n1.0\n")
+    assert headers["X-Result-Cache"] == "miss"
+    assert headers["X-Model-Version"] == "v2"
+    assert body != first
+    assert len(calls) == 4
+    store.close()
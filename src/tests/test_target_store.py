@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.target_store import SkyIndex, TargetSpool, TargetStore
+
+LABELS = ["CP", "FP"]
+
+
+def _ingest(store: TargetStore, ra: list, dec: list, proba=None) -> None:
+    spool = TargetSpool(store.spool_path(f"spool-{len(store.index)}-{ra[0]}"))
+    chunk = pd.DataFrame({"ra": ra, "dec": dec, "pl_rade": np.arange(len(ra))})
+    if proba is None:
+        proba = np.full(len(ra), 0.5)
+    spool.add_columns(chunk, np.zeros(len(ra), dtype=np.int16), proba)
+    store.ingest(spool, LABELS, "v1", "test.csv")
+    spool.discard()
+
+
+@pytest.fixture
+def store(tmp_path) -> TargetStore:
+    store = TargetStore(tmp_path, max_rows=1000)
+    yield store
+    store.close()
+
+
+def test_cone_distances_follow_ids_when_rows_disappear(store, monkeypatch):
+    _ingest(store, [10.0, 10.0, 10.0], [0.0, 1.0, 2.0])
+    fetch = store.fetch
+
+    def fetch_after_eviction(ids, include_features=False):
+        # The nearest row is evicted between the search and the lookup
+        store._writer.execute("DELETE FROM targets WHERE id = ?", (int(ids[0]),))
+        return fetch(ids, include_features)
+
+    monkeypatch.setattr(store, "fetch", fetch_after_eviction)
+    total, items = store.cone(10.0, 0.0, 5.0, 0, 10)
+
+    assert total == 3
+    assert [item["dec"] for item in items] == [1.0, 2.0]
+    assert [item["distance_deg"] for item in items] == pytest.approx([1.0, 2.0])
+
+
+def test_refresh_returns_an_index_later_refreshes_do_not_change(store):
+    _ingest(store, [10.0, 20.0], [0.0, 0.0])
+    before = store.refresh()
+    _ingest(store, [30.0], [0.0])
+    store._writer.execute("DELETE FROM targets WHERE ra = 10.0")
+    after = store.refresh()
+
+    assert after is not before
+    assert len(before) == 2 and before.ids.tolist() == [1, 2]
+    assert len(after) == 2
+    assert after.cone(10.0, 0.0, 1.0)[0].tolist() == []
+    assert before.cone(10.0, 0.0, 1.0)[0].tolist() == [1]
+
+
+def _rows(ids: range) -> list:
+    return [(i, float(i % 360), 0.0, "CP", "v1") for i in ids]
+
+
+def test_evicted_rows_are_skipped_until_enough_pile_up():
+    index = SkyIndex(rebuild_ratio=0.25, min_rebuild_rows=10).append(
+        _rows(range(1, 41))
+    )
+    tree = index.tree
+
+    dropped = index.drop_before(6)
+    # A few evictions only move the start; the tree is kept
+    assert dropped.tree is tree
+    assert len(dropped) == 35
+    assert dropped.box(0.0, 359.0, -1.0, 1.0).tolist() == list(range(6, 41))
+    assert dropped.cone(5.0, 0.0, 0.5)[0].tolist() == []
+    assert len(index) == 40
+
+    compacted = dropped.drop_before(11)
+    assert compacted.tree is not tree
+    assert compacted.start == 0
+    assert compacted.ids.tolist() == list(range(11, 41))
+    assert compacted.cone(11.0, 0.0, 0.5)[0].tolist() == [11]
+
+
+def test_spooled_records_keep_the_raw_probability(tmp_path):
+    spool = TargetSpool(tmp_path / "spool.npy")
+    chunk = pd.DataFrame({"ra": [1.0, 2.0], "dec": [0.0, 0.0]})
+    records = [
+        {"predicted_class": "FP", "predicted_proba": "0.88"},
+        {"predicted_class": None, "predicted_proba": None, "errors": []},
+    ]
+    spool.add_records(chunk, records, LABELS, np.array([0.87654, np.nan]))
+
+    ((_, class_index, proba),) = spool.chunks()
+    assert class_index.tolist() == [1, -1]
+    assert proba[0] == np.float32(0.87654)
+    assert np.isnan(proba[1])
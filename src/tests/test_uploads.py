@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from controllers.exoplanet_controller import router
+from models.upload import UploadSessionRequest
+from services import upload_service
+from services.upload_service import (
+    RenderedResult,
+    UploadNotFoundError,
+    UploadOffsetError,
+    UploadService,
+    UploadSessions,
+)
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch) -> UploadSessions:
+    sessions = UploadSessions(tmp_path / "uploads", ttl_seconds=3600)
+    monkeypatch.setattr(upload_service, "upload_sessions", sessions)
+    return sessions
+
+
+@pytest.fixture
+def client(sessions) -> TestClient:
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def _create(client: TestClient, **body) -> str:
+    response = client.post("/exoplanet/uploads", json={"filename": "a.csv", **body})
+    assert response.status_code == 201
+    return response.json()["data"]["upload_id"]
+
+
+def _patch(client: TestClient, upload_id: str, offset: int, body: bytes):
+    return client.patch(
+        f"/exoplanet/uploads/{upload_id}",
+        content=body,
+        headers={"Upload-Offset": str(offset)},
+    )
+
+
+def test_chunks_append_and_head_reports_the_offset(client, sessions):
+    upload_id = _create(client, size=10)
+    assert (
+        client.head(f"/exoplanet/uploads/{upload_id}").headers["Upload-Offset"] == "0"
+    )
+
+    response = _patch(client, upload_id, 0, b"12345")
+    assert response.status_code == 200
+    assert response.headers["Upload-Offset"] == "5"
+
+    assert _patch(client, upload_id, 5, b"67890").headers["Upload-Offset"] == "10"
+    head = client.head(f"/exoplanet/uploads/{upload_id}")
+    assert head.status_code == 200
+    assert head.headers["Upload-Offset"] == "10"
+    assert sessions.data_path(upload_id).read_bytes() == b"1234567890"
+
+
+def test_offset_mismatch_is_a_conflict_with_the_current_offset(client, sessions):
+    upload_id = _create(client)
+    _patch(client, upload_id, 0, b"abc")
+
+    for offset in (0, 2, 4):
+        response = _patch(client, upload_id, offset, b"xyz")
+        assert response.status_code == 409
+        assert response.headers["Upload-Offset"] == "3"
+    assert sessions.data_path(upload_id).read_bytes() == b"abc"
+
+
+def test_writing_past_the_declared_size_is_rejected(client):
+    upload_id = _create(client, size=4)
+    assert _patch(client, upload_id, 0, b"12345").status_code == 422
+
+
+def test_unsupported_formats_and_unknown_sessions(client, sessions):
+    response = client.post("/exoplanet/uploads", json={"filename": "a.txt"})
+    assert response.status_code == 400
+    assert client.head("/exoplanet/uploads/missing").status_code == 404
+    assert _patch(client, "missing", 0, b"x").status_code == 404
+    # A session id can never point outside of the uploads directory
+    with pytest.raises(UploadNotFoundError):
+        sessions.get("..")
+
+
+def test_delete_discards_the_session(client, sessions):
+    upload_id = _create(client)
+    _patch(client, upload_id, 0, b"abc")
+
+    assert client.delete(f"/exoplanet/uploads/{upload_id}").status_code == 200
+    assert not (sessions.directory / upload_id).exists()
+    assert client.head(f"/exoplanet/uploads/{upload_id}").status_code == 404
+    assert client.delete(f"/exoplanet/uploads/{upload_id}").status_code == 404
+
+
+def test_concurrent_appends_to_one_session_conflict(sessions):
+    async def scenario():
+        session = sessions.create(UploadSessionRequest(filename="a.csv"))
+        upload_id = session["upload_id"]
+        release = asyncio.Event()
+
+        async def slow_stream():
+            yield b"abc"
+            await release.wait()
+            yield b"def"
+
+        async def stream(body):
+            yield body
+
+        first = asyncio.create_task(sessions.append(upload_id, 0, slow_stream()))
+        while sessions.get(upload_id)["offset"] < 3:
+            await asyncio.sleep(0.01)
+
+        # The second writer is turned away instead of interleaving its bytes
+        with pytest.raises(UploadOffsetError) as conflict:
+            await sessions.append(upload_id, 0, stream(b"xyz"))
+        assert conflict.value.offset == 3
+
+        release.set()
+        assert (await first)["offset"] == 6
+        # Once the first writer is done the next one may continue
+        assert (await sessions.append(upload_id, 6, stream(b"g")))["offset"] == 7
+        return sessions.data_path(upload_id).read_bytes()
+
+    assert asyncio.run(scenario()) == b"abcdefg"
+
+
+def test_complete_checks_size_and_sha256_then_classifies(client, monkeypatch):
+    body = b"pl_rade\n1.0\n"
+    classified = []
+
+    async def classify_file(file, options, negotiated, digest):
+        classified.append((file.filename, file.file.read(), digest))
+        return RenderedResult("application/json", {}, body=b"{}")
+
+    monkeypatch.setattr(UploadService, "classify_file", staticmethod(classify_file))
+
+    upload_id = _create(client, size=len(body), sha256="0" * 64)
+    _patch(client, upload_id, 0, body[:5])
+    response = client.post(f"/exoplanet/uploads/{upload_id}/complete")
+    assert response.status_code == 422
+    assert "incomplete" in response.json()["detail"]
+
+    _patch(client, upload_id, 5, body[5:])
+    response = client.post(f"/exoplanet/uploads/{upload_id}/complete")
+    assert response.status_code == 422
+    assert "sha256" in response.json()["detail"]
+    assert classified == []
+
+    digest = hashlib.sha256(body).hexdigest()
+    upload_id = _create(client, size=len(body), sha256=digest.upper())
+    _patch(client, upload_id, 0, body)
+    response = client.post(f"/exoplanet/uploads/{upload_id}/complete")
+    assert response.status_code == 200
+    assert classified == [("a.csv", body, digest)]
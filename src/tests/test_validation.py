@@ -0,0 +1,125 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+
+from models.exoplanet import ExoplanetData
+from models.validation import SCHEMA, validate_frame
+
+
+def test_numeric_and_boolean_columns_are_cast_to_float64():
+    frame = pd.DataFrame(
+        {"pl_rade": [1, 2, 3], "st_teff": [True, False, True], "ra": [0.5, 1.5, 2.5]}
+    )
+    result = validate_frame(frame)
+
+    assert list(result.frame.columns) == list(SCHEMA)
+    assert (result.frame.dtypes == "float64").all()
+    assert result.frame["pl_rade"].tolist() == [1.0, 2.0, 3.0]
+    assert result.frame["st_teff"].tolist() == [1.0, 0.0, 1.0]
+    assert not result.invalid_rows.any()
+    assert result.errors == []
+
+
+def test_text_cells_are_coerced_like_float():
+    frame = pd.DataFrame({"pl_rade": ["1.5", " 2 ", "1e3", "+3", "1_000", "inf"]})
+    result = validate_frame(frame)
+
+    assert result.frame["pl_rade"].tolist() == [1.5, 2.0, 1000.0, 3.0, 1000.0, math.inf]
+    assert not result.invalid_rows.any()
+
+
+def test_missing_columns_are_reported_and_filled_with_nan():
+    result = validate_frame(pd.DataFrame({"pl_rade": [1.0]}))
+
+    assert "pl_rade" not in result.missing_columns
+    assert set(result.missing_columns) == set(SCHEMA) - {"pl_rade"}
+    assert result.frame["st_teff"].isna().all()
+    assert not result.invalid_rows.any()
+
+
+def test_nan_and_empty_cells_are_missing_values_not_errors():
+    frame = pd.DataFrame(
+        {"pl_rade": pd.Series(["nan", "NaN", "", "  ", None, np.nan], dtype=object)}
+    )
+    result = validate_frame(frame)
+
+    assert result.frame["pl_rade"].isna().all()
+    assert not result.invalid_rows.any()
+    assert result.errors == []
+
+
+def test_each_invalid_cell_gets_its_own_error():
+    frame = pd.DataFrame(
+        {
+            "pl_rade": ["1.0", "abc", "3.0", "x"],
+            "st_teff": ["5000", "5100", "0x10", "?"],
+        }
+    )
+    result = validate_frame(frame, row_offset=100)
+
+    assert result.invalid_rows.tolist() == [False, True, True, True]
+    assert result.errors == [
+        {"row": 101, "column": "pl_rade", "value": "abc"},
+        {"row": 102, "column": "st_teff", "value": "0x10"},
+        {"row": 103, "column": "pl_rade", "value": "x"},
+        {"row": 103, "column": "st_teff", "value": "?"},
+    ]
+    assert result.row_errors() == {
+        101: [{"column": "pl_rade", "value": "abc"}],
+        102: [{"column": "st_teff", "value": "0x10"}],
+        103: [
+            {"column": "pl_rade", "value": "x"},
+            {"column": "st_teff", "value": "?"},
+        ],
+    }
+    assert result.valid_frame.index.tolist() == [0]
+
+
+def test_index_is_kept():
+    frame = pd.DataFrame({"pl_rade": ["1", "bad"]}, index=[10, 20])
+    result = validate_frame(frame)
+
+    assert result.frame.index.tolist() == [10, 20]
+    assert result.valid_frame.index.tolist() == [10]
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_matches_per_record_pydantic_validation(seed):
+    # The frame validator replaced one ExoplanetData per row; on the same
+    # mixed frame both must accept the same rows with the same values
+    rng = np.random.default_rng(seed)
+    spellings = ["1.5", " 2 ", "-4e2", "nan", "inf", "7", "abc", "0x1F", "1_0", "--1"]
+    columns = list(SCHEMA)[:8]
+    frame = pd.DataFrame(
+        {
+            column: pd.Series(
+                [
+                    rng.choice(spellings) if rng.random() < 0.5 else rng.normal()
+                    for _ in range(200)
+                ],
+                dtype=object,
+            )
+            for column in columns
+        }
+    )
+    frame.iloc[::17, 0] = None
+    result = validate_frame(frame)
+
+    for row, record in enumerate(frame.to_dict(orient="records")):
+        try:
+            data = ExoplanetData(**record)
+        except ValidationError:
+            assert result.invalid_rows[row], record
+            continue
+
+        assert not result.invalid_rows[row], record
+        for column in columns:
+            expected = getattr(data, column)
+            actual = result.frame[column].iat[row]
+            if expected is None or math.isnan(expected):
+                assert math.isnan(actual)
+            else:
+                assert actual == expected
@@ -0,0 +1,239 @@
+from contextvars import ContextVar
+from typing import Optional
+from utils.metrics import ADMISSION_DECISIONS, ADMISSION_INFLIGHT, metrics
+from starlette.responses import JSONResponse
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Requests that carry or classify a whole catalog. Everything else, single
+# records included, bypasses upload admission entirely.
+UPLOAD_ROUTES = (
+    ("POST", re.compile(r"^/exoplanet/upload(/stream)?/?$")),
+    ("POST", re.compile(r"^/exoplanet/uploads/[^/]+/complete/?$")),
+    ("PATCH", re.compile(r"^/exoplanet/uploads/[^/]+/?$")),
+    ("POST", re.compile(r"^/jobs/?$")),
+)
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+class AdmissionRejectedError(Exception):
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class UploadTicket:
+    def __init__(self, controller: "AdmissionController"):
+        # rows counts everything read from this upload, held what it still
+        # keeps in memory
+        self.controller = controller
+        self.rows = 0
+        self.held = 0
+
+    def reserve(self, rows: int) -> None:
+        self.controller.reserve_rows(self, rows)
+
+    def release(self, rows: int) -> None:
+        self.controller.release_rows(self, rows)
+
+    def check_file(self, filename: str, size: Optional[int]) -> None:
+        self.controller.check_file(filename, size)
+
+
+current_upload: ContextVar[Optional[UploadTicket]] = ContextVar(
+    "current_upload", default=None
+)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent_uploads: int,
+        max_inflight_rows: int,
+        max_upload_bytes: int,
+        max_upload_rows: int,
+        max_excel_upload_bytes: int,
+        retry_after_seconds: int,
+    ):
+        for name, value in (
+            ("max_concurrent_uploads", max_concurrent_uploads),
+            ("max_inflight_rows", max_inflight_rows),
+            ("max_upload_bytes", max_upload_bytes),
+            ("max_upload_rows", max_upload_rows),
+            ("max_excel_upload_bytes", max_excel_upload_bytes),
+        ):
+            if value <= 0:
+                raise ValueError(f"{name} must be a positive integer")
+        self.max_concurrent_uploads = max_concurrent_uploads
+        self.max_inflight_rows = max_inflight_rows
+        self.max_upload_bytes = max_upload_bytes
+        self.max_upload_rows = max_upload_rows
+        self.max_excel_upload_bytes = max_excel_upload_bytes
+        self.retry_after_seconds = retry_after_seconds
+        # Only touched from the event loop, so plain integers are enough
+        self.uploads = 0
+        self.inflight_rows = 0
+
+    def admit(self) -> UploadTicket:
+        # Decided before the body is read, so a rejected upload costs nothing
+        if self.uploads >= self.max_concurrent_uploads:
+            ADMISSION_DECISIONS.inc(lane="upload", decision="rejected_concurrency")
+            raise AdmissionRejectedError(
+                f"Too many uploads in progress ({self.uploads}), please retry later",
+                429,
+                self.retry_after_seconds,
+            )
+        if self.inflight_rows >= self.max_inflight_rows:
+            ADMISSION_DECISIONS.inc(lane="upload", decision="rejected_rows")
+            raise AdmissionRejectedError(
+                "The server is busy, please retry later",
+                503,
+                self.retry_after_seconds,
+            )
+        self.uploads += 1
+        ADMISSION_DECISIONS.inc(lane="upload", decision="admitted")
+        return UploadTicket(self)
+
+    def finish(self, ticket: UploadTicket) -> None:
+        self.uploads -= 1
+        self.release_rows(ticket, ticket.held)
+
+    def check_rows(self, rows: int) -> None:
+        if rows > self.max_upload_rows:
+            ADMISSION_DECISIONS.inc(lane="upload", decision="too_large_rows")
+            raise UploadTooLargeError(
+                f"Upload exceeds the limit of {self.max_upload_rows} rows"
+            )
+
+    def reserve_rows(self, ticket: UploadTicket, rows: int) -> None:
+        self.check_rows(ticket.rows + rows)
+        # An upload alone on the server may always go on; the row budget is
+        # what several uploads share
+        others = self.inflight_rows - ticket.held
+        if others > 0 and self.inflight_rows + rows > self.max_inflight_rows:
+            ADMISSION_DECISIONS.inc(lane="upload", decision="shed_rows")
+            raise AdmissionRejectedError(
+                "The server is busy, please retry later",
+                503,
+                self.retry_after_seconds,
+            )
+        ticket.rows += rows
+        ticket.held += rows
+        self.inflight_rows += rows
+
+    def release_rows(self, ticket: UploadTicket, rows: int) -> None:
+        rows = min(rows, ticket.held)
+        ticket.held -= rows
+        self.inflight_rows -= rows
+
+    def check_bytes(self, size: Optional[int]) -> None:
+        if size is not None and size > self.max_upload_bytes:
+            ADMISSION_DECISIONS.inc(lane="upload", decision="too_large_bytes")
+            raise UploadTooLargeError(
+                f"Upload exceeds the limit of {self.max_upload_bytes} bytes"
+            )
+
+    def check_file(self, filename: str, size: Optional[int]) -> None:
+        self.check_bytes(size)
+        # Excel workbooks are parsed whole, so they get a tighter cap
+        if (
+            size is not None
+            and filename.lower().endswith(EXCEL_EXTENSIONS)
+            and size > self.max_excel_upload_bytes
+        ):
+            ADMISSION_DECISIONS.inc(lane="upload", decision="too_large_bytes")
+            raise UploadTooLargeError(
+                f"Excel uploads are limited to {self.max_excel_upload_bytes} bytes, "
+                "use CSV, Parquet or Arrow for larger catalogs"
+            )
+
+    def export_metrics(self) -> None:
+        ADMISSION_INFLIGHT.set(self.uploads, resource="uploads")
+        ADMISSION_INFLIGHT.set(self.inflight_rows, resource="rows")
+
+
+def is_upload_route(scope) -> bool:
+    method = scope["method"]
+    path = scope["path"]
+    return any(method == m and pattern.match(path) for m, pattern in UPLOAD_ROUTES)
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+        metrics.add_collector(controller.export_metrics)
+
+    @staticmethod
+    async def _reject(scope, receive, send, status_code: int, detail: str, headers):
+        response = JSONResponse({"detail": detail}, status_code, headers)
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not is_upload_route(scope):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            length = dict(scope["headers"]).get(b"content-length")
+            self.controller.check_bytes(int(length) if length else None)
+            ticket = self.controller.admit()
+        except UploadTooLargeError as e:
+            await self._reject(scope, receive, send, 413, str(e), None)
+            return
+        except AdmissionRejectedError as e:
+            logger.warning(f"Rejected {scope['path']}: {str(e)}")
+            headers = {"Retry-After": str(e.retry_after)}
+            await self._reject(scope, receive, send, e.status_code, str(e), headers)
+            return
+
+        received = 0
+        exceeded: Optional[UploadTooLargeError] = None
+        started = False
+
+        async def limited_receive():
+            # Counted as the body arrives, for chunked bodies and understated
+            # Content-Length headers alike
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if exceeded is None and received > self.controller.max_upload_bytes:
+                    ADMISSION_DECISIONS.inc(lane="upload", decision="too_large_bytes")
+                    exceeded = UploadTooLargeError(
+                        f"Upload exceeds the limit of "
+                        f"{self.controller.max_upload_bytes} bytes"
+                    )
+                if exceeded is not None:
+                    raise exceeded
+            return message
+
+        async def send_wrapper(message):
+            # Once the limit is hit, whatever the app makes of the aborted
+            # body is replaced by a 413
+            nonlocal started
+            if exceeded is not None and not started:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        token = current_upload.set(ticket)
+        try:
+            await self.app(scope, limited_receive, send_wrapper)
+        except Exception:
+            if exceeded is None or started:
+                raise
+        finally:
+            current_upload.reset(token)
+            self.controller.finish(ticket)
+
+        if exceeded is not None and not started:
+            await self._reject(scope, receive, send, 413, str(exceeded), None)
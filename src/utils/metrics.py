@@ -0,0 +1,325 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+import os
+import threading
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield from self._render_sample(key, value)
+
+    def _render_sample(self, key, value) -> Iterator[str]:
+        labels = _format_labels(self.labelnames, key)
+        yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _render_sample(self, key, value) -> Iterator[str]:
+        counts, total = value
+        names = self.labelnames + ("le",)
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(names, key + (_format_value(bound),))
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = _format_labels(self.labelnames, key)
+        yield f"{self.name}_sum{labels} {_format_value(total)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        # Collectors refresh point-in-time gauges right before a scrape
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def current_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter(
+    "exohunter_http_requests_total",
+    "HTTP requests by route and status code",
+    ("method", "route", "status"),
+)
+HTTP_ERRORS = metrics.counter(
+    "exohunter_http_errors_total",
+    "HTTP responses with a 4xx or 5xx status code",
+    ("method", "route", "status"),
+)
+HTTP_LATENCY = metrics.histogram(
+    "exohunter_http_request_duration_seconds",
+    "Time from request start until the response body is fully sent",
+    ("method", "route"),
+)
+STAGE_LATENCY = metrics.histogram(
+    "exohunter_stage_duration_seconds",
+    "Time spent in each processing stage",
+    ("stage",),
+)
+BATCH_ROWS = metrics.counter(
+    "exohunter_batch_rows_total",
+    "Rows classified by batch paths",
+    ("source",),
+)
+BATCH_ROWS_PER_SECOND = metrics.gauge(
+    "exohunter_batch_rows_per_second",
+    "Throughput of the most recently finished batch",
+    ("source",),
+)
+RESULT_STORE_LOOKUPS = metrics.counter(
+    "exohunter_result_store_lookups_total",
+    "Stored upload results served (hit) or computed (miss)",
+    ("result",),
+)
+ADMISSION_DECISIONS = metrics.counter(
+    "exohunter_admission_decisions_total",
+    "Admission decisions by traffic lane and outcome",
+    ("lane", "decision"),
+)
+ADMISSION_INFLIGHT = metrics.gauge(
+    "exohunter_admission_inflight",
+    "Uploads and rows currently admitted",
+    ("resource",),
+)
+MODEL_INFO = metrics.gauge(
+    "exohunter_model_info",
+    "Active model version",
+    ("version",),
+)
+MODEL_MEMORY = metrics.gauge(
+    "exohunter_model_memory_bytes",
+    "Resident memory added by loading the model artifacts",
+    ("version",),
+)
+PROCESS_RSS = metrics.gauge(
+    "process_resident_memory_bytes",
+    "Resident memory of this worker process",
+)
+
+
+def _collect_process_metrics() -> None:
+    rss = current_rss_bytes()
+    if rss is not None:
+        PROCESS_RSS.set(rss)
+
+
+metrics.add_collector(_collect_process_metrics)
+
+
+# Stage timings of the current task, for work whose histogram observations
+# would otherwise be lost (pool processes) or mixed with other requests
+stage_timings: ContextVar[Optional[list]] = ContextVar("stage_timings", default=None)
+
+
+class _StageTimer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        observe_stage(self.stage, perf_counter() - self.start)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_LATENCY.observe(seconds, stage=stage)
+    timings = stage_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def collect_stages() -> Iterator[list]:
+    timings: list = []
+    token = stage_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        stage_timings.reset(token)
+
+
+def timed(stage: str) -> _StageTimer:
+    return _StageTimer(stage)
+
+
+def record_batch(source: str, rows: int, seconds: float) -> None:
+    BATCH_ROWS.inc(rows, source=source)
+    if seconds > 0:
+        BATCH_ROWS_PER_SECOND.set(rows / seconds, source=source)
+
+
+def observe_upload_read(scope: dict) -> None:
+    # The multipart body is received and spooled before the endpoint runs, so
+    # the time since the middleware saw the request is the upload read time
+    started = scope.get("state", {}).get("request_started")
+    if started is not None:
+        observe_stage("upload_read", perf_counter() - started)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        scope.setdefault("state", {})["request_started"] = start
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, route=path, status=status_code)
+            if status_code >= 400:
+                HTTP_ERRORS.inc(method=method, route=path, status=status_code)
+            HTTP_LATENCY.observe(perf_counter() - start, method=method, route=path)
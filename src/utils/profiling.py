@@ -0,0 +1,266 @@
+from collections import Counter
+from pathlib import Path
+from time import perf_counter
+from typing import Optional
+from utils.metrics import stage_timings
+from fastapi.concurrency import run_in_threadpool
+import asyncio
+import cProfile
+import datetime
+import io
+import json
+import logging
+import pstats
+import secrets
+import shutil
+import sys
+import threading
+import tracemalloc
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILES_DIR = (
+    Path(__file__).resolve().parent.parent.parent / "data" / "profiles"
+)
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+PROFILE_MODES = ("sample", "cprofile")
+
+# Leaf frames of threads that are parked waiting for work
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+class SamplingProfiler:
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        # Samples every thread, so work handed to the request threadpool and
+        # the inference executor shows up next to the event loop
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_seconds):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (Path(code.co_filename).name, code.co_name) in IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        # One "frame;frame;frame count" line per stack, the input format of
+        # flamegraph.pl and speedscope
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def top(self, limit: int = 30) -> list:
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        samples = sum(self.stacks.values()) or 1
+        return [
+            {
+                "function": frame,
+                "self_samples": own[frame],
+                "total_samples": total[frame],
+                "total_ratio": round(total[frame] / samples, 4),
+            }
+            for frame, _ in total.most_common(limit)
+        ]
+
+
+class RequestProfile:
+    def __init__(self, mode: str, sample_interval_ms: float):
+        self.mode = mode
+        self.sample_interval_ms = sample_interval_ms
+        self.profiler = None
+        self.report: dict = {}
+
+    def start(self) -> None:
+        # Only stages timed on behalf of this request land in this list, not
+        # those of concurrent requests
+        self._stages: list = []
+        self._stages_token = stage_timings.set(self._stages)
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._traced_before = tracemalloc.get_traced_memory()[0]
+
+        if self.mode == "cprofile":
+            # cProfile only sees the thread it is enabled on, the event loop
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = SamplingProfiler(self.sample_interval_ms / 1000)
+            self.profiler.start()
+        self._start = perf_counter()
+
+    def stop(self) -> None:
+        duration = perf_counter() - self._start
+        if self.mode == "cprofile":
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+
+        stage_timings.reset(self._stages_token)
+        stages = {}
+        for stage, seconds in list(self._stages):
+            entry = stages.setdefault(stage, {"count": 0, "seconds": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+        for entry in stages.values():
+            entry["seconds"] = round(entry["seconds"], 6)
+
+        self.report = {
+            "mode": self.mode,
+            "duration_seconds": round(duration, 6),
+            "stages": stages,
+            "tracemalloc": {
+                "peak_bytes": max(peak - self._traced_before, 0),
+                "retained_bytes": current - self._traced_before,
+                "top_allocations": [
+                    {
+                        "location": f"{frame.filename}:{frame.lineno}",
+                        "size_bytes": stat.size,
+                        "count": stat.count,
+                    }
+                    for stat in snapshot.statistics("lineno")[:25]
+                    for frame in stat.traceback[:1]
+                ],
+            },
+        }
+
+    def write(self, directory: Path, request_info: dict) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.mode == "cprofile":
+            self.profiler.dump_stats(directory / "profile.prof")
+            text = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=text)
+            stats.sort_stats("cumulative").print_stats(60)
+            (directory / "profile.txt").write_text(text.getvalue())
+        else:
+            (directory / "profile.folded").write_text(self.profiler.folded())
+            self.report["samples"] = self.profiler.samples
+            self.report["top_functions"] = self.profiler.top()
+
+        with open(directory / "report.json", "w") as fh:
+            json.dump({**request_info, **self.report}, fh, indent=2)
+        return directory
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app,
+        output_dir: Path,
+        sample_interval_ms: float,
+        admin_token: Optional[str] = None,
+        max_profiles: int = 50,
+    ):
+        self.app = app
+        self.output_dir = Path(output_dir)
+        self.sample_interval_ms = sample_interval_ms
+        self.admin_token = admin_token
+        self.max_profiles = max_profiles
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _requested_mode(self, scope) -> Optional[str]:
+        headers = dict(scope["headers"])
+        value = headers.get(PROFILE_HEADER, b"").decode().strip().lower()
+        if value in ("", "0", "false", "off"):
+            return None
+        if self.admin_token is not None:
+            token = headers.get(ADMIN_TOKEN_HEADER, b"").decode()
+            if not secrets.compare_digest(token, self.admin_token):
+                return None
+        return value if value in PROFILE_MODES else "sample"
+
+    def _prune(self) -> None:
+        # Profile ids start with their timestamp, so name order is age order
+        profiles = sorted(
+            (path for path in self.output_dir.iterdir() if path.is_dir()),
+            reverse=True,
+        )
+        for path in profiles[self.max_profiles :]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    async def __call__(self, scope, receive, send):
+        mode = self._requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        profile_id = f"{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER, profile_id.encode())
+                ]
+            await send(message)
+
+        # tracemalloc and the sampler are process-wide, so profiled requests
+        # take turns; unprofiled traffic is not held up
+        async with self._lock:
+            profile = RequestProfile(mode, self.sample_interval_ms)
+            profile.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profile.stop()
+                request_info = {
+                    "id": profile_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                }
+                await run_in_threadpool(
+                    profile.write, self.output_dir / profile_id, request_info
+                )
+                await run_in_threadpool(self._prune)
+                logger.info(f"Wrote {mode} profile {profile_id} for {scope['path']}")